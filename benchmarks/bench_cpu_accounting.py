@@ -0,0 +1,108 @@
+# benchmark: CPU cobrada de jobs que criam muitos processos curtos, comparada à CPU medida como o
+# `time` mede (rusage dos filhos coletados, RUSAGE_CHILDREN); para cada backend e modo de
+# contabilidade mostra a CPU vista pelas amostras durante a execução (o que a quota enxerga) e a
+# CPU cobrada depois do wait
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+BACKENDS = ["polling", "rlimit", "cgroup"]
+ACCOUNTING = ["live", "reaped"]
+# com a quota folgada do benchmark o intervalo adaptativo chegaria a 1s; fixa uma amostragem densa
+SAMPLE_INTERVAL = 0.1
+BURN = (
+    "import os, time\n"
+    "def burn(seconds):\n"
+    "    end = time.process_time() + seconds\n"
+    "    while time.process_time() < end:\n"
+    "        pass\n"
+)
+# (nome, código do binário sintético)
+SCENARIOS = [
+    ("forks-curtos", BURN + (
+        "# 60 filhos sequenciais de 15ms, cada um coletado antes do próximo (como um make -j1)\n"
+        "for _ in range(60):\n"
+        "    pid = os.fork()\n"
+        "    if pid == 0:\n"
+        "        burn(0.015)\n"
+        "        os._exit(0)\n"
+        "    os.waitpid(pid, 0)\n"
+    )),
+    ("workers", BURN + (
+        "# 4 workers de 0.25s em paralelo, coletados no fim\n"
+        "pids = []\n"
+        "for _ in range(4):\n"
+        "    pid = os.fork()\n"
+        "    if pid == 0:\n"
+        "        burn(0.25)\n"
+        "        os._exit(0)\n"
+        "    pids.append(pid)\n"
+        "for pid in pids:\n"
+        "    os.waitpid(pid, 0)\n"
+    )),
+    ("shell-exec", (
+        "#!/bin/sh\n"
+        "# 15 interpretadores lançados por um shell, como as chamadas ao compilador de um build\n"
+        "for i in 1 2 3 4 5 6 7 8 9 10 11 12 13 14 15; do\n"
+        f"    {sys.executable} -c 'import time\n"
+        "end = time.process_time() + 0.03\n"
+        "while time.process_time() < end: pass'\n"
+        "done\n"
+    )),
+]
+def write_binary(directory, name, code):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(code if code.startswith("#!") else f"#!{sys.executable}\n{code}")
+    os.chmod(path, 0o755)
+    return path
+def ground_truth(path):
+    # CPU do job inteiro como o `time` informa: rusage dos filhos coletados por este processo
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    subprocess.run([path], check=True)
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (after.ru_utime + after.ru_stime) - (before.ru_utime + before.ru_stime)
+def run_scenario(fms_instance, path):
+    # mesmo caminho do FMS.run_job: posix_spawn (ou Popen no cgroup), monitor e wait4
+    process, monitor, backend = fms_instance.start_process(path, 60, 0, None)
+    monitor.max_interval = SAMPLE_INTERVAL
+    monitor.start_monitoring()
+    process.wait()
+    monitor.stop_monitoring()
+    sampled = monitor.total_cpu_time
+    monitor.finalize(process.returncode, getattr(process, 'cpu_time', None))
+    backend.cleanup()
+    return sampled, monitor.total_cpu_time
+def error(value, truth):
+    return f"{(value - truth) / truth * 100:+.1f}%"
+def main():
+    fms_instance = fms.FMS()
+    fms_instance.remaining_cpu_quota = float("inf")
+    print(f"{'Cenário':<13} {'Backend':<9} {'Contab.':<8} {'time(s)':<8} {'Amostrado(s)':<13} {'Erro':<8} "
+          f"{'Cobrado(s)':<11} {'Erro':<8}")
+    print("-" * 84)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, code in SCENARIOS:
+            path = write_binary(directory, name, code)
+            truth = ground_truth(path)
+            for backend_name in BACKENDS:
+                for accounting in ACCOUNTING:
+                    fms_instance.enforcement_backend = backend_name
+                    fms_instance.cpu_accounting = accounting
+                    try:
+                        sampled, billed = run_scenario(fms_instance, path)
+                    except Exception as e:
+                        print(f"{name:<13} {backend_name:<9} erro: {e}")
+                        continue
+                    print(f"{name:<13} {backend_name:<9} {accounting:<8} {truth:<8.3f} {sampled:<13.3f} "
+                          f"{error(sampled, truth):<8} {billed:<11.3f} {error(billed, truth):<8}")
+                    time.sleep(0.1)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmark: latência de aplicação dos limites com jobs hostis
+# para cada backend e com/sem congelamento antes do kill, mede quanto o job passou do limite
+# (overshoot), o tempo entre a violação estimada e o kill e entre a violação e a morte de todos
+# os processos do job, além de processos que sobreviveram ao kill
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+BACKENDS = ["cgroup", "rlimit", "polling"]
+# (nome, código do binário sintético, quota de CPU, limite de memória MB, timeout)
+SCENARIOS = [
+    ("alocador", (
+        "chunks = []\n"
+        "while True:\n"
+        "    chunks.append(bytearray(8 * 1024 * 1024))  # 8MB por volta, páginas tocadas pelo zero-fill\n"
+    ), 60, 256, 30),
+    ("cpu-4-workers", (
+        "import os\n"
+        "for _ in range(3):\n"
+        "    if os.fork() == 0:\n"
+        "        break\n"
+        "while True:\n"
+        "    pass\n"
+    ), 2, 0, 30),
+    ("fork-bomb", (
+        "import os, time\n"
+        "# limitada a 512 processos para não derrubar a máquina do benchmark\n"
+        "for _ in range(9):\n"
+        "    try:\n"
+        "        os.fork()\n"
+        "    except OSError:\n"
+        "        break\n"
+        "time.sleep(600)\n"
+    ), 60, 0, 1.5),
+]
+def write_binary(directory, name, code):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(f"#!{sys.executable}\n{code}")
+    os.chmod(path, 0o755)
+    return path
+def survivors(pids):
+    # processos do job ainda vivos (e não zumbis) depois do fim da execução
+    alive = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", 'r') as f:
+                if f.read().rsplit(")", 1)[1].split()[0] != "Z":
+                    alive += 1
+        except OSError:
+            pass
+    return alive
+def job_alive(backend, pids):
+    # True enquanto algum processo do job existir; zumbis à espera do init não contam
+    if backend.cgroup_path is not None:
+        try:
+            with open(os.path.join(backend.cgroup_path, "cgroup.procs"), 'r') as f:
+                return any(line.strip() for line in f)
+        except OSError:
+            return False
+    return survivors(pids) > 0
+def run_scenario(fms_instance, path, cpu_quota, memory_limit, timeout):
+    process, monitor, backend = fms_instance.start_process(path, cpu_quota, memory_limit, timeout)
+    seen = set()
+    def collect_pids():
+        # registra os pids do job enquanto ele roda, para procurar sobreviventes no fim
+        while process.poll() is None:
+            seen.update(proc.pid for proc in monitor.process_tree)
+            time.sleep(0.05)
+    collector = threading.Thread(target=collect_pids)
+    collector.start()
+    monitor.start_monitoring()
+    process.wait()
+    seen.update(proc.pid for proc in monitor.process_tree)
+    while job_alive(backend, seen) and time.time() - monitor.start_time < timeout + 10:
+        time.sleep(0.001)
+    death_time = time.time()
+    collector.join()
+    monitor.stop_monitoring()
+    monitor.finalize(process.returncode)
+    backend.cleanup()
+    time.sleep(0.2)
+    overshoot = ""
+    if monitor.result == "MEMORY_EXCEEDED" and memory_limit:
+        overshoot = f"{monitor.max_memory_usage - memory_limit:+.1f}MB"
+    elif monitor.result == "CPU_EXCEEDED":
+        overshoot = f"{monitor.total_cpu_time - cpu_quota:+.2f}s"
+    elif monitor.result == "TIMEOUT":
+        overshoot = f"{len(seen)} procs"
+    breach = monitor.breach_time_estimate
+    kill_ms = (monitor.kill_time - breach) * 1000 if breach and monitor.kill_time else None
+    death_ms = (death_time - breach) * 1000 if breach else None
+    return monitor.result, overshoot, kill_ms, death_ms, survivors(seen)
+def fmt_ms(value):
+    return f"{value:.1f}" if value is not None else "kernel"
+def main():
+    fms_instance = fms.FMS()
+    fms_instance.remaining_cpu_quota = float("inf")
+    print(f"{'Cenário':<15} {'Backend':<9} {'Congela':<8} {'Resultado':<16} {'Overshoot':<11} "
+          f"{'Violação→kill(ms)':<18} {'Violação→morte(ms)':<19} {'Sobreviventes':<13}")
+    print("-" * 116)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, code, cpu_quota, memory_limit, timeout in SCENARIOS:
+            path = write_binary(directory, name, code)
+            for backend_name in BACKENDS:
+                for freeze in (True, False):
+                    fms.KILL_FREEZE_FIRST = freeze
+                    fms_instance.enforcement_backend = backend_name
+                    try:
+                        result, overshoot, kill_ms, death_ms, alive = run_scenario(
+                            fms_instance, path, cpu_quota, memory_limit, timeout)
+                    except Exception as e:
+                        print(f"{name:<15} {backend_name:<9} erro: {e}")
+                        continue
+                    print(f"{name:<15} {backend_name:<9} {'sim' if freeze else 'não':<8} {str(result):<16} "
+                          f"{overshoot:<11} {fmt_ms(kill_ms):<18} {fmt_ms(death_ms):<19} {alive:<13}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# benchmark: tempo de importação do módulo fms comparado ao orçamento IMPORT_TIME_BUDGET_MS
+# cada medição roda em um interpretador novo; o bytecode é compilado antes, como numa instalação
+
+import os
+import sys
+import statistics
+import subprocess
+import py_compile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from fms import IMPORT_TIME_BUDGET_MS
+
+RUNS = 15
+def import_time_ms():
+    # tempo cumulativo de "import fms" informado por -X importtime (microssegundos)
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import fms"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True).stderr
+    for line in output.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == "fms":
+            return int(fields[1]) / 1000
+    raise RuntimeError("importação do fms não encontrada na saída de -X importtime")
+def main():
+    py_compile.compile(os.path.join(ROOT, "fms.py"))
+    times = [import_time_ms() for _ in range(RUNS)]
+    median = statistics.median(times)
+    print(f"Importação do fms: mediana {median:.1f}ms, mínimo {min(times):.1f}ms, "
+          f"máximo {max(times):.1f}ms ({RUNS} execuções)")
+    print(f"Orçamento: {IMPORT_TIME_BUDGET_MS}ms -> {'OK' if median <= IMPORT_TIME_BUDGET_MS else 'EXCEDIDO'}")
+    return 0 if median <= IMPORT_TIME_BUDGET_MS else 1
+if __name__ == "__main__":
+    sys.exit(main())
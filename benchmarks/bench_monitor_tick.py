@@ -0,0 +1,79 @@
+# benchmark: custo por iteração do monitor em função do tamanho da árvore de processos
+# compara o caminho antigo (árvore reconstruída 4x, cpu_times() 2x por processo)
+# com a amostragem de retrato único (ProcessMonitor.take_sample)
+
+import os
+import sys
+import subprocess
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fms import ProcessMonitor
+
+TREE_SIZES = [1, 10, 50, 100, 200]
+TICKS = 20
+# processo pai que cria N filhos ociosos e espera
+SPAWNER = (
+    "import subprocess, sys, time\n"
+    "children = [subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(600)'])"
+    " for _ in range(int(sys.argv[1]))]\n"
+    "time.sleep(600)\n"
+)
+def old_process_tree(process):
+    # cópia fiel do ProcessMonitor antigo: árvore refeita do zero com children(recursive=True)
+    try:
+        process_tree = [process]
+        for child in process.children(recursive=True):
+            process_tree.append(child)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+    return process_tree
+def old_get_process_memory(process):
+    total_memory = 0
+    for proc in old_process_tree(process):
+        try:
+            total_memory += proc.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total_memory / (1024 * 1024)
+def old_get_process_cpu_time(process):
+    total_cpu_time = 0
+    for proc in old_process_tree(process):
+        try:
+            total_cpu_time += proc.cpu_times().user + proc.cpu_times().system
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total_cpu_time
+def old_tick(monitor):
+    # reproduz as leituras feitas por uma iteração do laço antigo
+    old_get_process_memory(monitor.process)
+    old_get_process_cpu_time(monitor.process)
+    old_get_process_memory(monitor.process)
+    old_get_process_cpu_time(monitor.process)
+def new_tick(monitor):
+    monitor.take_sample()
+def measure(monitor, tick):
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        tick(monitor)
+    return (time.perf_counter() - start) / TICKS * 1000
+def main():
+    print(f"{'Processos':<12} {'Antigo(ms)':<12} {'Novo(ms)':<12} {'Ganho':<8}")
+    print("-" * 44)
+    for size in TREE_SIZES:
+        parent = subprocess.Popen([sys.executable, "-c", SPAWNER, str(size - 1)])
+        monitor = ProcessMonitor(parent.pid, 3600, 0, None)
+        try:
+            while len(monitor.process_tree) < size:  # espera todos os filhos subirem
+                time.sleep(0.1)
+                monitor.update_process_tree()
+            old_ms = measure(monitor, old_tick)
+            new_ms = measure(monitor, new_tick)
+            print(f"{size:<12} {old_ms:<12.3f} {new_ms:<12.3f} {old_ms / new_ms:<8.1f}x")
+        finally:
+            monitor.kill_process_tree()
+            parent.wait()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmark: vazão de jobs curtos (/bin/true) pelo FMS comparada a Popen + wait puro
+# mostra jobs por segundo, a razão em relação ao Popen e a sobrecarga média que o próprio FMS
+# mede por job (FMS.mean_job_overhead)
+
+import contextlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+JOBS = 300
+BINARY = shutil.which("true") or "/bin/true"
+def bare_popen():
+    for _ in range(JOBS):
+        subprocess.Popen([BINARY]).wait()
+def bare_posix_spawn():
+    for _ in range(JOBS):
+        os.waitpid(os.posix_spawn(BINARY, [BINARY], os.environ), 0)
+def fms_pool(workers, backend, record_series):
+    def run():
+        instance = fms.FMS()
+        instance.remaining_cpu_quota = float("inf")
+        instance.max_workers = workers
+        instance.enforcement_backend = backend
+        instance.record_series = record_series
+        instance.use_profiles = False  # sem fms_profiles.json nem recusas pelo histórico
+        with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(devnull):
+            instance.series_dir = directory  # as séries não vão para a árvore do código
+            futures = [instance.submit(BINARY, 10) for _ in range(JOBS)]
+            results = [future.result() for future in futures]
+            instance.shutdown()
+        assert set(results) == {"SUCCESS"}, set(results)
+        run.overhead = instance.mean_job_overhead()
+    run.overhead = None
+    return run
+def measure(run):
+    start = time.perf_counter()
+    run()
+    return JOBS / (time.perf_counter() - start)
+def main():
+    cases = [("Popen + wait", bare_popen)]
+    if hasattr(os, "posix_spawn"):
+        cases.append(("posix_spawn + waitpid", bare_posix_spawn))
+    for backend in ["polling", "rlimit", "cgroup"]:
+        cases.append((f"FMS {backend}, 1 worker", fms_pool(1, backend, False)))
+        if fms.DEFAULT_MAX_WORKERS > 1:
+            cases.append((f"FMS {backend}, {fms.DEFAULT_MAX_WORKERS} workers",
+                          fms_pool(fms.DEFAULT_MAX_WORKERS, backend, False)))
+    cases.append(("FMS polling + séries, 1 worker", fms_pool(1, "polling", True)))
+    print(f"{'Modo':<32} {'Jobs/s':<10} {'vs Popen':<10} {'Sobrecarga FMS/job(ms)':<22}")
+    print("-" * 76)
+    baseline = None
+    for name, run in cases:
+        rate = measure(run)
+        baseline = baseline or rate
+        overhead = getattr(run, "overhead", None)
+        overhead = f"{overhead * 1000:.2f}" if overhead is not None else "-"
+        print(f"{name:<32} {rate:<10.1f} {f'{baseline / rate:.2f}x':<10} {overhead:<22}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmark: latência dos relatórios de uso conforme o histórico cresce até 1M de registros
+# compara a varredura completa do log (como show_usage_report) com o índice incremental (UsageIndex)
+
+import os
+import sys
+import json
+import time
+import random
+import datetime
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fms import UsageLedger, UsageIndex
+
+CHECKPOINTS = [10_000, 100_000, 1_000_000]
+BINARIES = [f"/opt/jobs/job_{i}" for i in range(50)]
+QUERIES = 200
+def synthetic_lines(count, start):
+    # registros no mesmo formato de CreditManager.log_usage, um por minuto
+    for i in range(count):
+        timestamp = start + datetime.timedelta(minutes=i)
+        entry = {
+            'timestamp': timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            'binary': random.choice(BINARIES),
+            'cpu_time': random.uniform(0, 10),
+            'memory_max': random.uniform(1, 500),
+            'execution_time': random.uniform(0, 20),
+            'cost': random.uniform(0, 50),
+        }
+        yield json.dumps(entry, separators=(',', ':')) + "\n"
+def full_scan_total(ledger):
+    return sum(entry['cost'] for entry in ledger.entries())
+def main():
+    random.seed(0)
+    with tempfile.TemporaryDirectory(prefix="fms_bench_") as workdir:
+        ledger_path = os.path.join(workdir, "usage.jsonl")
+        ledger = UsageLedger(ledger_path)
+        index = UsageIndex(ledger_path, os.path.join(workdir, "usage.index.json"))
+        start = datetime.datetime(2020, 1, 1)
+        written = 0
+        print(f"{'Registros':<12} {'Varredura(ms)':<15} {'log+índice(ms)':<16} {'Total(ms)':<11} {'Dia(ms)':<9}")
+        print("-" * 63)
+        for checkpoint in CHECKPOINTS:
+            with open(ledger_path, 'a') as f:  # gera o histórico sem passar pelo fsync por registro
+                f.writelines(synthetic_lines(checkpoint - written, start + datetime.timedelta(minutes=written)))
+            written = checkpoint
+            index.refresh()  # recuperação única do histórico gerado fora do log_usage
+            scan_start = time.perf_counter()
+            full_scan_total(ledger)
+            scan_ms = (time.perf_counter() - scan_start) * 1000
+            last_day = (start + datetime.timedelta(minutes=written - 1)).strftime("%Y-%m-%d")
+            append_ms = total_ms = day_ms = 0
+            for _ in range(QUERIES):
+                line = next(synthetic_lines(1, start + datetime.timedelta(minutes=written)))
+                t0 = time.perf_counter()
+                ledger.append(json.loads(line))  # caminho do log_usage: anexa e atualiza o índice
+                index.refresh()
+                t1 = time.perf_counter()
+                index.range_totals()
+                t2 = time.perf_counter()
+                index.range_totals(last_day, last_day)
+                t3 = time.perf_counter()
+                written += 1
+                append_ms += (t1 - t0) * 1000
+                total_ms += (t2 - t1) * 1000
+                day_ms += (t3 - t2) * 1000
+            print(f"{checkpoint:<12} {scan_ms:<15.1f} {append_ms / QUERIES:<16.3f} "
+                  f"{total_ms / QUERIES:<11.4f} {day_ms / QUERIES:<9.4f}")
+        ledger.close()
+if __name__ == "__main__":
+    main()
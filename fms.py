@@ -1,17 +1,33 @@
 # Integrantes do grupo: Henrique Bertochi, Tiago Pinheiro, Vicenzo Copetti
 
 import os
+import sys
 import subprocess
 import time
 import threading
-import ctypes
 import psutil
 import json
 import datetime
-from ctypes import wintypes
-import pythoncom
-import win32com.client
-import msvcrt
+import collections
+import math
+import signal
+import itertools
+import bisect
+import queue
+import sqlite3
+import argparse
+import csv
+import contextlib
+import array
+# asyncio e concurrent.futures são importados sob demanda: sozinhos dobrariam o tempo de importação
+try:
+    import resource  # apenas POSIX; usado pelo backend de setrlimit
+except ImportError:
+    resource = None
+try:
+    import fcntl  # apenas POSIX; trava de arquivo do log de uso
+except ImportError:
+    fcntl = None
 try:
     import colorama
     colorama.init()
@@ -26,134 +42,952 @@ except ImportError:
     YELLOW = '\033[93m'
     BLUE = '\033[94m'
     RESET = '\033[0m'
-kernel32 = ctypes.windll.kernel32
-class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
-    _fields_ = [
-        ("cb", wintypes.DWORD),
-        ("PageFaultCount", wintypes.DWORD),
-        ("PeakWorkingSetSize", ctypes.c_size_t),
-        ("WorkingSetSize", ctypes.c_size_t),
-        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
-        ("QuotaPagedPoolUsage", ctypes.c_size_t),
-        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
-        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
-        ("PagefileUsage", ctypes.c_size_t),
-        ("PeakPagefileUsage", ctypes.c_size_t),
-    ]
-class FILETIME(ctypes.Structure):
-    _fields_ = [
-        ("dwLowDateTime", wintypes.DWORD),
-        ("dwHighDateTime", wintypes.DWORD),
-    ]
+# orçamento do tempo de importação do módulo (ms), verificado por benchmarks/bench_import_time.py
+IMPORT_TIME_BUDGET_MS = 100
+# limites do intervalo adaptativo de amostragem (segundos)
+MIN_SAMPLE_INTERVAL = 0.05
+MAX_SAMPLE_INTERVAL = 1.0
+# margem aplicada às taxas observadas ao estimar o tempo até o próximo limite
+SAMPLE_SAFETY_FACTOR = 2.0
+# backend de aplicação de limites: "auto", "cgroup", "rlimit" ou "polling"
+ENFORCEMENT_BACKEND = "auto"
+# no Linux, jobs agendados são lançados com posix_spawn (vfork + exec, sem copiar o interpretador)
+USE_POSIX_SPAWN = sys.platform.startswith("linux") and hasattr(os, "posix_spawn")
+# congela o job (cgroup.freeze ou SIGSTOP no grupo) antes do kill, para que nada escape com fork
+KILL_FREEZE_FIRST = True
+# contabilidade de CPU sem cgroup: "reaped" soma também a CPU dos filhos já coletados por cada
+# processo do job (cutime/cstime) e a rusage do wait; "live" soma só os processos vivos na amostra
+CPU_ACCOUNTING = "reaped"
+# diretório cgroup v2 delegado onde os cgroups dos jobs são criados (None = cgroup atual)
+CGROUP_ROOT = os.environ.get("FMS_CGROUP_ROOT")
+# número padrão de jobs executados em paralelo por FMS.submit
+DEFAULT_MAX_WORKERS = os.cpu_count() or 4
+# o log de uso chama fsync a cada N registros ou após este intervalo (segundos)
+LEDGER_FSYNC_BATCH = 32
+LEDGER_FSYNC_INTERVAL = 1.0
+# o índice de relatórios é gravado em disco a cada N registros agregados
+USAGE_INDEX_SAVE_EVERY = 1000
+# máximo de operações de crédito agrupadas em uma única transação
+CREDIT_STORE_BATCH = 256
+# tamanho (créditos) dos blocos debitados durante uma execução pré-paga
+CREDIT_DEBIT_CHUNK = 1.0
+# modelo de preço da memória: "peak" (pico × duração), "integral" (MB·s medidos) ou "tiered"
+PRICING_MODEL = "integral"
+# faixas do modelo "tiered": (até MB, multiplicador do preço por MB·s); cada faixa cobra só a sua parte
+MEMORY_PRICE_TIERS = [(1024, 1.0), (4096, 1.5), (math.inf, 2.0)]
+# quadros por segundo da linha de progresso (0 desliga o progresso)
+PROGRESS_FPS = 10
+# cache de perfis por binário: entradas mantidas (LRU), execuções guardadas por entrada e
+# quantas execuções são necessárias antes de usar os percentis para recusar ou ajustar jobs
+PROFILE_CACHE_SIZE = 256
+PROFILE_HISTORY = 100
+PROFILE_MIN_RUNS = 5
+# o cache é gravado a cada N execuções registradas ou após este intervalo (segundos)
+PROFILE_SAVE_EVERY = 50
+PROFILE_SAVE_INTERVAL = 5.0
+# endereço do daemon: socket Unix ao lado do fms.py ou, sem AF_UNIX (Windows), a porta local
+DAEMON_SOCKET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fms.sock")
+DAEMON_PORT = 7878
+# permissões do socket Unix: qualquer conta local conecta, e o usuário vem das credenciais do kernel
+DAEMON_SOCKET_MODE = 0o666
+# intervalo (segundos) entre as amostras enviadas a um cliente e jobs encerrados mantidos para consulta
+DAEMON_SAMPLE_INTERVAL = 0.5
+DAEMON_JOB_HISTORY = 1000
+# capacidade da série temporal de amostras de cada execução; ao encher, a resolução cai pela metade
+SERIES_CAPACITY = 2048
+# amostra imutável de recursos compartilhada entre verificação de limites, cobrança e progresso
+ResourceSample = collections.namedtuple(
+    "ResourceSample", ["timestamp", "elapsed", "cpu_time", "memory", "n_procs"])
+# métricas internas do FMS; None enquanto desligadas, e cada ponto instrumentado custa só esse teste
+metrics = None
+class Counter:
+    # contador monotônico, opcionalmente separado por um rótulo
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.values = collections.Counter()
+        self.lock = threading.Lock()
+    def inc(self, label_value=None, amount=1):
+        with self.lock:
+            self.values[label_value] += amount
+    def prometheus_lines(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self.lock:
+            values = sorted(self.values.items(), key=lambda item: str(item[0]))
+        for label_value, value in values:
+            labels = f'{{{self.label}="{label_value}"}}' if self.label else ""
+            yield f"{self.name}{labels} {value}"
+    def to_dict(self):
+        with self.lock:
+            if self.label:
+                return {str(label_value): value for label_value, value in self.values.items()}
+            return self.values[None]
+class Histogram:
+    # histograma com baldes fixos no formato do Prometheus (contagens acumuladas no export)
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # o último balde é +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+    def cumulative(self):
+        with self.lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+        return list(zip(self.buckets + [math.inf], itertools.accumulate(counts))), count, total
+    def prometheus_lines(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        buckets, count, total = self.cumulative()
+        for bound, value in buckets:
+            yield f'{self.name}_bucket{{le="{"+Inf" if bound == math.inf else repr(bound)}"}} {value}'
+        yield f"{self.name}_sum {total}"
+        yield f"{self.name}_count {count}"
+    def to_dict(self):
+        buckets, count, total = self.cumulative()
+        return {'count': count, 'sum': total,
+                'buckets': {("+Inf" if bound == math.inf else repr(bound)): value for bound, value in buckets}}
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+LAG_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+PROCESS_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+class MetricsRegistry:
+    # conjunto fixo de métricas do FMS, exportado em texto do Prometheus ou em JSON
+    def __init__(self):
+        self.tick_seconds = Histogram(
+            "fms_monitor_tick_seconds", "Duração de uma iteração do monitor.", LATENCY_BUCKETS)
+        self.sample_seconds = Histogram(
+            "fms_sample_seconds", "Tempo para amostrar CPU e memória da árvore de processos.", LATENCY_BUCKETS)
+        self.sample_processes = Histogram(
+            "fms_sample_processes", "Processos encontrados em cada amostra.", PROCESS_BUCKETS)
+        self.enforcement_lag_seconds = Histogram(
+            "fms_enforcement_lag_seconds", "Atraso entre a violação estimada de um limite e o kill.", LAG_BUCKETS)
+        self.kills = Counter("fms_kills_total", "Processos encerrados por motivo.", "reason")
+        self.jobs = Counter("fms_jobs_total", "Execuções concluídas por código de resultado.", "result")
+        self.ledger_write_seconds = Histogram(
+            "fms_ledger_write_seconds", "Latência de escrita no log de uso.", LATENCY_BUCKETS)
+        self.credit_write_seconds = Histogram(
+            "fms_credit_write_seconds", "Latência das escritas no banco de créditos.", LATENCY_BUCKETS)
+        self.job_overhead_seconds = Histogram(
+            "fms_job_overhead_seconds", "Tempo por job gasto pelo FMS fora da vida do processo.", LATENCY_BUCKETS)
+        self.metrics = [self.tick_seconds, self.sample_seconds, self.sample_processes,
+                        self.enforcement_lag_seconds, self.kills, self.jobs, self.job_overhead_seconds,
+                        self.ledger_write_seconds, self.credit_write_seconds]
+        self.server = None
+    def record_kill(self, reason, lag=None):
+        self.kills.inc(reason)
+        if lag is not None:
+            self.enforcement_lag_seconds.observe(max(lag, 0))
+    def prometheus_text(self):
+        return "\n".join(line for metric in self.metrics for line in metric.prometheus_lines()) + "\n"
+    def to_dict(self):
+        return {metric.name: metric.to_dict() for metric in self.metrics}
+    def dump_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+    def serve(self, port, host="127.0.0.1"):
+        # expõe /metrics (Prometheus) e /metrics.json em uma thread; apenas na interface local
+        import http.server
+        registry = self
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.prometheus_text(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.to_dict()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            def log_message(self, format, *args):
+                pass
+        self.server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self.server.server_address[1]
+def enable_metrics():
+    # liga a coleta de métricas (idempotente) e devolve o registro global
+    global metrics
+    if metrics is None:
+        metrics = MetricsRegistry()
+    return metrics
+class ProcessTreeTracker:
+    # rastreia incrementalmente os descendentes de um processo, reaproveitando os objetos psutil
+    def __init__(self, root, cgroup_path=None):
+        self.root = root
+        self.cgroup_path = cgroup_path  # diretório do cgroup dedicado ao job, se houver
+        self.processes = {root.pid: root}  # pid -> psutil.Process
+        self.use_proc_children = os.path.exists(f"/proc/{root.pid}/task/{root.pid}/children")
+    def read_cgroup_pids(self):
+        # membros do cgroup do job (cgroup.procs)
+        with open(os.path.join(self.cgroup_path, "cgroup.procs"), 'r') as f:
+            return {int(line) for line in f if line.strip()}
+    def read_proc_children_pids(self):
+        # percorre /proc/<pid>/task/<tid>/children a partir da raiz: custo proporcional ao job
+        pids = set()
+        stack = [self.root.pid]
+        while stack:
+            pid = stack.pop()
+            if pid in pids:
+                continue
+            pids.add(pid)
+            try:
+                for tid in os.listdir(f"/proc/{pid}/task"):
+                    with open(f"/proc/{pid}/task/{tid}/children", 'r') as f:
+                        stack.extend(int(child) for child in f.read().split())
+            except (FileNotFoundError, ProcessLookupError):
+                pass  # processo ou thread terminou durante a leitura
+        return pids
+    def list_member_pids(self):
+        # obtém os pids do job pelo meio mais barato disponível
+        if self.cgroup_path:
+            try:
+                return self.read_cgroup_pids()
+            except OSError:
+                self.cgroup_path = None  # cgroup removido ou inacessível
+        if self.use_proc_children:
+            return self.read_proc_children_pids()
+        return {self.root.pid} | {child.pid for child in self.root.children(recursive=True)}
+    def update(self):
+        # adiciona os novos descendentes, remove os mortos e devolve a árvore atual
+        member_pids = self.list_member_pids()
+        member_pids.add(self.root.pid)
+        for pid in list(self.processes):
+            if pid not in member_pids:
+                del self.processes[pid]
+        root_create_time = self.root.create_time()
+        for pid in member_pids:
+            if pid in self.processes:
+                continue
+            try:
+                proc = psutil.Process(pid)
+                if proc.create_time() >= root_create_time:  # descarta pid reutilizado
+                    self.processes[pid] = proc
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return list(self.processes.values())
+class PlatformBackend:
+    # operações dependentes do sistema operacional; os módulos de cada SO são importados sob demanda
+    def enter_pressed(self):
+        # True se o usuário pressionou Enter desde a última verificação
+        return False
+    def resolve_shortcut(self, path):
+        # caminho real de um atalho (.lnk); só existe no Windows
+        raise OSError("atalhos .lnk só podem ser resolvidos no Windows")
+    def process_metrics(self, proc, include_children=False):
+        # (RSS em bytes, tempo de CPU em segundos) de um processo; include_children soma a CPU
+        # dos filhos que ele já coletou com wait
+        with proc.oneshot():  # agrupa as leituras do processo numa única consulta ao SO
+            rss = proc.memory_info().rss
+            cpu_times = proc.cpu_times()
+        cpu_time = cpu_times.user + cpu_times.system
+        if include_children:
+            cpu_time += getattr(cpu_times, 'children_user', 0) + getattr(cpu_times, 'children_system', 0)
+        return rss, cpu_time
+class WindowsPlatform(PlatformBackend):
+    def enter_pressed(self):
+        import msvcrt
+        while msvcrt.kbhit():
+            if msvcrt.getch() == b'\r':  # ENTER
+                return True
+        return False
+    shell = None
+    def resolve_shortcut(self, path):
+        # o COM só é carregado quando um atalho precisa ser resolvido, e o objeto é reaproveitado
+        if self.shell is None:
+            import win32com.client
+            self.shell = win32com.client.Dispatch("WScript.Shell")
+        return self.shell.CreateShortCut(path).Targetpath
+class PosixPlatform(PlatformBackend):
+    def enter_pressed(self):
+        # com o terminal em modo canônico, Enter torna uma linha disponível em stdin
+        import select
+        if sys.stdin is None or not sys.stdin.isatty():
+            return False
+        readable, _, _ = select.select([sys.stdin], [], [], 0)
+        if readable:
+            sys.stdin.readline()
+            return True
+        return False
+class LinuxPlatform(PosixPlatform):
+    # métricas lidas diretamente de /proc/<pid>/stat e statm, sem a sobrecarga dos objetos psutil
+    def __init__(self):
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+    def process_metrics(self, proc, include_children=False):
+        try:
+            with open(f"/proc/{proc.pid}/stat", 'rb') as f:
+                stat = f.read()
+            with open(f"/proc/{proc.pid}/statm", 'rb') as f:
+                statm = f.read()
+        except (FileNotFoundError, ProcessLookupError):
+            raise psutil.NoSuchProcess(proc.pid)
+        # o nome do processo pode conter espaços: os campos começam após o último ')'
+        fields = stat[stat.rindex(b')') + 2:].split()
+        cpu_ticks = int(fields[11]) + int(fields[12])  # utime + stime
+        if include_children:
+            cpu_ticks += int(fields[13]) + int(fields[14])  # cutime + cstime
+        cpu_time = cpu_ticks / self.clock_ticks
+        rss = int(statm.split()[1]) * self.page_size
+        return rss, cpu_time
+platform_backend = None
+def get_platform():
+    # cria o backend do sistema atual na primeira utilização
+    global platform_backend
+    if platform_backend is None:
+        if os.name == "nt":
+            platform_backend = WindowsPlatform()
+        elif sys.platform.startswith("linux"):
+            platform_backend = LinuxPlatform()
+        else:
+            platform_backend = PosixPlatform()
+    return platform_backend
+def switch_user(preexec_fn, name, uid, gid):
+    # preexec_fn que aplica os limites do backend (cgroup, setrlimit) ainda com os privilégios do
+    # daemon e só então troca para a conta do usuário, antes do exec
+    def preexec():
+        if preexec_fn is not None:
+            preexec_fn()
+        os.initgroups(name, gid)
+        os.setgid(gid)
+        os.setuid(uid)
+    return preexec
+class SpawnedProcess:
+    # processo lançado com os.posix_spawn, com a parte da interface do Popen usada pelo FMS
+    # coletado com wait4: cpu_time é a CPU do processo e de todos os descendentes que ele coletou
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+        self.cpu_time = None
+    def reap(self, options):
+        pid, status, rusage = os.wait4(self.pid, options)
+        if pid:
+            self.returncode = os.waitstatus_to_exitcode(status)
+            self.cpu_time = rusage.ru_utime + rusage.ru_stime
+    def poll(self):
+        if self.returncode is None:
+            self.reap(os.WNOHANG)
+        return self.returncode
+    def wait(self):
+        if self.returncode is None:
+            self.reap(0)
+        return self.returncode
+class PollingBackend:
+    # backend portátil: os limites são verificados apenas pelo ProcessMonitor
+    name = "polling"
+    cgroup_path = None
+    def __init__(self, cpu_quota, memory_limit):
+        self.cpu_quota = cpu_quota
+        self.memory_limit = memory_limit
+    def popen_kwargs(self):
+        # argumentos extras para o subprocess.Popen; no POSIX o job ganha sessão e grupo próprios
+        return {"start_new_session": True} if os.name == "posix" else {}
+    def spawn(self, binary_path):
+        # lança o job com posix_spawn em sessão própria; None quando só o Popen serve
+        if not USE_POSIX_SPAWN:
+            return None
+        pid = os.posix_spawn(binary_path, [binary_path], os.environ, setsid=True)
+        self.after_spawn(pid)
+        return SpawnedProcess(pid)
+    def after_spawn(self, pid):
+        pass
+    def freeze_job(self, pid):
+        # para todo o grupo do job com SIGSTOP: processos parados não criam filhos
+        if os.name == "posix":
+            try:
+                os.killpg(pid, signal.SIGSTOP)
+            except OSError:
+                pass
+    def kill_job(self, pid):
+        # SIGKILL no grupo inteiro; devolve True apenas se o kernel garante que nada escapou
+        if os.name == "posix":
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        return False  # quem saiu do grupo (setsid) ainda precisa ser morto pela árvore
+    def read_usage(self):
+        # (cpu_time, memória MB, nº de processos) lidos do kernel, ou None para somar por processo;
+        # memória None quando só a CPU vem do kernel
+        return None
+    def read_cpu_time(self):
+        # tempo de CPU acumulado pelo kernel para todo o job, ou None
+        return None
+    def read_peak_memory(self):
+        # pico de memória registrado pelo kernel (MB), ou None
+        return None
+    def classify_exit(self, returncode):
+        # código de resultado quando o kernel encerrou o processo por um limite, ou None
+        return None
+    def kernel_limit(self):
+        # código do limite já aplicado pelo kernel durante a execução, ou None
+        return None
+    def cleanup(self):
+        pass
+class RlimitBackend(PollingBackend):
+    # quota de CPU aplicada pelo kernel via setrlimit no processo filho (herdada pelos netos)
+    # a memória continua verificada pelo monitor: RLIMIT_AS limita memória virtual e faz a
+    # alocação falhar sem matar o processo, o que não permitiria devolver MEMORY_EXCEEDED
+    name = "rlimit"
+    def apply_limits(self):
+        # executado no filho entre o fork e o exec
+        cpu_limit = math.ceil(self.cpu_quota)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+    def popen_kwargs(self):
+        return dict(super().popen_kwargs(), preexec_fn=self.apply_limits)
+    def spawn(self, binary_path):
+        if not hasattr(resource, "prlimit"):
+            return None
+        return super().spawn(binary_path)
+    def after_spawn(self, pid):
+        # sem preexec no posix_spawn: o limite é aplicado pelo pai logo após o lançamento
+        cpu_limit = math.ceil(self.cpu_quota)
+        try:
+            resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+        except ProcessLookupError:
+            pass  # o job já terminou
+    def classify_exit(self, returncode):
+        if returncode == -signal.SIGXCPU:
+            return "CPU_EXCEEDED"
+        return None
+class CgroupBackend(PollingBackend):
+    # coloca o job em um cgroup v2 dedicado com memory.max e lê os contadores do cgroup
+    name = "cgroup"
+    counter = itertools.count()
+    def __init__(self, cpu_quota, memory_limit):
+        super().__init__(cpu_quota, memory_limit)
+        parent = CGROUP_ROOT or find_cgroup2_dir()
+        if parent is None:
+            raise OSError("cgroup v2 não disponível")
+        self.cgroup_path = os.path.join(parent, f"fms-{os.getpid()}-{next(self.counter)}")
+        os.mkdir(self.cgroup_path)
+        try:
+            if memory_limit:
+                # sem o controlador de memória não há memory.max: o limite não seria aplicado
+                self.write_file("memory.max", str(int(memory_limit * 1024 * 1024)))
+                # no OOM o kernel mata o job inteiro, como o kill do monitor, e não só uma tarefa
+                self.write_file("memory.oom.group", "1")
+                if os.path.exists(self.path("memory.swap.max")):
+                    self.write_file("memory.swap.max", "0")
+        except OSError:
+            os.rmdir(self.cgroup_path)
+            raise
+    def path(self, name):
+        return os.path.join(self.cgroup_path, name)
+    def write_file(self, name, value):
+        with open(self.path(name), 'w') as f:
+            f.write(value)
+    def read_keyed_file(self, name):
+        # lê arquivos no formato "chave valor" (cpu.stat, memory.events)
+        values = {}
+        with open(self.path(name), 'r') as f:
+            for line in f:
+                key, value = line.split()
+                values[key] = int(value)
+        return values
+    def join_cgroup(self):
+        # executado no filho entre o fork e o exec: "0" move o próprio processo
+        self.write_file("cgroup.procs", "0")
+    def popen_kwargs(self):
+        return dict(super().popen_kwargs(), preexec_fn=self.join_cgroup)
+    def spawn(self, binary_path):
+        return None  # o filho precisa entrar no cgroup antes do exec
+    def freeze_job(self, pid):
+        # cgroup.freeze congela todos os membros de uma vez, inclusive os que saíram do grupo
+        try:
+            self.write_file("cgroup.freeze", "1")
+        except OSError:
+            super().freeze_job(pid)
+    def kill_job(self, pid):
+        # cgroup.kill mata todos os membros atomicamente, inclusive filhos criados durante o kill
+        try:
+            self.write_file("cgroup.kill", "1")
+            return True
+        except OSError:
+            pass
+        try:  # kernel sem cgroup.kill: mata cada membro (congelados, eles não criam novos filhos)
+            with open(self.path("cgroup.procs"), 'r') as f:
+                members = [int(line) for line in f if line.strip()]
+        except OSError:
+            return super().kill_job(pid)
+        for member in members:
+            try:
+                os.kill(member, signal.SIGKILL)
+            except OSError:
+                pass
+        return True
+    def read_cpu_time(self):
+        try:
+            return self.read_keyed_file("cpu.stat")["usage_usec"] / 1e6
+        except (OSError, KeyError, ValueError):
+            return None
+    def read_usage(self):
+        try:
+            cpu_time = self.read_keyed_file("cpu.stat")["usage_usec"] / 1e6
+            with open(self.path("cgroup.procs"), 'r') as f:
+                n_procs = sum(1 for line in f if line.strip())
+            if not os.path.exists(self.path("memory.current")):
+                return cpu_time, None, n_procs  # sem controlador de memória: só a memória vem do RSS
+            with open(self.path("memory.current"), 'r') as f:
+                memory = int(f.read()) / (1024 * 1024)
+            return cpu_time, memory, n_procs
+        except (OSError, KeyError, ValueError):
+            return None
+    def read_peak_memory(self):
+        try:
+            with open(self.path("memory.peak"), 'r') as f:
+                return int(f.read()) / (1024 * 1024)
+        except (OSError, ValueError):
+            return None
+    def classify_exit(self, returncode):
+        return self.kernel_limit()
+    def kernel_limit(self):
+        # um oom_kill no cgroup significa que o job passou de memory.max
+        if not self.memory_limit:
+            return None
+        try:
+            if self.read_keyed_file("memory.events").get("oom_kill", 0) > 0:
+                return "MEMORY_EXCEEDED"
+        except (OSError, ValueError):
+            pass
+        return None
+    def cleanup(self):
+        # membros mortos por kill ainda podem estar saindo: espera o cgroup esvaziar (até 1s)
+        for _ in range(1000):
+            try:
+                os.rmdir(self.cgroup_path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                time.sleep(0.001)
+def find_cgroup2_dir():
+    # diretório cgroup v2 do processo atual, se o cgroup v2 estiver montado
+    try:
+        with open("/proc/self/cgroup", 'r') as f:
+            relative = next((line[3:].strip() for line in f if line.startswith("0::")), None)
+    except OSError:
+        return None
+    if relative is None:
+        return None
+    for mount in ("/sys/fs/cgroup", "/sys/fs/cgroup/unified"):
+        if os.path.exists(os.path.join(mount, "cgroup.controllers")):
+            return os.path.join(mount, relative.lstrip("/"))
+    return None
+def create_enforcement_backend(cpu_quota, memory_limit, backend=ENFORCEMENT_BACKEND):
+    # escolhe o backend de limites; "auto" tenta cgroup, depois setrlimit e por fim polling
+    if backend in ("auto", "cgroup") and os.name == "posix":
+        try:
+            return CgroupBackend(cpu_quota, memory_limit)
+        except OSError:
+            if backend == "cgroup":
+                print(f"{YELLOW}Aviso: cgroup v2 indisponível, usando monitoramento por polling.{RESET}")
+    if backend in ("auto", "rlimit") and resource is not None:
+        return RlimitBackend(cpu_quota, memory_limit)
+    return PollingBackend(cpu_quota, memory_limit)
+class SampleSeries:
+    # série temporal (t, cpu, rss, n_procs) em colunas array pré-alocadas; memória fixa por execução
+    COLUMNS = (("t", "d"), ("cpu", "d"), ("rss", "d"), ("n_procs", "I"))
+    def __init__(self, capacity=SERIES_CAPACITY):
+        self.capacity = max(capacity - capacity % 2, 2)
+        self.columns = [array.array(code, bytes(array.array(code).itemsize * self.capacity))
+                        for _, code in self.COLUMNS]
+        self.size = 0
+        self.stride = 1  # amostras recebidas por ponto armazenado
+        self.pending = 0  # amostras já agregadas no ponto em construção
+    def record(self, sample):
+        # O(1): agrega a amostra no ponto atual, preservando o pico de RSS e de processos
+        t, cpu, rss, n_procs = self.columns
+        i = self.size
+        if self.pending == 0:
+            t[i] = sample.elapsed
+            rss[i] = sample.memory
+            n_procs[i] = sample.n_procs
+        else:
+            if sample.memory > rss[i]:
+                rss[i] = sample.memory
+            if sample.n_procs > n_procs[i]:
+                n_procs[i] = sample.n_procs
+        cpu[i] = sample.cpu_time  # CPU é acumulada: vale a última leitura do ponto
+        self.pending += 1
+        if self.pending == self.stride:
+            self.pending = 0
+            self.size += 1
+            if self.size == self.capacity:
+                self.downsample()
+    def downsample(self):
+        # junta pares de pontos vizinhos e dobra o passo; acontece log2(n / capacidade) vezes
+        t, cpu, rss, n_procs = self.columns
+        for i in range(self.size // 2):
+            a, b = 2 * i, 2 * i + 1
+            t[i] = t[a]
+            cpu[i] = cpu[b]
+            rss[i] = max(rss[a], rss[b])
+            n_procs[i] = max(n_procs[a], n_procs[b])
+        self.size //= 2
+        self.stride *= 2
+    def clear(self):
+        # esvazia a série sem liberar as colunas (monitores reaproveitados)
+        self.size = 0
+        self.stride = 1
+        self.pending = 0
+    def __len__(self):
+        return self.size + (1 if self.pending else 0)
+    def export(self, path, metadata=None):
+        # grava um cabeçalho JSON em uma linha seguido dos bytes de cada coluna, uma após a outra
+        count = len(self)
+        header = dict(metadata or {})
+        header.update({
+            'count': count,
+            'stride': self.stride,
+            'byteorder': sys.byteorder,
+            'columns': [[name, code] for name, code in self.COLUMNS],
+        })
+        with open(path, 'wb') as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            for column in self.columns:
+                f.write(column[:count].tobytes())
+        return path
+def load_series(path):
+    # lê um arquivo gravado por SampleSeries.export; devolve (cabeçalho, {coluna: array})
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        columns = {}
+        for name, code in header['columns']:
+            column = array.array(code)
+            column.frombytes(f.read(column.itemsize * header['count']))
+            if header['byteorder'] != sys.byteorder:
+                column.byteswap()
+            columns[name] = column
+    return header, columns
 class ProcessMonitor:
     # classe responsável por monitorar recursos de um processo
-    def __init__(self, pid, cpu_quota, memory_limit, timeout):
+    def __init__(self, pid, cpu_quota, memory_limit, timeout, cgroup_path=None,
+                 min_interval=MIN_SAMPLE_INTERVAL, max_interval=MAX_SAMPLE_INTERVAL, backend=None,
+                 reservation=None, pricing=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.wakeup = threading.Event()  # acorda o monitor antes do fim do intervalo
+        self.messages = collections.deque()  # avisos do monitor, impressos fora da thread de monitoramento
+        self.series = SampleSeries()  # histórico das amostras, exportado ao fim da execução
+        self.kill_lock = threading.Lock()  # ordena o kill e a coleta do processo principal
+        self.reset(pid, cpu_quota, memory_limit, timeout, cgroup_path, backend, reservation, pricing)
+    def reset(self, pid, cpu_quota, memory_limit, timeout, cgroup_path=None, backend=None,
+              reservation=None, pricing=None):
+        # (re)inicia o monitor para um novo processo, reaproveitando série, fila e evento
         self.pid = pid
+        self.child = None  # objeto do processo lançado (Popen, SpawnedProcess ou asyncio), com o returncode
         self.cpu_quota = cpu_quota  # tempo de CPU em segundos
         self.memory_limit = memory_limit  # limite de memória em MB
         self.timeout = timeout  # timeout em segundos
         self.start_time = time.time()
-        self.process = psutil.Process(pid)
+        self.backend = backend or PollingBackend(cpu_quota, memory_limit)
+        try:
+            self.process = psutil.Process(pid)
+            self.tree_tracker = ProcessTreeTracker(self.process, cgroup_path or self.backend.cgroup_path)
+        except psutil.NoSuchProcess:
+            # o job terminou e já foi coletado (pelo child watcher do asyncio) antes de o monitor
+            # existir: não há nada a amostrar e o resultado sai do returncode em finalize
+            self.process = None
+            self.tree_tracker = None
         self.max_memory_usage = 0
         self.total_cpu_time = 0
-        self.monitoring = True
+        self.monitoring = self.process is not None
         self.killed = False
+        self.result = None
+        self.last_sample = None
+        self.previous_sample = None
+        self.reservation = reservation  # reserva de créditos no modo pré-pago
+        self.cost = CostAccumulator(pricing) if pricing is not None else None  # custo da execução
+        self.last_cost = 0
+        self.previous_cost = 0
+        self.freeze_on_kill = KILL_FREEZE_FIRST
+        self.count_reaped = CPU_ACCOUNTING == "reaped"
+        self.breach_time_estimate = None  # instante estimado da violação do limite que causou o kill
+        self.kill_time = None
+        self.wakeup.clear()
+        self.messages.clear()
+        self.series.clear()
         self.process_tree = []
         self.update_process_tree()
     def update_process_tree(self):
         # atualiza a árvore de processos filho
+        if self.tree_tracker is None:
+            return
         try:
-            self.process_tree = [self.process]
-            for child in self.process.children(recursive=True):
-                self.process_tree.append(child)
+            self.process_tree = self.tree_tracker.update()
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             pass
-    def get_process_memory(self):
-        # obtém o uso de memória do processo e seus filhos
-        total_memory = 0
+    def take_sample(self):
+        # tira um único retrato da árvore e lê memória e CPU de cada processo uma vez
+        usage = self.backend.read_usage()
+        if usage is not None and usage[1] is not None:  # contadores agregados do kernel (cgroup)
+            current_time = time.time()
+            cpu_time, memory, n_procs = usage
+            return ResourceSample(current_time, current_time - self.start_time,
+                                  max(cpu_time, self.total_cpu_time), memory, n_procs)
         self.update_process_tree()
-        for proc in self.process_tree:
-            try:
-                total_memory += proc.memory_info().rss
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        return total_memory / (1024 * 1024)  # converte para MB
-    def get_process_cpu_time(self):
-        # obtém o tempo total de CPU do processo e seus filhos
+        total_memory = 0
         total_cpu_time = 0
-        self.update_process_tree()
+        n_procs = 0
+        process_metrics = get_platform().process_metrics
         for proc in self.process_tree:
             try:
-                total_cpu_time += proc.cpu_times().user + proc.cpu_times().system
+                rss, cpu_time = process_metrics(proc, self.count_reaped)
+                total_memory += rss
+                total_cpu_time += cpu_time
+                n_procs += 1
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 pass
-        return total_cpu_time
+        if usage is not None:
+            total_cpu_time, n_procs = usage[0], usage[2]  # CPU exata do cpu.stat, memória pela soma do RSS
+        current_time = time.time()
+        # contador monotônico: a CPU de quem saiu da árvore (ex.: órfão coletado pelo init) não é
+        # devolvida à quota quando o processo deixa de aparecer na amostra
+        return ResourceSample(current_time, current_time - self.start_time,
+                              max(total_cpu_time, self.total_cpu_time), total_memory / (1024 * 1024), n_procs)
     def is_process_running(self):
         # verifica se o processo principal ainda está em execução
+        if self.process is None:
+            return False
         try:
             return self.process.is_running()
         except psutil.NoSuchProcess:
             return False
     def kill_process_tree(self):
-        # mata o processo e todos os seus filhos
-        self.update_process_tree()
-        for proc in reversed(self.process_tree):  # mata do filho para o pai
+        # mata o job inteiro com um único cgroup.kill ou killpg; a árvore é percorrida só quando o
+        # kernel não garante o kill completo (cobre quem saiu do grupo e o Windows)
+        with self.kill_lock:
+            if self.child is not None and self.child.returncode is not None:
+                return  # líder já coletado: o pid e o grupo podem pertencer a outro processo
+            escaped = self.process_tree  # árvore da última amostra
+            if self.freeze_on_kill:
+                self.backend.freeze_job(self.pid)
+                if self.backend.cgroup_path is None:
+                    # congelada a árvore não cresce: a varredura antes do kill encontra todos os netos
+                    self.update_process_tree()
+                    escaped = self.process_tree
+            if not self.backend.kill_job(self.pid):
+                posix = os.name == "posix"
+                for proc in reversed(escaped):  # mata do filho para o pai
+                    try:
+                        if posix and os.getpgid(proc.pid) == self.pid:
+                            continue  # já atingido pelo killpg
+                        proc.kill()
+                    except (OSError, psutil.NoSuchProcess, psutil.AccessDenied):
+                        pass
+            self.killed = True
+            self.kill_time = time.time()
+    def wait_child(self):
+        # espera o fim do processo principal e o coleta com o kill bloqueado: até a coleta o pid e o
+        # grupo seguem reservados (zumbi), depois dela podem ser reutilizados por outro processo
+        if hasattr(os, "waitid"):
             try:
-                proc.kill()
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                os.waitid(os.P_PID, self.child.pid, os.WEXITED | os.WNOWAIT)  # espera sem coletar
+            except ChildProcessError:
                 pass
+            with self.kill_lock:
+                return self.child.wait()
+        return self.child.wait()  # Windows: o handle do Popen mantém o processo reservado
+    def finalize(self, returncode, reaped_cpu_time=None):
+        # consolida o pico de memória e identifica encerramentos feitos pelo kernel
+        # reaped_cpu_time: CPU informada pelo wait (rusage), que inclui os descendentes coletados
+        for cpu_time in (self.backend.read_cpu_time(), reaped_cpu_time if self.count_reaped else None):
+            if cpu_time is not None and cpu_time > self.total_cpu_time:
+                self.total_cpu_time = cpu_time  # inclui a CPU gasta após a última amostra
+        peak = self.backend.read_peak_memory()
+        if peak is not None and peak > self.max_memory_usage:
+            self.max_memory_usage = peak
+        if self.cost is not None:
+            self.cost.finish(self.total_cpu_time, self.max_memory_usage, time.time() - self.start_time)
+            self.last_cost = self.cost.total()
+        result = self.backend.classify_exit(returncode)
+        if result and not self.killed:
+            self.notify(f"\033[91mProcesso encerrado pelo kernel: {result}\033[0m")
+            self.killed = True
+            self.result = result
+            if metrics is not None:
+                metrics.record_kill(result)  # aplicado pelo próprio kernel, sem atraso mensurável
+        return self.result
+    def record_sample(self, sample):
+        # atualiza os acumuladores do monitor com a amostra recebida
+        if sample.memory > self.max_memory_usage:
+            self.max_memory_usage = sample.memory
+        self.total_cpu_time = sample.cpu_time
+        self.last_sample = sample
+        self.series.record(sample)
+        if self.cost is not None:
+            self.cost.add(sample)
+            self.last_cost = self.cost.total()
+    def check_limits(self, sample):
+        # verifica os limites com base na amostra; retorna o código do limite violado ou None
+        result = self.backend.kernel_limit()
+        if result:
+            # o kernel já matou parte do job (OOM): encerra o restante agora, sem esperar o fim
+            self.notify(f"\033[91mProcesso encerrado pelo kernel: {result}\033[0m")
+            return result
+        if self.reservation is not None:
+            execution_cost = self.last_cost  # já acumulado por record_sample
+            if not self.reservation.charge(execution_cost):
+                self.notify("\033[91mCRÉDITOS ESGOTADOS DURANTE A EXECUÇÃO!\033[0m")
+                self.notify(
+                    f"\033[91mCusto atual: {execution_cost:.2f} créditos | Créditos reservados: {self.reservation.kill_threshold:.2f}\033[0m")
+                return "NO_CREDITS"
+        if self.memory_limit and sample.memory > self.memory_limit:
+            self.notify(
+                f"\033[91mProcesso excedeu o limite de memória: {sample.memory:.2f}MB > {self.memory_limit:.2f}MB\033[0m")
+            return "MEMORY_EXCEEDED"
+        if sample.cpu_time > self.cpu_quota:
+            self.notify(
+                f"\033[91mProcesso excedeu a quota de CPU: {sample.cpu_time:.2f}s > {self.cpu_quota:.2f}s\033[0m")
+            return "CPU_EXCEEDED"
+        return None  # o timeout é aplicado pelo timer (on_timeout)
+    def next_sample_interval(self, sample):
+        # calcula quando amostrar de novo a partir da folga restante em cada limite
+        previous = self.previous_sample
+        previous_cost = self.previous_cost
+        self.previous_sample = sample
+        self.previous_cost = self.last_cost
+        if previous is None or sample.timestamp <= previous.timestamp:
+            return self.min_interval
+        dt = sample.timestamp - previous.timestamp
+        horizons = [self.max_interval]
+        # CPU: supõe no mínimo um núcleo ocupado para não dormir demais em jobs ociosos
+        cpu_rate = max((sample.cpu_time - previous.cpu_time) / dt, 1.0) * SAMPLE_SAFETY_FACTOR
+        horizons.append((self.cpu_quota - sample.cpu_time) / cpu_rate)
+        if self.memory_limit:
+            memory_headroom = self.memory_limit - sample.memory
+            memory_rate = (sample.memory - previous.memory) / dt * SAMPLE_SAFETY_FACTOR
+            if memory_headroom < self.memory_limit * 0.1:
+                horizons.append(0)  # perto do limite: amostra no intervalo mínimo
+            elif memory_rate > 0:
+                horizons.append(memory_headroom / memory_rate)
+        if self.reservation is not None:
+            cost_rate = (self.last_cost - previous_cost) / dt * SAMPLE_SAFETY_FACTOR
+            if cost_rate > 0:
+                horizons.append((self.reservation.kill_threshold - self.last_cost) / cost_rate)
+        return min(max(min(horizons), self.min_interval), self.max_interval)
+    def on_timeout(self):
+        # chamado no prazo do timeout, sem depender do intervalo de amostragem
+        elapsed_time = time.time() - self.start_time
+        self.notify(
+            f"\033[91mProcesso excedeu o timeout: {elapsed_time:.2f}s >= {self.timeout:.2f}s\033[0m")
+        self.breach_time_estimate = self.start_time + self.timeout
+        self.kill_process_tree()
+        self.result = "TIMEOUT"
+        if metrics is not None:
+            metrics.record_kill("TIMEOUT", self.kill_time - self.breach_time_estimate)
+    def fail(self, error):
+        # o monitoramento falhou: sem amostras nenhum limite vale, então o job é encerrado com ERROR
+        self.notify(f"\033[91mErro no monitoramento: {str(error)}\033[0m")
+        try:
+            self.kill_process_tree()
+        except Exception as e:
+            self.notify(f"\033[91mErro ao encerrar o processo: {str(e)}\033[0m")
         self.killed = True
+        self.result = "ERROR"
+    def notify(self, message):
+        # enfileira um aviso; a thread de monitoramento nunca escreve no terminal
+        self.messages.append(message)
+    def flush_messages(self, stream=None):
+        # imprime os avisos pendentes na thread de quem chama
+        while self.messages:
+            print(self.messages.popleft(), file=stream or sys.stdout)
+    def progress_line(self, sample):
+        # texto da linha de progresso a partir da amostra (desenhado pelo ProgressRenderer)
+        cpu_percent = sample.cpu_time / self.cpu_quota * 100 if self.cpu_quota else 0
+        memory = f"Memória={sample.memory:.2f}MB"
+        if self.memory_limit:
+            memory += f"/{self.memory_limit:.2f}MB ({sample.memory / self.memory_limit * 100:.1f}%)"
+        return (f"Progresso: CPU={sample.cpu_time:.2f}s/{self.cpu_quota:.2f}s ({cpu_percent:.1f}%), {memory}, "
+                f"Tempo={sample.elapsed:.2f}s/{self.timeout if self.timeout else 'inf'}s")
+    def breach_time(self, result, sample):
+        # instante estimado em que o limite foi cruzado, interpolando entre as duas últimas amostras
+        previous = self.previous_sample
+        if result == "CPU_EXCEEDED":
+            limit, before, after = self.cpu_quota, previous and previous.cpu_time, sample.cpu_time
+        elif result == "MEMORY_EXCEEDED":
+            limit, before, after = self.memory_limit, previous and previous.memory, sample.memory
+        elif result == "NO_CREDITS":
+            limit, before, after = self.reservation.kill_threshold, self.previous_cost, self.last_cost
+        else:
+            return sample.timestamp
+        if previous is None or after <= before:
+            return sample.timestamp
+        fraction = min(max((limit - before) / (after - before), 0), 1)
+        return previous.timestamp + fraction * (sample.timestamp - previous.timestamp)
+    def monitor_step(self):
+        # uma iteração do monitoramento; devolve o tempo até a próxima ou None ao terminar
+        if metrics is None:
+            return self.step()
+        started = time.perf_counter()
+        interval = self.step()
+        metrics.tick_seconds.observe(time.perf_counter() - started)
+        return interval
+    def step(self):
+        # corpo de monitor_step, separado para medir a duração só com métricas ligadas
+        if not self.monitoring or self.killed or not self.is_process_running():
+            if self.result is None:
+                self.result = "NORMAL_EXIT"
+            return None
+        if self.timeout and time.time() - self.start_time >= self.timeout:
+            self.on_timeout()
+            return None
+        if metrics is None:
+            sample = self.take_sample()  # uma única leitura por iteração
+        else:
+            started = time.perf_counter()
+            sample = self.take_sample()
+            metrics.sample_seconds.observe(time.perf_counter() - started)
+            metrics.sample_processes.observe(sample.n_procs)
+        self.record_sample(sample)
+        result = self.check_limits(sample)
+        if result:
+            self.breach_time_estimate = self.breach_time(result, sample)
+            self.kill_process_tree()
+            self.result = result
+            if metrics is not None:
+                metrics.record_kill(result, self.kill_time - self.breach_time_estimate)
+            return None
+        interval = self.next_sample_interval(sample)
+        if self.timeout:
+            # o prazo do timeout funciona como um timer: acorda exatamente nele
+            interval = min(interval, max(self.start_time + self.timeout - time.time(), 0))
+        return interval
+    async def monitor_async(self):
+        # corrotina de amostragem periódica usada pelo núcleo asyncio
+        import asyncio
+        while True:
+            try:
+                interval = self.monitor_step()
+            except Exception as e:
+                self.fail(e)  # mata o job: o wait do núcleo retorna e o resultado é ERROR
+                return self.result
+            if interval is None:
+                return self.result
+            await asyncio.sleep(interval)
     def monitor_resources(self):
         # monitora recursos do processo em uma thread separada
-        while self.monitoring and self.is_process_running():
-            current_time = time.time()
-            elapsed_time = current_time - self.start_time
-            memory_usage = self.get_process_memory()
-            if memory_usage > self.max_memory_usage:
-                self.max_memory_usage = memory_usage
-            cpu_time = self.get_process_cpu_time()
-            self.total_cpu_time = cpu_time
-            if hasattr(self, 'credit_manager') and self.payment_mode == "prepaid":
-                execution_cost = self.credit_manager.calculate_execution_cost(
-                    cpu_time,
-                    self.max_memory_usage,
-                    elapsed_time
-                )
-                if execution_cost > self.credit_manager.credits:
-                    print(
-                        "\n\033[91mCRÉDITOS ESGOTADOS DURANTE A EXECUÇÃO!\033[0m")
-                    print(
-                        f"\033[91mCusto atual: {execution_cost:.2f} créditos | Créditos disponíveis: {self.credit_manager.credits:.2f}\033[0m")
-                    self.kill_process_tree()
-                    return "NO_CREDITS"
-            print(f"\rProgresso: CPU={cpu_time:.2f}s/{self.cpu_quota:.2f}s ({cpu_time/self.cpu_quota*100:.1f}%), "
-                  f"Memória={memory_usage:.2f}MB/{self.memory_limit:.2f}MB ({memory_usage/self.memory_limit*100:.1f}%), "
-                  f"Tempo={elapsed_time:.2f}s/{self.timeout if self.timeout else 'inf'}s", end="")
-            if self.memory_limit and memory_usage > self.memory_limit:
-                print(
-                    f"\n\033[91mProcesso excedeu o limite de memória: {memory_usage:.2f}MB > {self.memory_limit:.2f}MB\033[0m")
-                self.kill_process_tree()
-                return "MEMORY_EXCEEDED"
-            if cpu_time > self.cpu_quota:
-                print(
-                    f"\n\033[91mProcesso excedeu a quota de CPU: {cpu_time:.2f}s > {self.cpu_quota:.2f}s\033[0m")
-                self.kill_process_tree()
-                return "CPU_EXCEEDED"
-            if self.timeout and elapsed_time >= (self.timeout - 0.5):
-                print(
-                    f"\n\033[91mProcesso excedeu o timeout: {elapsed_time:.2f}s > {self.timeout:.2f}s\033[0m")
-                self.kill_process_tree()
-                return "TIMEOUT"
-            memory_usage = self.get_process_memory()
-            if memory_usage > self.max_memory_usage:
-                self.max_memory_usage = memory_usage
-            cpu_time = self.get_process_cpu_time()
-            self.total_cpu_time = cpu_time
-            print(f"\rProgresso: CPU={cpu_time:.2f}s/{self.cpu_quota:.2f}s ({cpu_time/self.cpu_quota*100:.1f}%), "
-                  f"Memória={memory_usage:.2f}MB/{self.memory_limit:.2f}MB ({memory_usage/self.memory_limit*100:.1f}%), "
-                  f"Tempo={elapsed_time:.2f}s/{self.timeout if self.timeout else 'inf'}s", end="")
-            time.sleep(0.1)  # verificação mais frequente
-        return "NORMAL_EXIT"
+        while True:
+            interval = self.monitor_step()
+            if interval is None:
+                return self.result
+            self.wakeup.wait(interval)
     def start_monitoring(self):
         # inicia o monitoramento em uma thread separada
         monitor_thread = threading.Thread(target=self.monitor_resources)
@@ -163,50 +997,800 @@ class ProcessMonitor:
     def stop_monitoring(self):
         # para o monitoramento
         self.monitoring = False
+        self.wakeup.set()
+child_watcher_loop = None  # loop ao qual o PidfdChildWatcher foi preso por install_child_watcher
+def install_child_watcher():
+    # no Linux, usa pidfd para ser notificado do término dos filhos sem uma thread de espera por
+    # processo; a partir do Python 3.12 o asyncio já faz isso sozinho
+    global child_watcher_loop
+    import asyncio
+    if sys.version_info >= (3, 12) or not hasattr(os, "pidfd_open") or os.name != "posix":
+        return
+    loop = asyncio.get_running_loop()
+    watcher = asyncio.get_child_watcher()
+    if not isinstance(watcher, asyncio.PidfdChildWatcher):
+        watcher = asyncio.PidfdChildWatcher()
+        asyncio.set_child_watcher(watcher)
+    elif child_watcher_loop is loop:
+        return  # prender de novo fecharia os pidfds dos jobs que já estão rodando neste loop
+    watcher.attach_loop(loop)
+    child_watcher_loop = loop
+class MonitorHub:
+    # thread única que amostra todos os ProcessMonitor ativos em uma só passada
+    def __init__(self):
+        self.monitors = {}  # monitor -> horário da próxima amostra
+        self.lock = threading.Lock()
+        self.step_lock = threading.Lock()  # remove() espera a iteração em andamento terminar
+        self.wakeup = threading.Event()
+        self.thread = None
+    def add(self, monitor):
+        # passa a amostrar o monitor imediatamente
+        with self.lock:
+            self.monitors[monitor] = time.time()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run)
+                self.thread.daemon = True
+                self.thread.start()
+        self.wakeup.set()
+    def remove(self, monitor):
+        # depois do retorno o hub não toca mais no monitor, que pode ser reaproveitado
+        with self.step_lock, self.lock:
+            self.monitors.pop(monitor, None)
+    def run(self):
+        while True:
+            self.wakeup.clear()
+            now = time.time()
+            with self.lock:
+                due = [monitor for monitor, next_time in self.monitors.items() if next_time <= now]
+            for monitor in due:
+                with self.step_lock:
+                    with self.lock:
+                        if monitor not in self.monitors:
+                            continue  # removido depois de selecionado
+                    try:
+                        interval = monitor.monitor_step()
+                    except Exception as e:
+                        # um monitor com erro não pode derrubar a thread que vigia todos os jobs
+                        monitor.fail(e)
+                        interval = None
+                with self.lock:
+                    if interval is None:
+                        self.monitors.pop(monitor, None)
+                    elif monitor in self.monitors:
+                        self.monitors[monitor] = time.time() + interval
+            with self.lock:
+                next_time = min(self.monitors.values(), default=None)
+            self.wakeup.wait(max(next_time - time.time(), 0) if next_time is not None else None)
+class ProgressRenderer:
+    # desenha o progresso de todos os jobs ativos em uma thread própria, no máximo `fps` vezes por
+    # segundo; lê monitor.last_sample (a troca de referência é atômica), sem travar o monitor
+    def __init__(self, fps=PROGRESS_FPS, stream=None):
+        self.stream = stream or sys.stdout
+        try:
+            is_tty = self.stream.isatty()
+        except (AttributeError, ValueError):
+            is_tty = False
+        self.enabled = bool(fps) and is_tty  # sem terminal (pipe, arquivo): nenhuma saída
+        self.interval = 1.0 / fps if fps else None
+        self.jobs = {}  # monitor -> rótulo
+        self.drawn = 0  # linhas do bloco de progresso na tela
+        self.frame = None  # amostras do último quadro; sem novidades não há redesenho
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+    def add(self, monitor, label):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.jobs[monitor] = label
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run)
+                self.thread.daemon = True
+                self.thread.start()
+        self.wakeup.set()
+    def clear(self):
+        # apaga o bloco desenhado; o cursor volta ao início da primeira linha
+        if self.drawn:
+            self.stream.write("\r" + (f"\033[{self.drawn - 1}A" if self.drawn > 1 else "") + "\033[J")
+            self.drawn = 0
+    def draw(self):
+        # redesenha o bloco inteiro com a última amostra de cada job
+        frame = [(monitor, monitor.last_sample) for monitor in self.jobs]
+        if frame == self.frame:
+            return
+        self.frame = frame
+        lines = []
+        for monitor, sample in frame:
+            if sample is not None:
+                line = monitor.progress_line(sample)
+                lines.append(f"[{self.jobs[monitor]}] {line}" if len(frame) > 1 else line)
+        self.clear()
+        if lines:
+            self.stream.write("\n".join(lines))
+            self.drawn = len(lines)
+        self.stream.flush()
+    @contextlib.contextmanager
+    def finish(self, monitor):
+        # tira o job da tela e imprime seus avisos; enquanto o bloco `with` roda (relatório) o
+        # progresso dos outros jobs não é redesenhado
+        with self.lock:
+            if monitor in self.jobs:
+                self.clear()
+                self.frame = None
+                sample = monitor.last_sample
+                if sample is not None:
+                    line = monitor.progress_line(sample)
+                    print(f"[{self.jobs[monitor]}] {line}" if len(self.jobs) > 1 else line, file=self.stream)
+                del self.jobs[monitor]
+                self.stream.flush()
+            monitor.flush_messages(self.stream if self.enabled else None)
+            yield
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            with self.lock:
+                if not self.jobs:
+                    self.wakeup.clear()
+                    continue
+                self.draw()
+            time.sleep(self.interval)
+class UsageLedger:
+    # log de uso somente-anexação em JSON Lines, com trava de arquivo e fsync em lote
+    def __init__(self, path, fsync_batch=LEDGER_FSYNC_BATCH, fsync_interval=LEDGER_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.file = None
+        self.pending = 0  # registros gravados desde o último fsync
+        self.last_fsync = time.time()
+        self.lock = threading.Lock()
+    def lock_file(self):
+        # trava exclusiva entre processos do mesmo usuário
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            import msvcrt
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+    def unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            import msvcrt
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+    def lock_current(self):
+        # trava o log aberto; se outro processo o substituiu (migração), reabre o arquivo novo antes
+        while True:
+            f = self.open()
+            self.lock_file()
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            self.unlock_file()
+            self.sync()
+            f.close()
+            self.file = None
+    def open(self):
+        # abre o log para anexação e descarta uma última linha incompleta deixada por uma queda
+        if self.file is None:
+            self.file = open(self.path, 'ab')
+            self.lock_file()
+            try:
+                self.recover_tail()
+            finally:
+                self.unlock_file()
+        return self.file
+    def recover_tail(self):
+        size = os.path.getsize(self.path)
+        if size == 0:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b"\n":
+                return
+            # procura o último fim de linha em blocos a partir do final
+            position = size
+            while position > 0:
+                block_start = max(position - 4096, 0)
+                f.seek(block_start)
+                block = f.read(position - block_start)
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    position = block_start + newline + 1
+                    break
+                position = block_start
+        self.file.truncate(position)
+    def append(self, entry):
+        # grava um registro; o fsync é feito em lote
+        line = (json.dumps(entry, separators=(',', ':')) + "\n").encode('utf-8')
+        started = time.perf_counter() if metrics is not None else 0
+        with self.lock:
+            f = self.lock_current()
+            try:
+                f.write(line)
+                f.flush()
+            finally:
+                self.unlock_file()
+            self.pending += 1
+            if self.pending >= self.fsync_batch or time.time() - self.last_fsync >= self.fsync_interval:
+                self.sync()
+        if metrics is not None:
+            metrics.ledger_write_seconds.observe(time.perf_counter() - started)
+    def sync(self):
+        # força os registros pendentes para o disco
+        if self.file is not None and self.pending:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+            self.last_fsync = time.time()
+    def entries(self):
+        # lê o log em streaming, um registro por vez, ignorando uma linha final incompleta
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if 'generation' not in entry:  # marcador gravado por clear
+                    yield entry
+    def clear(self):
+        # esvazia o log sem removê-lo, para não perder anexações de outros processos
+        # a primeira linha passa a ser um marcador de geração único, para o índice perceber a limpeza
+        marker = json.dumps({'generation': os.urandom(8).hex()}) + "\n"
+        with self.lock:
+            f = self.lock_current()
+            try:
+                f.truncate(0)
+                f.write(marker.encode('utf-8'))
+                f.flush()
+            finally:
+                self.unlock_file()
+            self.pending = 0
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.sync()
+                self.file.close()
+                self.file = None
+    def import_json(self, json_path):
+        # migra o antigo array JSON com a trava exclusiva: log atual + registros migrados vão para um
+        # arquivo temporário que substitui o log de uma vez com os.replace
+        source = os.path.basename(json_path)
+        with self.lock:
+            f = self.lock_current()
+            try:
+                if not os.path.exists(json_path):
+                    return 0  # outro processo migrou enquanto esperávamos a trava
+                # os registros migrados levam a origem: se uma queda ocorreu entre a troca do log e a
+                # renomeação do JSON, a nova execução só conclui a renomeação, sem duplicar
+                if any(entry.get('migrated_from') == source for entry in self.entries()):
+                    os.replace(json_path, json_path + ".migrated")
+                    return 0
+                with open(json_path, 'r') as json_file:
+                    usage_data = json.load(json_file)
+                temp_path = self.path + ".tmp"
+                with open(temp_path, 'wb') as temp, open(self.path, 'rb') as current:
+                    while True:
+                        block = current.read(1 << 20)
+                        if not block:
+                            break
+                        temp.write(block)
+                    for entry in usage_data:
+                        entry['migrated_from'] = source
+                        temp.write((json.dumps(entry, separators=(',', ':')) + "\n").encode('utf-8'))
+                    temp.flush()
+                    os.fsync(temp.fileno())
+                os.replace(temp_path, self.path)
+                os.replace(json_path, json_path + ".migrated")
+            finally:
+                self.unlock_file()
+                # o descritor aponta para o arquivo antigo; a próxima escrita abre o novo
+                self.sync()
+                f.close()
+                self.file = None
+        return len(usage_data)
+def migrate_usage_json(json_path, ledger):
+    # converte uma única vez o antigo fms_usage_<user>.json (array) para o log JSON Lines
+    if not os.path.exists(json_path):
+        return 0
+    return ledger.import_json(json_path)
+def new_usage_stats():
+    # acumulador de um grupo do relatório agregado
+    return {'count': 0, 'cpu_time': 0.0, 'memory_max': 0.0, 'execution_time': 0.0, 'cost': 0.0}
+def add_usage_stats(stats, entry):
+    stats['count'] += entry.get('count', 1)
+    stats['cpu_time'] += entry['cpu_time']
+    stats['memory_max'] = max(stats['memory_max'], entry['memory_max'])
+    stats['execution_time'] += entry['execution_time']
+    stats['cost'] += entry['cost']
+class UsageIndex:
+    # agregados incrementais (total, por binário, por hora e por dia) sobre o log de uso
+    # o índice acompanha o log pelo deslocamento em bytes: cada atualização lê só os registros novos;
+    # a primeira linha do log identifica a geração, para detectar uma limpeza seguida de novos registros
+    def __init__(self, ledger_path, index_path):
+        self.ledger_path = ledger_path
+        self.index_path = index_path
+        self.unsaved = 0  # registros agregados desde a última gravação do índice
+        self.reset()
+        self.load()
+    def reset(self):
+        self.offset = 0  # bytes do log já agregados
+        self.head = None  # primeira linha do log agregado (marcador de geração ou primeiro registro)
+        self.total = new_usage_stats()
+        self.by_binary = {}
+        self.by_hour = {}  # "AAAA-MM-DD HH" -> agregados
+        self.by_day = {}  # "AAAA-MM-DD" -> agregados
+        self.hour_offsets = {}  # índice temporal: hora -> deslocamento do primeiro registro no log
+        self.hours = []  # horas em ordem, para buscas por intervalo
+    def load(self):
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r') as f:
+                    data = json.load(f)
+                self.offset = data['offset']
+                self.head = data.get('head')
+                self.total = data['total']
+                self.by_binary = data['by_binary']
+                self.by_hour = data['by_hour']
+                self.by_day = data['by_day']
+                self.hour_offsets = data['hour_offsets']
+                self.hours = sorted(self.by_hour)
+        except Exception as e:
+            print(f"Erro ao carregar índice de uso: {str(e)}")
+            self.reset()
+    def save(self, force=False):
+        # grava o índice de tempos em tempos; o log continua sendo a fonte da verdade
+        if not self.unsaved or (not force and self.unsaved < USAGE_INDEX_SAVE_EVERY):
+            return
+        data = {'offset': self.offset, 'head': self.head, 'total': self.total, 'by_binary': self.by_binary,
+                'by_hour': self.by_hour, 'by_day': self.by_day, 'hour_offsets': self.hour_offsets}
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, self.index_path)
+        self.unsaved = 0
+    def add_entry(self, entry, offset):
+        hour = entry['timestamp'][:13]
+        day = entry['timestamp'][:10]
+        if hour not in self.by_hour:
+            self.by_hour[hour] = new_usage_stats()
+            self.hour_offsets[hour] = offset
+            bisect.insort(self.hours, hour)
+        add_usage_stats(self.by_hour[hour], entry)
+        add_usage_stats(self.by_day.setdefault(day, new_usage_stats()), entry)
+        add_usage_stats(self.by_binary.setdefault(entry['binary'], new_usage_stats()), entry)
+        add_usage_stats(self.total, entry)
+    def refresh(self):
+        # agrega os registros anexados desde a última atualização (inclusive de outros processos)
+        if not os.path.exists(self.ledger_path):
+            if self.offset:
+                self.reset()
+                self.unsaved += 1
+            return
+        with open(self.ledger_path, 'rb') as f:
+            if self.offset and (os.fstat(f.fileno()).st_size < self.offset
+                                or f.readline().decode('utf-8', 'replace') != self.head):
+                self.reset()  # o log foi limpo (ou substituído) desde a última atualização
+                self.unsaved += 1
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # registro ainda sendo gravado
+                if not self.offset:
+                    self.head = line.decode('utf-8', 'replace')
+                try:
+                    self.add_entry(json.loads(line), self.offset)
+                except (ValueError, KeyError):
+                    pass
+                self.offset += len(line)
+                self.unsaved += 1
+        self.save()
+    def hour_range(self, start=None, end=None):
+        # horas dentro do intervalo [start, end]; aceita "AAAA-MM-DD" ou "AAAA-MM-DD HH"
+        low = bisect.bisect_left(self.hours, start[:13]) if start else 0
+        high = bisect.bisect_right(self.hours, end[:13] + "\uffff") if end else len(self.hours)
+        return self.hours[low:high]
+    def range_totals(self, start=None, end=None):
+        # total do intervalo somando só os agregados por hora, sem percorrer o histórico
+        if not start and not end:
+            return dict(self.total)
+        stats = new_usage_stats()
+        for hour in self.hour_range(start, end):
+            add_usage_stats(stats, self.by_hour[hour])
+        return stats
+    def day_totals(self, start=None, end=None):
+        return [(day, self.by_day[day]) for day in sorted(self.by_day)
+                if (not start or day >= start[:10]) and (not end or day <= end[:10])]
+    def entries_between(self, start, end=None):
+        # registros de um intervalo lidos a partir do deslocamento indexado da primeira hora
+        hours = self.hour_range(start, end)
+        if not hours:
+            return
+        with open(self.ledger_path, 'rb') as f:
+            f.seek(self.hour_offsets[hours[0]])
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if end and entry['timestamp'][:len(end)] > end:
+                    break
+                if entry['timestamp'] >= start:
+                    yield entry
+class CreditStore:
+    # saldos de créditos em SQLite (modo WAL), uma linha por usuário, com operações atômicas
+    # as escritas de várias threads são agrupadas em uma única transação por uma thread escritora
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()  # uma conexão por thread
+        self.pending = queue.Queue()
+        self.writer = None
+        self.writer_lock = threading.Lock()
+        conn = self.connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS credits ("
+                     "user TEXT PRIMARY KEY, balance REAL NOT NULL DEFAULT 0, reserved REAL NOT NULL DEFAULT 0)")
+        conn.execute("CREATE TABLE IF NOT EXISTS reservations ("
+                     "id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT NOT NULL, amount REAL NOT NULL, owner_pid INTEGER)")
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+    def balance(self, user):
+        # (saldo, reservado) lidos do banco a cada chamada: nunca fica desatualizado
+        row = self.connect().execute(
+            "SELECT balance, reserved FROM credits WHERE user = ?", (user,)).fetchone()
+        return row if row else (0.0, 0.0)
+    def execute(self, operation, *args):
+        # enfileira a escrita para a thread escritora e espera o resultado
+        import concurrent.futures
+        future = concurrent.futures.Future()
+        started = time.perf_counter() if metrics is not None else 0
+        self.pending.put((operation, args, future))
+        with self.writer_lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.run_writer)
+                self.writer.daemon = True
+                self.writer.start()
+        try:
+            return future.result()
+        finally:
+            if metrics is not None:
+                metrics.credit_write_seconds.observe(time.perf_counter() - started)
+    def run_writer(self):
+        conn = self.connect()
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < CREDIT_STORE_BATCH:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            results = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for operation, args, future in batch:
+                    conn.execute("SAVEPOINT op")  # uma operação com erro não desfaz as demais
+                    try:
+                        results.append((future, operation(conn, *args), None))
+                        conn.execute("RELEASE op")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO op")
+                        conn.execute("RELEASE op")
+                        results.append((future, None, e))
+                conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                results = [(future, None, e) for operation, args, future in batch]
+            for future, result, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+    @staticmethod
+    def ensure_user(conn, user):
+        conn.execute("INSERT OR IGNORE INTO credits (user) VALUES (?)", (user,))
+    @staticmethod
+    def apply_add(conn, user, amount):
+        CreditStore.ensure_user(conn, user)
+        conn.execute("UPDATE credits SET balance = balance + ? WHERE user = ?", (amount, user))
+        return True
+    @staticmethod
+    def apply_deduct(conn, user, amount):
+        cursor = conn.execute("UPDATE credits SET balance = balance - ? "
+                              "WHERE user = ? AND balance - reserved >= ?", (amount, user, amount))
+        return cursor.rowcount == 1
+    @staticmethod
+    def apply_reserve(conn, user, amount):
+        if not CreditStore.apply_reserve_amount(conn, user, amount):
+            return None
+        return conn.execute("INSERT INTO reservations (user, amount, owner_pid) VALUES (?, ?, ?)",
+                            (user, amount, os.getpid())).lastrowid
+    @staticmethod
+    def release(conn, reservation_id):
+        row = conn.execute("SELECT user, amount FROM reservations WHERE id = ?", (reservation_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"reserva {reservation_id} não encontrada")
+        conn.execute("DELETE FROM reservations WHERE id = ?", (reservation_id,))
+        conn.execute("UPDATE credits SET reserved = reserved - ? WHERE user = ?", (row[1], row[0]))
+        return row[0]
+    @staticmethod
+    def apply_extend(conn, reservation_id, amount):
+        # amplia uma reserva existente com até amount do saldo livre; devolve quanto foi ampliado
+        row = conn.execute("SELECT user FROM reservations WHERE id = ?", (reservation_id,)).fetchone()
+        if row is None:
+            return 0.0
+        free = conn.execute("SELECT balance - reserved FROM credits WHERE user = ?", (row[0],)).fetchone()
+        amount = min(amount, free[0]) if free else 0.0
+        if amount <= 0:
+            return 0.0
+        conn.execute("UPDATE credits SET reserved = reserved + ? WHERE user = ?", (amount, row[0]))
+        conn.execute("UPDATE reservations SET amount = amount + ? WHERE id = ?", (amount, reservation_id))
+        return amount
+    @staticmethod
+    def apply_reserve_amount(conn, user, amount):
+        cursor = conn.execute("UPDATE credits SET reserved = reserved + ? "
+                              "WHERE user = ? AND balance - reserved >= ?", (amount, user, amount))
+        return cursor.rowcount == 1
+    @staticmethod
+    def apply_debit(conn, reservation_id, amount):
+        # debita do saldo uma parte já reservada
+        row = conn.execute("SELECT user, amount FROM reservations WHERE id = ?", (reservation_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"reserva {reservation_id} não encontrada")
+        amount = min(amount, row[1])
+        conn.execute("UPDATE reservations SET amount = amount - ? WHERE id = ?", (amount, reservation_id))
+        conn.execute("UPDATE credits SET balance = balance - ?, reserved = reserved - ? WHERE user = ?",
+                     (amount, amount, row[0]))
+        return amount
+    @staticmethod
+    def apply_settle(conn, reservation_id, amount):
+        # debita o custo restante da reserva (e do saldo livre, se faltar) e libera o resto
+        debited = CreditStore.apply_debit(conn, reservation_id, amount)
+        user = CreditStore.release(conn, reservation_id)
+        if amount - debited > 0 and CreditStore.apply_deduct(conn, user, amount - debited):
+            debited = amount
+        return debited
+    @staticmethod
+    def apply_release_stale(conn):
+        # libera reservas de processos FMS que terminaram sem concluir a execução
+        stale = [row[0] for row in conn.execute("SELECT id, owner_pid FROM reservations")
+                 if row[1] is None or not psutil.pid_exists(row[1])]
+        for reservation_id in stale:
+            CreditStore.release(conn, reservation_id)
+        return len(stale)
+    @staticmethod
+    def apply_commit(conn, reservation_id, amount):
+        # libera a reserva e debita o valor efetivo, se houver saldo
+        user = CreditStore.release(conn, reservation_id)
+        return CreditStore.apply_deduct(conn, user, amount)
+    @staticmethod
+    def apply_refund(conn, reservation_id):
+        CreditStore.release(conn, reservation_id)
+        return True
+    @staticmethod
+    def apply_import(conn, user, amount):
+        # importa um saldo apenas se o usuário ainda não existir no banco
+        cursor = conn.execute("INSERT OR IGNORE INTO credits (user, balance) VALUES (?, ?)", (user, amount))
+        return cursor.rowcount == 1
+    def add(self, user, amount):
+        return self.execute(self.apply_add, user, amount)
+    def deduct(self, user, amount):
+        return self.execute(self.apply_deduct, user, amount)
+    def reserve(self, user, amount):
+        # reserva créditos disponíveis; devolve o id da reserva ou None se não houver saldo
+        return self.execute(self.apply_reserve, user, amount)
+    def commit(self, reservation_id, amount):
+        return self.execute(self.apply_commit, reservation_id, amount)
+    def refund(self, reservation_id):
+        return self.execute(self.apply_refund, reservation_id)
+    def extend(self, reservation_id, amount):
+        return self.execute(self.apply_extend, reservation_id, amount)
+    def debit(self, reservation_id, amount):
+        return self.execute(self.apply_debit, reservation_id, amount)
+    def settle(self, reservation_id, amount):
+        # encerra a reserva; devolve quanto foi efetivamente debitado
+        return self.execute(self.apply_settle, reservation_id, amount)
+    def release_stale(self):
+        return self.execute(self.apply_release_stale)
+    def import_json(self, json_path):
+        # importa um arquivo fms_credits_<user>.json antigo; devolve o usuário importado ou None
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        user = data.get('user') or os.path.basename(json_path)[len("fms_credits_"):-len(".json")]
+        if self.execute(self.apply_import, user, float(data.get('credits', 0))):
+            return user
+        return None
+class IntegralPricing:
+    # cobra a memória pela integral do RSS no tempo (MB·s), com o mesmo preço por minuto de antes
+    name = "integral"
+    def __init__(self, cost_per_cpu_second, cost_per_mb_second):
+        self.cost_per_cpu_second = cost_per_cpu_second
+        self.cost_per_mb_second = cost_per_mb_second
+    def cpu_cost(self, cpu_time):
+        return cpu_time * self.cost_per_cpu_second
+    def memory_rate(self, memory):
+        # créditos por segundo com `memory` MB residentes
+        return memory * self.cost_per_mb_second / 60  # custo da memória é por minuto
+    def memory_cost(self, accumulator):
+        return accumulator.memory_charge
+    def estimate(self, cpu_time, memory, execution_time):
+        # custo de manter `memory` MB durante toda a execução; base das reservas pré-pagas
+        return self.cpu_cost(cpu_time) + self.memory_rate(memory) * execution_time
+class PeakPricing(IntegralPricing):
+    # modelo original: o pico de memória é cobrado durante toda a execução
+    name = "peak"
+    def memory_cost(self, accumulator):
+        return self.memory_rate(accumulator.peak_memory) * accumulator.elapsed
+class TieredPricing(IntegralPricing):
+    # integral com preço progressivo: cada faixa de MB é cobrada com o seu multiplicador
+    name = "tiered"
+    def __init__(self, cost_per_cpu_second, cost_per_mb_second, tiers=MEMORY_PRICE_TIERS):
+        IntegralPricing.__init__(self, cost_per_cpu_second, cost_per_mb_second)
+        self.tiers = tiers
+    def memory_rate(self, memory):
+        rate = 0
+        floor = 0
+        for limit, multiplier in self.tiers:
+            if memory <= floor:
+                break
+            rate += (min(memory, limit) - floor) * multiplier
+            floor = limit
+        return rate * self.cost_per_mb_second / 60
+PRICING_MODELS = {pricing.name: pricing for pricing in (PeakPricing, IntegralPricing, TieredPricing)}
+class CostAccumulator:
+    # custo acumulado de uma execução, atualizado em O(1) por amostra
+    def __init__(self, pricing):
+        self.pricing = pricing
+        self.cpu_time = 0
+        self.peak_memory = 0
+        self.elapsed = 0
+        self.memory_mb_seconds = 0  # integral do RSS no tempo (regra do trapézio)
+        self.memory_charge = 0  # mesma integral, em créditos pelo preço de cada nível de RSS
+        self.last_memory = 0  # o processo começa sem memória residente
+        self.last_rate = 0
+    def add(self, sample):
+        rate = self.pricing.memory_rate(sample.memory)
+        if sample.elapsed > self.elapsed:
+            dt = sample.elapsed - self.elapsed
+            self.memory_mb_seconds += (self.last_memory + sample.memory) / 2 * dt
+            self.memory_charge += (self.last_rate + rate) / 2 * dt
+            self.elapsed = sample.elapsed
+        self.last_memory = sample.memory
+        self.last_rate = rate
+        self.cpu_time = sample.cpu_time
+        if sample.memory > self.peak_memory:
+            self.peak_memory = sample.memory
+    def finish(self, cpu_time, peak_memory, elapsed):
+        # fecha a execução com os totais finais; a última memória vista vale até o fim
+        if elapsed > self.elapsed:
+            self.memory_mb_seconds += self.last_memory * (elapsed - self.elapsed)
+            self.memory_charge += self.last_rate * (elapsed - self.elapsed)
+            self.elapsed = elapsed
+        self.cpu_time = max(self.cpu_time, cpu_time)
+        self.peak_memory = max(self.peak_memory, peak_memory)
+    def total(self):
+        return self.pricing.cpu_cost(self.cpu_time) + self.pricing.memory_cost(self)
+class CreditReservation:
+    # créditos reservados por uma execução pré-paga, debitados em blocos enquanto ela roda
+    def __init__(self, credit_manager, reservation_id, amount, chunk=CREDIT_DEBIT_CHUNK):
+        self.credit_manager = credit_manager
+        self.store = credit_manager.credit_store
+        self.reservation_id = reservation_id
+        self.chunk = chunk
+        self.debited = 0.0  # parte do custo já debitada do saldo
+        self.kill_threshold = amount  # custo a partir do qual a execução é encerrada
+        self.next_checkpoint = min(chunk, amount)  # próximo custo que exige acesso ao banco
+        self.closed = False
+        self.lock = threading.Lock()
+    def charge(self, cost):
+        # verificação por amostra: uma comparação O(1) enquanto o custo não cruza um bloco
+        if cost < self.next_checkpoint:
+            return True
+        return self.advance(cost)
+    def advance(self, cost):
+        # debita os blocos vencidos e tenta manter um bloco reservado à frente do custo; com menos de
+        # um bloco livre reserva o que houver, e a execução só é encerrada quando o saldo livre acaba
+        with self.lock:
+            if self.closed:
+                return cost < self.kill_threshold
+            target = min(math.floor(cost / self.chunk) * self.chunk, self.kill_threshold)
+            if target > self.debited:
+                self.debited += self.store.debit(self.reservation_id, target - self.debited)
+            if self.kill_threshold - cost < self.chunk:
+                self.kill_threshold += self.store.extend(self.reservation_id, self.chunk)
+            self.next_checkpoint = min(self.debited + self.chunk, self.kill_threshold)
+            return cost < self.kill_threshold
+    def settle(self, final_cost):
+        # debita o restante do custo final e devolve à conta a parte não usada da reserva
+        with self.lock:
+            if not self.closed:
+                self.debited += self.store.settle(self.reservation_id, max(final_cost - self.debited, 0))
+                self.closed = True
+            return self.debited >= final_cost - 1e-9
+    def release(self):
+        # cancela a reserva sem debitar mais nada (execução não iniciada ou com erro)
+        with self.lock:
+            if not self.closed:
+                self.store.settle(self.reservation_id, 0)
+                self.closed = True
 class CreditManager:
     # gerenciador de créditos para o sistema de pré-pago e pós-pago
-    def __init__(self, user="default_user"):
+    def __init__(self, user="default_user", credit_store=None):
         self.user = user
         base_dir = os.path.dirname(os.path.abspath(__file__))
         self.credits_file = os.path.join(base_dir, f"fms_credits_{user}.json")
-        self.usage_file = os.path.join(base_dir, f"fms_usage_{user}.json")
-        self.credits = self.load_credits()
+        self.usage_file = os.path.join(base_dir, f"fms_usage_{user}.jsonl")
+        self.usage_ledger = UsageLedger(self.usage_file)
+        self.usage_index = UsageIndex(self.usage_file, os.path.join(base_dir, f"fms_usage_{user}.index.json"))
+        try:
+            migrated = migrate_usage_json(os.path.join(base_dir, f"fms_usage_{user}.json"), self.usage_ledger)
+            if migrated:
+                print(f"Histórico de uso migrado para {os.path.basename(self.usage_file)}: {migrated} registros")
+        except Exception as e:
+            print(f"Erro ao migrar histórico de uso: {str(e)}")
+        # o daemon compartilha um único banco (e thread escritora) entre todos os usuários
+        self.credit_store = credit_store or CreditStore(os.path.join(base_dir, "fms_credits.db"))
+        self.import_credits_file()
+        try:
+            self.credit_store.release_stale()
+        except Exception as e:
+            print(f"Erro ao liberar reservas antigas: {str(e)}")
         self.cost_per_cpu_second = 1.0  # custo por segundo de CPU
         self.cost_per_mb_second = 0.1   # custo por MB*segundo de memória
-    def load_credits(self):
-        # carrega os créditos do usuário do arquivo
+        self.pricing = PRICING_MODELS[PRICING_MODEL](self.cost_per_cpu_second, self.cost_per_mb_second)
+    def import_credits_file(self):
+        # importa uma única vez o antigo fms_credits_<user>.json para o banco de créditos
         try:
             if os.path.exists(self.credits_file):
-                with open(self.credits_file, 'r') as f:
-                    data = json.load(f)
-                    return data.get('credits', 0)
-            return 0
+                if self.credit_store.import_json(self.credits_file):
+                    print(f"Créditos importados de {os.path.basename(self.credits_file)}")
+                os.replace(self.credits_file, self.credits_file + ".migrated")
         except Exception as e:
-            print(f"Erro ao carregar créditos: {str(e)}")
-            return 0
-    def save_credits(self):
-        # salva os créditos do usuário em arquivo
+            print(f"Erro ao importar créditos: {str(e)}")
+    @property
+    def credits(self):
+        # saldo disponível (descontadas as reservas), sempre lido do banco
         try:
-            with open(self.credits_file, 'w') as f:
-                json.dump({'user': self.user, 'credits': self.credits}, f)
+            balance, reserved = self.credit_store.balance(self.user)
+            return balance - reserved
         except Exception as e:
-            print(f"Erro ao salvar créditos: {str(e)}")
+            print(f"Erro ao carregar créditos: {str(e)}")
+            return 0
     def add_credits(self, amount):
         # adiciona créditos à conta do usuário
         if amount > 0:
-            self.credits += amount
-            self.save_credits()
+            try:
+                self.credit_store.add(self.user, amount)
+            except Exception as e:
+                print(f"Erro ao salvar créditos: {str(e)}")
+                return False
             print(
                 f"\nAdicionado {amount:.2f} créditos. Total: {self.credits:.2f} créditos")
             return True
         return False
     def deduct_credits(self, amount):
-        # deduz créditos da conta do usuário
+        # deduz créditos da conta do usuário (verificação e débito na mesma transação)
         if amount <= 0:
             return True
-        if self.credits >= amount:
-            self.credits -= amount
-            self.save_credits()
+        try:
+            deducted = self.credit_store.deduct(self.user, amount)
+        except Exception as e:
+            print(f"Erro ao salvar créditos: {str(e)}")
+            return False
+        if deducted:
             print(
                 f"\nDeduzido {amount:.2f} créditos. Restante: {self.credits:.2f} créditos")
             return True
@@ -214,20 +1798,40 @@ class CreditManager:
             print(
                 f"\nCréditos insuficientes. Necessário: {amount:.2f}, Disponível: {self.credits:.2f}")
             return False
+    def reserve_execution(self, cpu_quota, memory_limit, timeout):
+        # reserva o custo máximo estimado pelos limites da execução (ou o saldo disponível, se menor)
+        if timeout:
+            estimate = self.calculate_execution_cost(cpu_quota, memory_limit, timeout)
+        else:
+            estimate = self.calculate_execution_cost(cpu_quota, 0, 0) + CREDIT_DEBIT_CHUNK
+        amount = min(estimate, self.credits)
+        if amount <= 0:
+            return None
+        try:
+            reservation_id = self.credit_store.reserve(self.user, amount)
+        except Exception as e:
+            print(f"Erro ao reservar créditos: {str(e)}")
+            return None
+        if reservation_id is None:
+            return None
+        return CreditReservation(self, reservation_id, amount)
+    def set_pricing(self, name):
+        # troca o modelo de preço da memória ("peak", "integral" ou "tiered")
+        self.pricing = PRICING_MODELS[name](self.cost_per_cpu_second, self.cost_per_mb_second)
     def calculate_execution_cost(self, cpu_time, memory_max, execution_time):
-        # calcula o custo da execução baseado no uso de recursos
-        cpu_cost = cpu_time * self.cost_per_cpu_second
-        memory_cost = memory_max * execution_time * \
-            self.cost_per_mb_second / 60  # custo da memória é por minuto
-        total_cost = cpu_cost + memory_cost
-        return total_cost
-    def log_usage(self, binary_name, cpu_time, memory_max, execution_time, cost):
+        # custo de uma execução que mantém memory_max MB do início ao fim; usado nas estimativas,
+        # o custo real de cada execução vem do CostAccumulator do monitor
+        return self.pricing.estimate(cpu_time, memory_max, execution_time)
+    def close(self):
+        # grava em disco o último lote do log pós-pago e o índice de uso antes de sair
+        try:
+            self.usage_ledger.close()
+            self.usage_index.save(force=True)
+        except Exception as e:
+            print(f"Erro ao fechar histórico de uso: {str(e)}")
+    def log_usage(self, binary_name, cpu_time, memory_max, execution_time, cost, memory_mb_seconds=None):
         # registra o uso para faturamento no modo pós-pago
         try:
-            usage_data = []
-            if os.path.exists(self.usage_file):
-                with open(self.usage_file, 'r') as f:
-                    usage_data = json.load(f)
             usage_entry = {
                 'timestamp': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 'binary': binary_name,
@@ -236,47 +1840,172 @@ class CreditManager:
                 'execution_time': execution_time,
                 'cost': cost
             }
-            usage_data.append(usage_entry)
-            with open(self.usage_file, 'w') as f:
-                json.dump(usage_data, f, indent=2)
+            if memory_mb_seconds is not None:
+                usage_entry['memory_mb_seconds'] = memory_mb_seconds
+                usage_entry['pricing'] = self.pricing.name
+            self.usage_ledger.append(usage_entry)  # anexação O(1), sem reescrever o histórico
+            self.usage_index.refresh()  # agrega apenas o registro recém-anexado
             print(f"\nUso registrado para faturamento: {cost:.2f} créditos")
         except Exception as e:
             print(f"Erro ao registrar uso: {str(e)}")
     def show_usage_report(self):
         # mostra relatório de uso para faturamento pós-pago
         try:
-            if not os.path.exists(self.usage_file):
-                print("\nNenhum registro de uso encontrado.")
-                return
-            with open(self.usage_file, 'r') as f:
-                usage_data = json.load(f)
-            if not usage_data:
-                print("\nNenhum registro de uso encontrado.")
-                return
-            print("\n=== Relatório de Uso (Pós-pago) ===")
-            print(
-                f"{'Data/Hora':<20} {'Binário':<30} {'CPU(s)':<10} {'Mem(MB)':<10} {'Tempo(s)':<10} {'Custo':<10}")
-            print("-" * 90)
             total_cost = 0
-            for entry in usage_data:
+            count = 0
+            for entry in self.usage_ledger.entries():  # streaming, sem carregar o histórico
+                if count == 0:
+                    print("\n=== Relatório de Uso (Pós-pago) ===")
+                    print(
+                        f"{'Data/Hora':<20} {'Binário':<30} {'CPU(s)':<10} {'Mem(MB)':<10} {'Tempo(s)':<10} {'Custo':<10}")
+                    print("-" * 90)
+                count += 1
                 print(f"{entry['timestamp']:<20} {os.path.basename(entry['binary']):<30} "
                       f"{entry['cpu_time']:<10.2f} {entry['memory_max']:<10.2f} "
                       f"{entry['execution_time']:<10.2f} {entry['cost']:<10.2f}")
                 total_cost += entry['cost']
+            if count == 0:
+                print("\nNenhum registro de uso encontrado.")
+                return
             print("-" * 90)
             print(f"Total a pagar: {total_cost:.2f} créditos")
         except Exception as e:
             print(f"Erro ao gerar relatório: {str(e)}")
+    def usage_summary(self, start=None, end=None):
+        # relatório agregado em formato estruturado; start/end: "AAAA-MM-DD" ou "AAAA-MM-DD HH"
+        self.usage_index.refresh()
+        index = self.usage_index
+        if start or end:
+            # por binário dentro do intervalo: lê só os registros do período, a partir do índice temporal
+            by_binary = {}
+            for entry in index.entries_between(start or "", end):
+                add_usage_stats(by_binary.setdefault(entry['binary'], new_usage_stats()), entry)
+        else:
+            by_binary = {binary: dict(stats) for binary, stats in index.by_binary.items()}
+        return {
+            'user': self.user,
+            'start': start,
+            'end': end,
+            'total': index.range_totals(start, end),
+            'by_binary': by_binary,
+            'by_day': [{'day': day, **stats} for day, stats in index.day_totals(start, end)],
+        }
+    def show_usage_summary(self, start=None, end=None):
+        # mostra totais por período, por binário e por dia sem percorrer o histórico
+        try:
+            summary = self.usage_summary(start, end)
+            if summary['total']['count'] == 0:
+                print("\nNenhum registro de uso encontrado.")
+                return
+            print("\n=== Relatório Agregado (Pós-pago) ===")
+            print(f"Período: {start or 'início'} até {end or 'hoje'}")
+            print(f"\n{'Dia':<20} {'Execuções':<10} {'CPU(s)':<10} {'Tempo(s)':<10} {'Custo':<10}")
+            print("-" * 64)
+            for day in summary['by_day']:
+                print(f"{day['day']:<20} {day['count']:<10} {day['cpu_time']:<10.2f} "
+                      f"{day['execution_time']:<10.2f} {day['cost']:<10.2f}")
+            print(f"\n{'Binário':<30} {'Execuções':<10} {'CPU(s)':<10} {'Mem(MB)':<10} {'Custo':<10}")
+            print("-" * 74)
+            for binary, stats in sorted(summary['by_binary'].items()):
+                print(f"{os.path.basename(binary):<30} {stats['count']:<10} {stats['cpu_time']:<10.2f} "
+                      f"{stats['memory_max']:<10.2f} {stats['cost']:<10.2f}")
+            print("-" * 74)
+            print(f"Total no período: {summary['total']['cost']:.2f} créditos em {summary['total']['count']} execuções")
+        except Exception as e:
+            print(f"Erro ao gerar relatório: {str(e)}")
     def clear_usage_history(self):
         # limpa o histórico de uso após o pagamento
         try:
-            if os.path.exists(self.usage_file):
-                os.remove(self.usage_file)
+            if os.path.exists(self.usage_file) and os.path.getsize(self.usage_file) > 0:
+                self.usage_ledger.clear()
+                self.usage_index.refresh()
                 print("\nHistórico de uso limpo após pagamento.")
             else:
                 print("\nNão há histórico de uso para limpar.")
         except Exception as e:
             print(f"Erro ao limpar histórico: {str(e)}")
+def percentile(values, q):
+    # percentil pelo método do posto mais próximo
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(math.ceil(q / 100 * len(ordered)) - 1, 0))]
+class BinaryProfiles:
+    # cache persistente por binário, com chave caminho + mtime + tamanho e despejo LRU: guarda o
+    # alvo de atalhos .lnk e CPU, pico de memória, duração e custo das últimas execuções
+    FIELDS = ("cpu_time", "memory_max", "execution_time", "cost")
+    def __init__(self, path, capacity=PROFILE_CACHE_SIZE, history=PROFILE_HISTORY):
+        self.path = path
+        self.capacity = capacity
+        self.history = history
+        self.entries = collections.OrderedDict()  # chave -> perfil, do menos para o mais usado
+        self.lock = threading.Lock()
+        self.unsaved = 0
+        self.last_save = 0
+        self.load()
+    @staticmethod
+    def key(path):
+        # um único stat substitui o os.path.exists; um binário alterado ganha uma entrada nova
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    def load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.entries = collections.OrderedDict(json.load(f))
+        except Exception as e:
+            print(f"Erro ao carregar perfis de binários: {str(e)}")
+            self.entries = collections.OrderedDict()
+    def save(self, force=False):
+        with self.lock:
+            if not self.unsaved or (not force and self.unsaved < PROFILE_SAVE_EVERY
+                                    and time.time() - self.last_save < PROFILE_SAVE_INTERVAL):
+                return
+            data = json.dumps(self.entries, separators=(',', ':'))
+            self.unsaved = 0
+            self.last_save = time.time()
+        try:
+            temp_path = self.path + f".{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Erro ao salvar perfis de binários: {str(e)}")
+    def get(self, key, create=False):
+        # devolve o perfil e o marca como o mais recente; cria (despejando o LRU) se pedido
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            elif create:
+                entry = self.entries[key] = {'target': None, 'runs': 0, 'results': {},
+                                             **{field: [] for field in self.FIELDS}}
+                while len(self.entries) > self.capacity:
+                    self.entries.popitem(last=False)
+            return entry
+    def set_target(self, key, target):
+        self.get(key, create=True)['target'] = target
+        with self.lock:
+            self.unsaved += 1
+    def record(self, key, cpu_time, memory_max, execution_time, cost, result):
+        entry = self.get(key, create=True)
+        with self.lock:
+            for field, value in zip(self.FIELDS, (cpu_time, memory_max, execution_time, cost)):
+                if value is not None:
+                    values = entry[field]
+                    values.append(value)
+                    del values[:-self.history]
+            entry['runs'] += 1
+            entry['results'][result] = entry['results'].get(result, 0) + 1
+            self.unsaved += 1
+        self.save()
+    def summary(self, key, min_runs=PROFILE_MIN_RUNS):
+        # percentis p50/p95 de cada campo, ou None sem execuções suficientes
+        entry = self.get(key)
+        if entry is None or entry['runs'] < min_runs:
+            return None
+        with self.lock:
+            columns = {field: list(entry[field]) for field in self.FIELDS}
+        return {field: {'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+                for field, values in columns.items() if values}
 class FMS:
     def __init__(self):
         self.run_binary_results = {}
@@ -284,8 +2013,296 @@ class FMS:
         self.used_cpu_quota = 0
         self.payment_mode = None  # "prepaid" ou "postpaid"
         self.credit_manager = None
-    def run_binary(self, binary_path, cpu_quota, memory_limit, timeout):
-        # executa um binário com monitoramento de recursos
+        self.enforcement_backend = ENFORCEMENT_BACKEND
+        self.cpu_accounting = CPU_ACCOUNTING
+        self.max_workers = DEFAULT_MAX_WORKERS
+        self.reserved_cpu_quota = 0  # quota reservada pelos jobs ainda em execução
+        self.executor = None
+        self.monitor_hub = None
+        self.record_series = True  # exporta a série temporal de cada execução
+        self.series_dir = os.path.dirname(os.path.abspath(__file__))  # onde ficam os fms_series_<usuário>/
+        self.progress_fps = PROGRESS_FPS
+        self.renderer = None
+        self.pooled = False  # run_binary usa os workers, o MonitorHub e a thread de Enter compartilhados
+        self.idle_monitors = []  # monitores prontos para reaproveitamento
+        self.enter_watcher = None
+        self.job_overhead = 0.0  # soma do tempo gasto pelo FMS fora da vida dos processos
+        self.use_profiles = True  # cache de perfis: alvos de atalhos, percentis e recusa antecipada
+        self.profile_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fms_profiles.json")
+        self.profiles = None
+        self.job_count = 0
+        self.async_jobs = 0  # jobs do núcleo asyncio em andamento, para atribuir o RUSAGE_CHILDREN
+        self.async_starts = 0
+        self.lock = threading.Lock()
+    def binary_profiles(self):
+        # cache de perfis compartilhado, carregado do disco no primeiro uso
+        with self.lock:
+            if self.profiles is None and self.use_profiles:
+                self.profiles = BinaryProfiles(self.profile_file)
+            return self.profiles
+    def profile_key(self, binary_path):
+        # chave do binário no cache de perfis, ou None (cache desligado ou arquivo inexistente)
+        profiles = self.binary_profiles()
+        if profiles is None:
+            return None
+        try:
+            return profiles.key(binary_path)
+        except OSError:
+            return None
+    def resolve_binary(self, binary_path, key=None):
+        # valida o caminho e resolve atalhos .lnk (alvo guardado no cache); devolve None em caso de erro
+        if key is None and not os.path.exists(binary_path):
+            print(f"{RED}Erro: O arquivo '{binary_path}' não existe!{RESET}")
+            return None
+        if binary_path.lower().endswith(".lnk"):
+            entry = self.profiles.get(key) if key is not None else None
+            if entry is not None and entry['target']:
+                return entry['target']
+            try:
+                target = get_platform().resolve_shortcut(binary_path)
+                print(f"Caminho real resolvido: {target}")
+            except Exception as e:
+                print(f"{RED}Erro ao resolver o atalho: {e}{RESET}")
+                return None
+            if key is not None:
+                self.profiles.set_target(key, target)
+            return target
+        return binary_path
+    def predict_rejection(self, key, cpu_quota):
+        # recusa antes de iniciar jobs que o histórico diz que seriam mortos
+        summary = self.profiles.summary(key) if key is not None else None
+        if summary is None:
+            return None
+        cpu_p95 = summary['cpu_time']['p95']
+        if cpu_p95 > cpu_quota:
+            print(f"{RED}Execução recusada: o p95 histórico de CPU ({cpu_p95:.2f}s) excede a quota ({cpu_quota:.2f}s){RESET}")
+            return "REJECTED"
+        if self.payment_mode == "prepaid" and 'cost' in summary:
+            cost_p95 = summary['cost']['p95']
+            if cost_p95 > self.credit_manager.credits:
+                print(f"{RED}Execução recusada: o p95 histórico de custo ({cost_p95:.2f}) excede o saldo ({self.credit_manager.credits:.2f}){RESET}")
+                return "NO_CREDITS"
+        return None
+    def sampling_interval(self, key):
+        # intervalo máximo de amostragem: jobs que costumam ser curtos recebem ao menos ~20 amostras
+        summary = self.profiles.summary(key) if key is not None else None
+        if summary is None:
+            return MAX_SAMPLE_INTERVAL
+        return min(max(summary['execution_time']['p50'] / 20, MIN_SAMPLE_INTERVAL), MAX_SAMPLE_INTERVAL)
+    def record_profile(self, key, monitor, execution_time, result):
+        if key is not None:
+            cost = monitor.cost.total() if monitor.cost is not None else None
+            self.profiles.record(key, monitor.total_cpu_time, monitor.max_memory_usage, execution_time,
+                                 cost, result)
+    def open_reservation(self, cpu_quota, memory_limit, timeout):
+        # no modo pré-pago reserva créditos antes de iniciar; devolve False se não houver saldo
+        if self.payment_mode != "prepaid" or self.credit_manager is None:
+            return None
+        reservation = self.credit_manager.reserve_execution(cpu_quota, memory_limit, timeout)
+        if reservation is None:
+            print(f"{RED}Créditos insuficientes para iniciar a execução.{RESET}")
+            return False
+        return reservation
+    def progress_renderer(self):
+        # renderizador de progresso compartilhado por todas as execuções deste FMS
+        with self.lock:
+            if self.renderer is None:
+                self.renderer = ProgressRenderer(self.progress_fps)
+            return self.renderer
+    def pricing(self):
+        # modelo de preço dos monitores; sem gerenciador de créditos não há custo a acumular
+        return self.credit_manager.pricing if self.credit_manager is not None else None
+    def start_process(self, binary_path, cpu_quota, memory_limit, timeout, reservation=None, run_as=None):
+        # inicia o binário sob o backend de limites e cria o monitor correspondente
+        # run_as: (nome, uid, gid) da conta em que o job roda (daemon como root); exige Popen
+        backend = create_enforcement_backend(cpu_quota, memory_limit, self.enforcement_backend)
+        try:
+            if run_as is None:
+                process = backend.spawn(binary_path) or subprocess.Popen(binary_path, **backend.popen_kwargs())
+            else:
+                kwargs = backend.popen_kwargs()
+                kwargs['preexec_fn'] = switch_user(kwargs.get('preexec_fn'), *run_as)
+                process = subprocess.Popen(binary_path, **kwargs)
+        except Exception:
+            backend.cleanup()
+            raise
+        return process, self.create_monitor(process, cpu_quota, memory_limit, timeout, backend, reservation), backend
+    def create_monitor(self, process, cpu_quota, memory_limit, timeout, backend, reservation=None):
+        # monitor do processo recém-lançado, reaproveitando um ocioso quando houver
+        with self.lock:
+            monitor = self.idle_monitors.pop() if self.idle_monitors else None
+        if monitor is None:
+            monitor = ProcessMonitor(process.pid, cpu_quota, memory_limit, timeout, backend=backend,
+                                     reservation=reservation, pricing=self.pricing())
+        else:
+            monitor.reset(process.pid, cpu_quota, memory_limit, timeout, backend=backend,
+                          reservation=reservation, pricing=self.pricing())
+        monitor.child = process
+        monitor.count_reaped = self.cpu_accounting == "reaped"
+        return monitor
+    def prepare_job(self, binary_path, cpu_quota, memory_limit, timeout):
+        # etapa comum aos dois núcleos antes do lançamento: resolve o binário, consulta o histórico e
+        # reserva créditos; devolve (chave, caminho, reserva, código), com código se o job não roda
+        key = self.profile_key(binary_path)
+        real_path = self.resolve_binary(binary_path, key)
+        if real_path is None:
+            return key, None, None, "ERROR"
+        rejected = self.predict_rejection(key, cpu_quota)
+        if rejected:
+            return key, real_path, None, rejected
+        reservation = self.open_reservation(cpu_quota, memory_limit, timeout)
+        if reservation is False:
+            return key, real_path, None, "NO_CREDITS"
+        return key, real_path, reservation, None
+    def complete_job(self, real_path, key, monitor, backend, returncode, reaped_cpu_time, start_time,
+                     cpu_quota, memory_limit, timeout, record=None):
+        # etapa comum aos dois núcleos depois do wait: totais finais, série, relatório, cobrança e perfil
+        monitor.stop_monitoring()
+        monitor.finalize(returncode, reaped_cpu_time)
+        backend.cleanup()
+        execution_time = time.time() - start_time
+        self.export_series(real_path, monitor, record)
+        if record is not None:
+            record.update(self.run_record(real_path, monitor, execution_time))
+        # sem o lock do FMS: relatório, cobrança e gravação do log não bloqueiam os outros jobs
+        with self.progress_renderer().finish(monitor):
+            result = self.finish_run(real_path, monitor, cpu_quota, memory_limit, timeout, execution_time)
+        self.record_profile(key, monitor, execution_time, result)
+        return result
+    def children_cpu_time(self):
+        # CPU de todos os filhos já coletados pelo FMS (RUSAGE_CHILDREN), ou None quando não dá para
+        # atribuir a diferença a um único job: sem o módulo resource ou com jobs agendados rodando
+        if resource is None or self.executor is not None:
+            return None
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+    def open_children_window(self):
+        # início de um job do núcleo asyncio: devolve (jobs iniciados até aqui, CPU dos filhos), com a
+        # CPU None se outro job assíncrono já estiver em andamento
+        with self.lock:
+            self.async_jobs += 1
+            self.async_starts += 1
+            starts, alone = self.async_starts, self.async_jobs == 1
+        return starts, self.children_cpu_time() if alone else None
+    def children_cpu_delta(self, window):
+        # CPU dos filhos coletados desde open_children_window; None se outro job começou no intervalo,
+        # pois o RUSAGE_CHILDREN misturaria a CPU dos dois
+        starts, baseline = window
+        with self.lock:
+            alone = self.async_starts == starts
+        current = self.children_cpu_time()
+        if not alone or baseline is None or current is None:
+            return None
+        return current - baseline
+    def close_children_window(self):
+        with self.lock:
+            self.async_jobs -= 1
+    def release_monitor(self, monitor):
+        # devolve o monitor de um job encerrado para o próximo start_process
+        with self.lock:
+            if len(self.idle_monitors) < self.max_workers:
+                self.idle_monitors.append(monitor)
+    def export_series(self, binary_path, monitor, record=None):
+        # grava a série temporal da execução em fms_series_<usuário>/, ao lado do log de uso
+        if not self.record_series:
+            return None
+        try:
+            user = self.credit_manager.user if self.credit_manager is not None else "quota"
+            directory = os.path.join(self.series_dir, f"fms_series_{user}")
+            os.makedirs(directory, exist_ok=True)
+            stamp = datetime.datetime.fromtimestamp(monitor.start_time).strftime("%Y%m%d-%H%M%S")
+            name = f"{stamp}_{monitor.pid}_{os.path.basename(binary_path)}.series"
+            path = monitor.series.export(os.path.join(directory, name), {
+                'binary': binary_path,
+                'start_time': monitor.start_time,
+                'cpu_quota': monitor.cpu_quota,
+                'memory_limit': monitor.memory_limit,
+                'result': monitor.result,
+            })
+            if record is not None:
+                record['series'] = path
+            return path
+        except Exception as e:
+            print(f"Erro ao exportar série temporal: {str(e)}")
+            return None
+    def run_record(self, binary_path, monitor, execution_time):
+        # dados da execução no formato dos arquivos de resultado do modo batch
+        return {
+            'binary': binary_path,
+            'cpu_time': monitor.total_cpu_time,
+            'memory_max': monitor.max_memory_usage,
+            'execution_time': execution_time,
+            'cost': monitor.cost.total() if monitor.cost is not None else None,
+        }
+    def finish_run(self, binary_path, monitor, cpu_quota, memory_limit, timeout, execution_time):
+        # gera o relatório, aplica quota/cobrança e devolve o código de resultado
+        final_cpu = monitor.total_cpu_time
+        final_mem = monitor.max_memory_usage
+        if monitor.reservation is not None:
+            execution_cost = monitor.cost.total()
+            # debita o restante do custo e devolve a parte não usada da reserva
+            paid = monitor.reservation.settle(execution_cost)
+            if monitor.result == "NO_CREDITS" or not paid:
+                print(f"\n{RED}ERRO: Créditos insuficientes durante a execução!{RESET}")
+                print(f"{RED}Custo total: {execution_cost:.2f} créditos | Créditos debitados: {monitor.reservation.debited:.2f}{RESET}")
+                return "NO_CREDITS"
+        print(f"\n{GREEN}=== RELATÓRIO ==={RESET}")
+        print(f"{GREEN}Tempo de execução: {execution_time:.2f}s{RESET}")
+        print(f"{GREEN}Tempo de CPU utilizado: {final_cpu:.2f}s{RESET}")
+        print(f"{GREEN}Uso máximo de memória: {final_mem:.2f}MB{RESET}")
+        if not hasattr(self, 'credit_manager') or self.credit_manager is None:
+            if monitor.killed:
+                # o código do monitor é o mesmo qualquer que seja o backend de limites
+                if monitor.result == "CPU_EXCEEDED":
+                    print(f"{RED}CPU excedida: {final_cpu:.2f}s > {cpu_quota:.2f}s{RESET}")
+                    return "LIMIT_EXCEEDED"
+                elif monitor.result == "MEMORY_EXCEEDED":
+                    print(f"{RED}Memória excedida: {final_mem:.2f}MB > {memory_limit:.2f}MB{RESET}")
+                    return "LIMIT_EXCEEDED"
+                elif monitor.result == "TIMEOUT":
+                    print(f"{RED}Timeout: {execution_time:.2f}s >= {timeout:.2f}s{RESET}")
+                    return "TIMEOUT"
+            with self.lock:
+                self.used_cpu_quota += final_cpu
+                used = self.used_cpu_quota
+            print(f"{GREEN}Quota utilizada: {used:.2f}s/{self.remaining_cpu_quota:.2f}s{RESET}")
+            print(f"{GREEN}Quota restante: {self.remaining_cpu_quota - used:.2f}s{RESET}")
+        if hasattr(self, 'credit_manager') and self.credit_manager is not None:
+            execution_cost = monitor.cost.total()
+            print(f"{GREEN}Custo: {execution_cost:.2f} créditos{RESET}")
+            if self.payment_mode == "postpaid":
+                self.credit_manager.log_usage(
+                    binary_path,
+                    final_cpu,
+                    final_mem,
+                    execution_time,
+                    execution_cost,
+                    monitor.cost.memory_mb_seconds
+                )
+            elif self.payment_mode == "prepaid":
+                if monitor.reservation is not None:
+                    print(f"\nDeduzido {execution_cost:.2f} créditos. Restante: {self.credit_manager.credits:.2f} créditos")
+                elif not self.credit_manager.deduct_credits(execution_cost):
+                    print(f"{RED}Créditos insuficientes!{RESET}")
+                    return "NO_CREDITS"
+        if monitor.result == "ERROR":
+            return "ERROR"  # o uso até o kill foi cobrado, mas o job não terminou sozinho
+        return "SUCCESS"
+    async def watch_enter_async(self, monitor, process):
+        # encerra o processo quando o usuário pressiona Enter
+        import asyncio
+        platform = get_platform()
+        while process.returncode is None:
+            if platform.enter_pressed():
+                monitor.stop_monitoring()
+                monitor.kill_process_tree()  # o job inteiro, não só o processo principal
+                break
+            await asyncio.sleep(0.1)
+    async def run_binary_async(self, binary_path, cpu_quota, memory_limit, timeout, watch_enter=False,
+                               record=None):
+        # núcleo assíncrono: o término do processo e o timeout são eventos do loop, sem polling
+        import asyncio
+        window = None
         try:
             if not os.path.exists(binary_path):
                 print(f"{RED}Erro: O arquivo '{binary_path}' não existe!{RESET}")
@@ -294,103 +2311,171 @@ class FMS:
             print(f"Quota de CPU: {cpu_quota:.2f}s")
             print(f"Limite de memória: {memory_limit:.2f}MB")
             print(f"Timeout: {timeout if timeout else 'Sem limite'}s")
-            if binary_path.lower().endswith(".lnk"):
-                try:
-                    shell = win32com.client.Dispatch("WScript.Shell")
-                    binary_path = shell.CreateShortCut(binary_path).Targetpath
-                    print(f"Caminho real resolvido: {binary_path}")
-                except Exception as e:
-                    print(f"{RED}Erro ao resolver o atalho: {e}{RESET}")
-                    return "ERROR"
+            key, binary_path, reservation, result = self.prepare_job(binary_path, cpu_quota, memory_limit, timeout)
+            if result:
+                return result
+            install_child_watcher()
+            backend = create_enforcement_backend(cpu_quota, memory_limit, self.enforcement_backend)
+            window = self.open_children_window()
             start_time = time.time()
-            process = subprocess.Popen(binary_path)
-            monitor = ProcessMonitor(process.pid, cpu_quota, memory_limit, timeout)
-            monitor_thread = monitor.start_monitoring()
-            def check_for_enter():
-                    while monitor.is_process_running():
-                        if msvcrt.kbhit():
-                            key = msvcrt.getch()
-                            if key == b'\r':  # ENTER
-                                monitor.stop_monitoring()
-                                process.terminate()
-                                break
-                        time.sleep(0.1)
-            enter_thread = threading.Thread(target=check_for_enter)
-            enter_thread.daemon = True
-            enter_thread.start()
-            while monitor.is_process_running():
-                if not monitor.monitoring:
-                    break
-                time.sleep(0.1)
-                elapsed_time = time.time() - start_time
-                if timeout and elapsed_time >= (timeout - 0.5):
-                    print(f"\n{YELLOW}Aviso: Aproximando-se do timeout ({timeout}s){RESET}")
-                    monitor.stop_monitoring()
-                    process.terminate()
-                    break
-                time.sleep(0.1)
-            if process.poll() is None:
-                print(f"\n{RED}Encerrando processo forçadamente.{RESET}")
-                process.kill()
-            process.wait()
-            monitor.stop_monitoring()
-            enter_thread.join(timeout=0.1)
-            monitor_thread.join(timeout=1)
-            end_time = time.time()
-            execution_time = end_time - start_time
-            final_cpu = monitor.total_cpu_time
-            final_mem = monitor.max_memory_usage
-            if hasattr(self, 'credit_manager') and self.payment_mode == "prepaid":
-                execution_cost = self.credit_manager.calculate_execution_cost(
-                    final_cpu,
-                    final_mem,
-                    execution_time
-                )
-                if execution_cost > self.credit_manager.credits:
-                    print(f"\n{RED}ERRO: Créditos insuficientes durante a execução!{RESET}")
-                    print(f"{RED}Custo total: {execution_cost:.2f} créditos | Créditos disponíveis: {self.credit_manager.credits:.2f}{RESET}")
-                    return "NO_CREDITS"
-            print(f"\n{GREEN}=== RELATÓRIO ==={RESET}")
-            print(f"{GREEN}Tempo de execução: {execution_time:.2f}s{RESET}")
-            print(f"{GREEN}Tempo de CPU utilizado: {final_cpu:.2f}s{RESET}")
-            print(f"{GREEN}Uso máximo de memória: {final_mem:.2f}MB{RESET}")
-            if not hasattr(self, 'credit_manager') or self.credit_manager is None:
-                if monitor.killed:
-                    if final_cpu > cpu_quota:
-                        print(f"{RED}CPU excedida: {final_cpu:.2f}s > {cpu_quota:.2f}s{RESET}")
-                        return "LIMIT_EXCEEDED"
-                    elif final_mem > memory_limit:
-                        print(f"{RED}Memória excedida: {final_mem:.2f}MB > {memory_limit:.2f}MB{RESET}")
-                        return "LIMIT_EXCEEDED"
-                    elif timeout and execution_time >= timeout:      
-                        print(f"{RED}Timeout: {execution_time:.2f}s >= {timeout:.2f}s{RESET}")
-                        return "TIMEOUT"
-                self.used_cpu_quota += final_cpu
-                print(f"{GREEN}Quota utilizada: {self.used_cpu_quota:.2f}s/{self.remaining_cpu_quota:.2f}s{RESET}")
-                print(f"{GREEN}Quota restante: {self.remaining_cpu_quota - self.used_cpu_quota:.2f}s{RESET}")
-            if hasattr(self, 'credit_manager') and self.credit_manager is not None:
-                execution_cost = self.credit_manager.calculate_execution_cost(
-                    final_cpu,
-                    final_mem,
-                    execution_time
-                )
-                print(f"{GREEN}Custo: {execution_cost:.2f} créditos{RESET}")
-                if self.payment_mode == "postpaid":
-                    self.credit_manager.log_usage(
-                        binary_path,
-                        final_cpu,
-                        final_mem,
-                        execution_time,
-                        execution_cost
-                    )
-                elif self.payment_mode == "prepaid":
-                    if not self.credit_manager.deduct_credits(execution_cost):
-                        print(f"{RED}Créditos insuficientes!{RESET}")
-                        return "NO_CREDITS"
-            return "SUCCESS"
+            try:
+                try:
+                    process = await asyncio.create_subprocess_exec(binary_path, **backend.popen_kwargs())
+                except Exception:
+                    backend.cleanup()
+                    raise
+                monitor = self.create_monitor(process, cpu_quota, memory_limit, timeout, backend, reservation)
+                monitor.max_interval = self.sampling_interval(key)
+                self.progress_renderer().add(monitor, f"{os.path.basename(binary_path)}:{process.pid}")
+                tasks = [asyncio.ensure_future(monitor.monitor_async())]
+                if watch_enter:
+                    tasks.append(asyncio.ensure_future(self.watch_enter_async(monitor, process)))
+                try:
+                    await asyncio.wait_for(process.wait(), timeout)
+                except asyncio.TimeoutError:
+                    if not monitor.killed:
+                        monitor.on_timeout()
+                    await process.wait()
+                except BaseException:
+                    # Ctrl+C: em sessão própria o job não recebe o SIGINT do terminal
+                    monitor.kill_process_tree()
+                    raise
+                monitor.stop_monitoring()
+                for task in tasks:
+                    task.cancel()
+                for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+                    if isinstance(outcome, Exception) and monitor.result != "ERROR":
+                        monitor.fail(outcome)  # o job não pode passar por uma saída normal sem monitor
+                # a rusage do filho coletado pelo asyncio só aparece no total de RUSAGE_CHILDREN
+                result = self.complete_job(binary_path, key, monitor, backend, process.returncode,
+                                           self.children_cpu_delta(window), start_time,
+                                           cpu_quota, memory_limit, timeout, record)
+                self.release_monitor(monitor)
+                return result
+            finally:
+                if reservation:
+                    reservation.release()  # sem efeito se a reserva já foi liquidada
         except Exception as e:
             print(f"{RED}Erro executando binário: {str(e)}{RESET}")
             return "ERROR"
+        finally:
+            if window is not None:
+                self.close_children_window()
+    def run_binary(self, binary_path, cpu_quota, memory_limit, timeout, record=None):
+        # executa um binário com monitoramento de recursos (interface síncrona do núcleo asyncio)
+        import asyncio
+        # a tecla Enter só é observada quando há um terminal interativo
+        watch_enter = sys.stdin is not None and sys.stdin.isatty()
+        if self.pooled:
+            with self.lock:
+                if watch_enter and self.enter_watcher is None:
+                    self.enter_watcher = threading.Thread(target=self.watch_enter)
+                    self.enter_watcher.daemon = True
+                    self.enter_watcher.start()
+            return self.submit(binary_path, cpu_quota, memory_limit, timeout, record).result()
+        result = asyncio.run(self.run_binary_async(binary_path, cpu_quota, memory_limit, timeout, watch_enter, record))
+        if metrics is not None:
+            metrics.jobs.inc(result)
+        return result
+    def submit(self, binary_path, cpu_quota, memory_limit=0, timeout=None, record=None):
+        # agenda a execução concorrente de um binário; devolve um Future com o código de resultado
+        import concurrent.futures
+        if not self.reserve_quota(cpu_quota):
+            future = concurrent.futures.Future()
+            future.set_result("QUOTA_EXCEEDED")
+            return future
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+                self.monitor_hub = MonitorHub()
+        return self.executor.submit(self.run_job, binary_path, cpu_quota, memory_limit, timeout, record)
+    def reserve_quota(self, cpu_quota):
+        # no modo quota, reserva a quota do job na admissão; False se exceder a disponível
+        with self.lock:
+            if self.payment_mode is None:
+                available = self.remaining_cpu_quota - self.used_cpu_quota - self.reserved_cpu_quota
+                if cpu_quota > available:
+                    print(f"{RED}Erro: Quota excede a disponível ({available:.2f}s){RESET}")
+                    return False
+                self.reserved_cpu_quota += cpu_quota
+        return True
+    def release_quota(self, cpu_quota):
+        with self.lock:
+            if self.payment_mode is None:
+                self.reserved_cpu_quota -= cpu_quota
+    def run_job(self, binary_path, cpu_quota, memory_limit, timeout, record=None, job=None):
+        # executa um job agendado: amostrado pelo MonitorHub compartilhado, sem thread própria
+        # job (daemon): recebe o monitor enquanto o processo roda, para status, amostras e cancelamento
+        result = "ERROR"
+        job_start = time.time()
+        process_time = 0
+        try:
+            key, real_path, reservation, rejected = self.prepare_job(binary_path, cpu_quota, memory_limit, timeout)
+            if rejected:
+                result = rejected
+            else:
+                try:
+                    start_time = time.time()
+                    run_as = job.run_as if job is not None else None
+                    process, monitor, backend = self.start_process(real_path, cpu_quota, memory_limit, timeout,
+                                                                   reservation, run_as)
+                    monitor.max_interval = self.sampling_interval(key)
+                    self.progress_renderer().add(monitor, f"{os.path.basename(real_path)}:{process.pid}")
+                    self.monitor_hub.add(monitor)
+                    if job is not None:
+                        job.attach(monitor)
+                    monitor.wait_child()
+                    process_time = time.time() - monitor.start_time
+                    if job is not None:
+                        job.detach()  # coletado: um cancelamento daqui em diante não tem o que matar
+                    self.monitor_hub.remove(monitor)
+                    # wait4 do posix_spawn
+                    result = self.complete_job(real_path, key, monitor, backend, process.returncode,
+                                               getattr(process, 'cpu_time', None), start_time,
+                                               cpu_quota, memory_limit, timeout, record)
+                    self.release_monitor(monitor)
+                finally:
+                    if reservation:
+                        reservation.release()  # sem efeito se a reserva já foi liquidada
+        except Exception as e:
+            print(f"{RED}Erro executando binário: {str(e)}{RESET}")
+        finally:
+            self.release_quota(cpu_quota)
+            with self.lock:
+                self.run_binary_results[binary_path] = result
+                overhead = time.time() - job_start - process_time
+                self.job_overhead += overhead
+                self.job_count += 1
+            if metrics is not None:
+                metrics.jobs.inc(result)
+                metrics.job_overhead_seconds.observe(overhead)
+        return result
+    def mean_job_overhead(self):
+        # tempo médio por job gasto pelo FMS (resolução, lançamento, monitor, cobrança, relatório)
+        return self.job_overhead / self.job_count if self.job_count else 0.0
+    def watch_enter(self):
+        # thread única do modo com pool: Enter encerra os jobs em execução
+        platform = get_platform()
+        while True:
+            if platform.enter_pressed():
+                self.cancel_all()
+            time.sleep(0.1)
+    def cancel_all(self):
+        # mata todos os jobs agendados em execução (os jobs não recebem o Ctrl+C do terminal)
+        if self.monitor_hub is not None:
+            with self.monitor_hub.lock:
+                monitors = list(self.monitor_hub.monitors)
+            for monitor in monitors:
+                monitor.kill_process_tree()
+    def shutdown(self, wait=True):
+        # aguarda os jobs agendados, libera os workers, grava o cache de perfis e fecha o log de uso
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+        if self.profiles is not None:
+            self.profiles.save(force=True)
+        if self.credit_manager is not None:
+            self.credit_manager.close()
     def credit_management_menu(self):
         # menu de gerenciamento de créditos (pré-pago ou pós-pago)
         while True:
@@ -401,6 +2486,7 @@ class FMS:
             elif self.payment_mode == "postpaid":
                 print("1. Ver relatório de uso")
                 print("2. Limpar histórico após pagamento")
+                print("3. Ver relatório agregado (por dia e por binário)")
             print("0. Voltar")
             option = input("\nEscolha uma opção: ")
             if option == "0":
@@ -419,6 +2505,10 @@ class FMS:
                     print(f"Créditos disponíveis: {self.credit_manager.credits:.2f}")
                 elif self.payment_mode == "postpaid":
                     self.credit_manager.clear_usage_history()
+            elif option == "3" and self.payment_mode == "postpaid":
+                start = input("Data inicial (AAAA-MM-DD, vazio para todo o histórico): ").strip() or None
+                end = input("Data final (AAAA-MM-DD, vazio para hoje): ").strip() or None
+                self.credit_manager.show_usage_summary(start, end)
             else:
                 print("Opção inválida.")
     def setup_payment_mode(self):
@@ -534,6 +2624,7 @@ class FMS:
                 self.credit_management_menu()
             else:
                 print("Opção inválida.")
+        self.shutdown()
         print(f"\n{GREEN}=== FMS encerrado ==={RESET}")
         if self.payment_mode is None:
             print(f"{GREEN}Tempo CPU total: {self.used_cpu_quota:.2f}s/{self.remaining_cpu_quota:.2f}s{RESET}")
@@ -541,6 +2632,751 @@ class FMS:
             print(f"{GREEN}Créditos finais: {self.credit_manager.credits:.2f}{RESET}")
         elif self.payment_mode == "postpaid":
             print(f"{GREEN}Consulte seu histórico para ver a fatura.{RESET}")
-if __name__ == "__main__":
+RESULT_FIELDS = ['id', 'binary', 'result', 'cpu_time', 'memory_max', 'execution_time', 'cost', 'series']
+def read_manifest(path):
+    # lê o manifesto em streaming: JSON Lines (.jsonl) ou CSV com cabeçalho
+    with open(path, 'r', newline='') as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield line  # decodificada por parse_job, para uma linha inválida não parar o lote
+def parse_job(job, defaults):
+    # normaliza uma linha do manifesto para (id, binário, quota de CPU, memória, timeout)
+    # ValueError para uma linha malformada ou com valores inválidos
+    if isinstance(job, str):
+        job = json.loads(job)
+    if not isinstance(job, dict):
+        raise ValueError("a linha não é um objeto JSON")
+    binary_path = job.get('binary') or job.get('binary_path')
+    if not binary_path:
+        raise ValueError("binário não informado")
+    cpu_quota = job.get('cpu_quota')
+    cpu_quota = float(cpu_quota if cpu_quota not in (None, "") else defaults.cpu_quota)
+    if not cpu_quota > 0:
+        raise ValueError(f"a quota deve ser positiva ({cpu_quota})")
+    memory_limit = float(job.get('memory_limit') or defaults.memory_limit or 0)
+    timeout = float(job.get('timeout') or defaults.timeout or 0) or None
+    return job.get('id'), binary_path, cpu_quota, memory_limit, timeout
+class ResultWriter:
+    # arquivo de resultados com um registro por job: JSON Lines ou CSV, conforme a extensão
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='') if path != "-" else sys.stdout
+        self.csv_writer = None
+        if path.lower().endswith(".csv"):
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+            self.csv_writer.writeheader()
+    def write(self, record):
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(record)
+        else:
+            self.file.write(json.dumps({field: record.get(field) for field in RESULT_FIELDS}) + "\n")
+        self.file.flush()
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+def configure_fms(args, user=None, credit_store=None):
+    # cria o FMS sem perguntas interativas, a partir dos argumentos da linha de comando
     fms = FMS()
-    fms.main_loop()
\ No newline at end of file
+    fms.enforcement_backend = args.backend
+    fms.cpu_accounting = args.cpu_accounting
+    fms.record_series = not args.no_series
+    fms.progress_fps = args.progress_fps
+    fms.pooled = args.pool
+    fms.use_profiles = not args.no_profiles
+    if args.mode in ("prepaid", "postpaid"):
+        fms.payment_mode = args.mode
+        fms.credit_manager = CreditManager(user or args.user or "default_user", credit_store)
+        fms.credit_manager.set_pricing(args.pricing)
+    else:
+        fms.remaining_cpu_quota = args.total_quota if args.total_quota else math.inf
+    return fms
+def run_batch(fms, args):
+    # executa os jobs do manifesto com paralelismo limitado, gravando os resultados ao terminar
+    import concurrent.futures
+    writer = ResultWriter(args.output)
+    counts = collections.Counter()
+    pending = {}
+    def collect(done):
+        for future in done:
+            record = pending.pop(future)
+            record['result'] = future.result()
+            counts[record['result']] += 1
+            writer.write(record)
+    output = open(os.devnull, 'w') if args.quiet else sys.stdout
+    try:
+        with contextlib.redirect_stdout(output):
+            for index, job in enumerate(read_manifest(args.manifest)):
+                try:
+                    job_id, binary_path, cpu_quota, memory_limit, timeout = parse_job(job, args)
+                except ValueError as e:
+                    # registra a linha inválida como ERROR e segue com o restante do manifesto
+                    print(f"Erro no job {index} do manifesto: {str(e)}", file=sys.stderr)
+                    counts["ERROR"] += 1
+                    writer.write({'id': index, 'result': "ERROR"})
+                    continue
+                record = {'id': job_id if job_id is not None else index, 'binary': binary_path}
+                pending[fms.submit(binary_path, cpu_quota, memory_limit, timeout, record)] = record
+                if len(pending) >= fms.max_workers * 2:  # não lê o manifesto inteiro de uma vez
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    collect(done)
+            collect(concurrent.futures.wait(pending)[0])
+    except KeyboardInterrupt:
+        fms.cancel_all()
+        raise
+    finally:
+        fms.shutdown()
+        writer.close()
+        if output is not sys.stdout:
+            output.close()
+    summary = ", ".join(f"{result}={count}" for result, count in sorted(counts.items()))
+    print(f"{sum(counts.values())} jobs concluídos: {summary}", file=sys.stderr)
+    print(f"Sobrecarga média do FMS por job: {fms.mean_job_overhead() * 1000:.2f}ms", file=sys.stderr)
+    return 0 if set(counts) <= {"SUCCESS"} else 1
+class DaemonJob:
+    # job submetido ao daemon; o estado é lido por status, samples e cancel de outras conexões
+    def __init__(self, job_id, user, binary_path, cpu_quota, memory_limit, timeout, run_as=None):
+        self.id = job_id
+        self.user = user
+        self.run_as = run_as  # (nome, uid, gid) quando o job roda em outra conta que não a do daemon
+        self.binary = binary_path
+        self.cpu_quota = cpu_quota
+        self.memory_limit = memory_limit
+        self.timeout = timeout
+        self.state = "queued"  # queued, running, done ou cancelled
+        self.result = None
+        self.record = {'id': job_id, 'binary': binary_path}
+        self.monitor = None
+        self.cancelled = False
+        self.submitted = time.time()
+        self.started = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+    def attach(self, monitor):
+        # chamado por run_job com o processo já iniciado; um cancelamento anterior o mata na hora
+        with self.lock:
+            self.monitor = monitor
+            self.state = "running"
+            self.started = monitor.start_time
+            if self.cancelled:
+                monitor.kill_process_tree()
+    def detach(self):
+        # antes de o monitor ser reaproveitado por outro job
+        with self.lock:
+            self.monitor = None
+    def cancel(self):
+        # marca o job como cancelado e, se estiver rodando, mata a árvore de processos inteira
+        with self.lock:
+            if self.done.is_set():
+                return False
+            self.cancelled = True
+            if self.monitor is not None:
+                self.monitor.kill_process_tree()
+            return True
+    def finish(self, result):
+        with self.lock:
+            self.result = "CANCELLED" if self.cancelled else result
+            self.state = "cancelled" if self.cancelled else "done"
+            self.monitor = None
+        self.done.set()
+    def sample(self):
+        # última amostra do job em execução, ou None
+        with self.lock:
+            sample = self.monitor.last_sample if self.monitor is not None else None
+        return sample._asdict() if sample is not None else None
+    def to_dict(self):
+        status = {
+            'job': self.id,
+            'user': self.user,
+            'binary': self.binary,
+            'state': self.state,
+            'result': self.result,
+            'cpu_quota': self.cpu_quota,
+            'memory_limit': self.memory_limit,
+            'timeout': self.timeout,
+            'submitted': self.submitted,
+            'started': self.started,
+        }
+        if self.done.is_set():
+            status.update({field: self.record.get(field) for field in RESULT_FIELDS[3:]})
+        else:
+            status['sample'] = self.sample()
+        return status
+class Tenant:
+    # estado de um usuário no daemon: FMS próprio (quota ou CreditManager) e fila de jobs pendentes
+    def __init__(self, user, fms):
+        self.user = user
+        self.fms = fms
+        self.queue = collections.deque()
+        self.running = 0
+        self.cpu_used = 0.0  # CPU consumida pelos jobs do usuário, critério de desempate do escalonador
+        self.served = 0.0  # último despacho de um job do usuário, último critério de desempate
+class FMSDaemon:
+    # serviço de longa duração para vários usuários: cada usuário tem o seu FMS (quota, créditos,
+    # resultados) e todos compartilham os workers, o MonitorHub, o banco de créditos e o cache de perfis
+    def __init__(self, args, workers=DEFAULT_MAX_WORKERS):
+        self.args = args
+        self.tenants = {}
+        self.jobs = collections.OrderedDict()
+        self.job_ids = itertools.count(1)
+        self.condition = threading.Condition()  # protege tenants, filas e jobs
+        self.monitor_hub = MonitorHub()
+        self.credit_store = None
+        self.profiles = None
+        self.stopping = False
+        self.server = None
+        self.operations = {
+            'submit': self.submit,
+            'status': self.status,
+            'samples': self.samples,
+            'cancel': self.cancel,
+            'balance': self.balance,
+            'usage': self.usage,
+            'credits': self.add_credits,
+        }
+        self.owner_operations = {'credits'}  # créditos só são adicionados pelo dono do daemon
+        self.workers = [threading.Thread(target=self.run_worker) for _ in range(workers)]
+        for worker in self.workers:
+            worker.daemon = True
+            worker.start()
+    def tenant(self, user):
+        # FMS do usuário, criado na primeira requisição com a configuração do daemon
+        if not user:
+            raise ValueError("usuário não informado")
+        with self.condition:
+            tenant = self.tenants.get(user)
+            if tenant is None:
+                fms = configure_fms(self.args, user, self.credit_store)
+                fms.progress_fps = 0  # o daemon não tem terminal: o progresso vai para os clientes
+                fms.monitor_hub = self.monitor_hub
+                fms.profiles = self.profiles
+                fms.binary_profiles()
+                self.profiles = fms.profiles
+                if fms.credit_manager is not None:
+                    self.credit_store = fms.credit_manager.credit_store
+                tenant = self.tenants[user] = Tenant(user, fms)
+            return tenant
+    def find_job(self, request):
+        # job do próprio usuário; jobs de outros usuários não são visíveis
+        with self.condition:
+            job = self.jobs.get(int(request['job']))
+        if job is None or job.user != request.get('user'):
+            raise LookupError(f"job {request['job']} não encontrado")
+        return job
+    def next_job(self):
+        # escalonamento justo: o próximo job vem do usuário com menos jobs em execução (empate: menos
+        # CPU consumida, depois o atendido há mais tempo), então quem enfileira muitos jobs não
+        # monopoliza os workers
+        with self.condition:
+            while not self.stopping:
+                ready = [tenant for tenant in self.tenants.values() if tenant.queue]
+                if ready:
+                    tenant = min(ready, key=lambda tenant: (tenant.running, tenant.cpu_used, tenant.served))
+                    tenant.running += 1
+                    tenant.served = time.time()
+                    return tenant, tenant.queue.popleft()
+                self.condition.wait()
+            return None
+    def run_worker(self):
+        while True:
+            item = self.next_job()
+            if item is None:
+                return
+            tenant, job = item
+            try:
+                if job.cancelled:
+                    tenant.fms.release_quota(job.cpu_quota)
+                    job.finish("CANCELLED")
+                else:
+                    job.finish(tenant.fms.run_job(job.binary, job.cpu_quota, job.memory_limit, job.timeout,
+                                                  job.record, job))
+            except Exception as e:
+                print(f"{RED}Erro executando job {job.id}: {str(e)}{RESET}")
+                job.finish("ERROR")
+            finally:
+                with self.condition:
+                    tenant.running -= 1
+                    tenant.cpu_used += job.record.get('cpu_time') or 0
+    def submit(self, request, send):
+        run_as = self.job_account(request)
+        tenant = self.tenant(request['user'])
+        cpu_quota = float(request['cpu_quota'])
+        memory_limit = float(request.get('memory_limit') or 0)
+        timeout = float(request.get('timeout') or 0) or None
+        if not 0 < cpu_quota < math.inf:
+            raise ValueError("a quota deve ser positiva e finita")
+        if not math.isfinite(memory_limit) or (timeout is not None and not math.isfinite(timeout)):
+            raise ValueError("limite de memória e timeout devem ser finitos")
+        job = DaemonJob(next(self.job_ids), tenant.user, request['binary'], cpu_quota, memory_limit, timeout, run_as)
+        admitted = tenant.fms.reserve_quota(cpu_quota)
+        with self.condition:
+            self.jobs[job.id] = job
+            while len(self.jobs) > DAEMON_JOB_HISTORY and next(iter(self.jobs.values())).done.is_set():
+                self.jobs.popitem(last=False)
+            if admitted:
+                tenant.queue.append(job)
+                self.condition.notify()
+        if not admitted:
+            job.finish("QUOTA_EXCEEDED")
+        return {'job': job.id, 'state': job.state, 'result': job.result}
+    def status(self, request, send):
+        # um job ou todos os jobs do usuário
+        if request.get('job') is not None:
+            return {'job': self.find_job(request).to_dict()}
+        with self.condition:
+            jobs = [job for job in self.jobs.values() if job.user == request.get('user')]
+        return {'jobs': [job.to_dict() for job in jobs]}
+    def samples(self, request, send):
+        # envia cada nova amostra do job até ele terminar; a última mensagem traz o status final
+        job = self.find_job(request)
+        interval = max(float(request.get('interval') or DAEMON_SAMPLE_INTERVAL), MIN_SAMPLE_INTERVAL)
+        last = None
+        while not job.done.wait(interval):
+            sample = job.sample()
+            if sample is not None and sample != last:
+                send({'sample': sample})
+                last = sample
+        return {'job': job.to_dict()}
+    def cancel(self, request, send):
+        job = self.find_job(request)
+        cancelled = job.cancel()
+        tenant = self.tenants[job.user]
+        with self.condition:
+            queued = job in tenant.queue
+            if queued:
+                tenant.queue.remove(job)
+        if queued:
+            tenant.fms.release_quota(job.cpu_quota)
+            job.finish("CANCELLED")
+        return {'cancelled': cancelled, 'job': job.to_dict()}
+    def balance(self, request, send):
+        fms = self.tenant(request['user']).fms
+        if fms.credit_manager is None:
+            with fms.lock:
+                # quota ilimitada (math.inf) vai como null: Infinity não é JSON válido
+                unlimited = math.isinf(fms.remaining_cpu_quota)
+                return {
+                    'user': request['user'],
+                    'mode': "quota",
+                    'total': None if unlimited else fms.remaining_cpu_quota,
+                    'used': fms.used_cpu_quota,
+                    'reserved': fms.reserved_cpu_quota,
+                    'available': None if unlimited else
+                    fms.remaining_cpu_quota - fms.used_cpu_quota - fms.reserved_cpu_quota,
+                }
+        return {'user': request['user'], 'mode': fms.payment_mode, 'credits': fms.credit_manager.credits}
+    def usage(self, request, send):
+        fms = self.tenant(request['user']).fms
+        if fms.credit_manager is None:
+            raise ValueError("relatório de uso disponível apenas nos modos pré e pós-pago")
+        return {'usage': fms.credit_manager.usage_summary(request.get('start'), request.get('end'))}
+    def add_credits(self, request, send):
+        fms = self.tenant(request['user']).fms
+        if fms.payment_mode != "prepaid":
+            raise ValueError("créditos disponíveis apenas no modo pré-pago")
+        if not fms.credit_manager.add_credits(float(request['amount'])):
+            raise ValueError("quantidade inválida")
+        return {'credits': fms.credit_manager.credits}
+    def job_account(self, request):
+        # conta do job: a do daemon para o dono (e no TCP confiável); para outras contas o daemon
+        # precisa ser root para trocar de usuário no filho, senão o job é recusado
+        uid = request['uid']
+        if uid is None or uid == os.geteuid():
+            return None
+        if os.geteuid() != 0:
+            raise PermissionError("o daemon não roda como root e não executa jobs de outras contas")
+        import pwd
+        account = pwd.getpwuid(uid)
+        return account.pw_name, uid, account.pw_gid
+    def authorize(self, request, peer_uid):
+        # fixa o usuário da requisição e diz se quem pede é o dono do daemon; no socket Unix o usuário
+        # é a conta do processo cliente (SO_PEERCRED) e só o dono pode agir por outro usuário; sem
+        # credenciais do kernel (TCP, aceito só com --trust-tcp) o daemon atende um único usuário
+        request['uid'] = peer_uid
+        if peer_uid is None:
+            request['user'] = self.args.user or "default_user"
+            return True
+        owner = peer_uid == os.geteuid()
+        if not owner or not request.get('user'):
+            try:
+                import pwd
+                request['user'] = pwd.getpwuid(peer_uid).pw_name
+            except (ImportError, KeyError):
+                request['user'] = str(peer_uid)
+        return owner
+    def handle(self, request, send, peer_uid=None):
+        # atende uma requisição; cada resposta é um objeto JSON e a última traz "ok"
+        if not isinstance(request, dict):
+            send({'ok': False, 'error': "requisição inválida: esperado um objeto JSON"})
+            return
+        operation = self.operations.get(request.get('op'))
+        if operation is None:
+            send({'ok': False, 'error': f"operação desconhecida: {request.get('op')}"})
+            return
+        if not self.authorize(request, peer_uid) and request['op'] in self.owner_operations:
+            send({'ok': False, 'error': f"operação restrita ao dono do daemon: {request['op']}"})
+            return
+        try:
+            response = operation(request, send)
+        except PermissionError as e:
+            send({'ok': False, 'error': f"não permitido: {str(e)}"})
+            return
+        except (LookupError, ValueError, TypeError) as e:
+            send({'ok': False, 'error': f"requisição inválida: {str(e)}"})
+            return
+        send({'ok': True, **response})
+    def serve(self, address):
+        # cria o servidor (socket Unix ou TCP em 127.0.0.1), uma thread por conexão
+        import socketserver
+        daemon = self
+        class DaemonHandler(socketserver.StreamRequestHandler):
+            def send(self, message):
+                # Infinity/NaN não são JSON válido: um valor assim vira uma resposta de erro
+                try:
+                    line = json.dumps(message, allow_nan=False)
+                except ValueError as e:
+                    line = json.dumps({'ok': False, 'error': f"resposta inválida: {str(e)}"})
+                self.wfile.write((line + "\n").encode('utf-8'))
+            def peer_uid(self):
+                # uid do processo cliente informado pelo kernel; None fora do socket Unix
+                import socket
+                import struct
+                if self.request.family != getattr(socket, "AF_UNIX", None):
+                    return None
+                if not hasattr(socket, "SO_PEERCRED"):
+                    return os.geteuid()  # sem SO_PEERCRED o socket é 0600: só o dono conecta
+                credentials = self.request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+                return struct.unpack("3i", credentials)[1]
+            def handle(self):
+                peer_uid = self.peer_uid()
+                try:
+                    for line in self.rfile:
+                        if line.strip():
+                            try:
+                                request = json.loads(line)
+                            except ValueError as e:
+                                self.send({'ok': False, 'error': f"JSON inválido: {str(e)}"})
+                                continue
+                            daemon.handle(request, self.send, peer_uid)
+                except OSError:
+                    pass  # cliente desconectado
+        if isinstance(address, str):
+            if os.path.exists(address):
+                try:
+                    DaemonClient(address).connect().close()
+                    raise RuntimeError(f"já existe um daemon em {address}")
+                except OSError:
+                    os.unlink(address)  # socket abandonado por uma execução anterior
+            self.server = socketserver.ThreadingUnixStreamServer(address, DaemonHandler)
+            import socket
+            os.chmod(address, DAEMON_SOCKET_MODE if hasattr(socket, "SO_PEERCRED") else 0o600)
+        else:
+            self.server = socketserver.ThreadingTCPServer(address, DaemonHandler)
+        self.server.daemon_threads = True
+        return self.server
+    def shutdown(self):
+        # cancela os jobs pendentes e em execução, espera os workers e fecha cada usuário (perfis e log de uso)
+        with self.condition:
+            self.stopping = True
+            jobs = [job for job in self.jobs.values() if not job.done.is_set()]
+            for tenant in self.tenants.values():
+                tenant.queue.clear()
+            self.condition.notify_all()
+        for job in jobs:
+            job.cancel()
+        for worker in self.workers:
+            worker.join()
+        for job in jobs:
+            if not job.done.is_set():
+                self.tenants[job.user].fms.release_quota(job.cpu_quota)
+                job.finish("CANCELLED")
+        for tenant in self.tenants.values():
+            tenant.fms.shutdown()
+        if self.server is not None:
+            self.server.server_close()
+            if isinstance(self.server.server_address, str):
+                with contextlib.suppress(OSError):
+                    os.unlink(self.server.server_address)
+class DaemonClient:
+    # cliente fino do daemon: uma conexão por requisição; o estado do usuário fica todo no daemon
+    # user só é respeitado para o dono do daemon; as demais contas agem sempre como elas mesmas
+    def __init__(self, address, user=None):
+        self.address = address
+        self.user = user
+    def connect(self):
+        import socket
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.address)
+            except OSError:
+                sock.close()
+                raise
+            return sock
+        return socket.create_connection(self.address)
+    def stream(self, op, **fields):
+        # envia a requisição e devolve as mensagens à medida que chegam, até a resposta final
+        with contextlib.closing(self.connect()) as sock:
+            sock.sendall((json.dumps({'op': op, 'user': self.user, **fields}) + "\n").encode('utf-8'))
+            with sock.makefile('r', encoding='utf-8') as reader:
+                for line in reader:
+                    message = json.loads(line)
+                    if 'ok' in message and not message['ok']:
+                        raise RuntimeError(message['error'])
+                    yield message
+                    if 'ok' in message:
+                        return
+        raise RuntimeError("conexão encerrada pelo daemon")
+    def request(self, op, **fields):
+        for message in self.stream(op, **fields):
+            if 'ok' in message:
+                return message
+    def run(self, binary_path, cpu_quota, memory_limit=0, timeout=None):
+        # submete o job, mostra o progresso recebido do daemon e o relatório final; Ctrl+C cancela
+        job_id = self.request("submit", binary=os.path.abspath(binary_path), cpu_quota=cpu_quota,
+                              memory_limit=memory_limit, timeout=timeout)['job']
+        print(f"\nJob {job_id}: {binary_path}")
+        is_tty = sys.stdout.isatty()
+        while True:
+            try:
+                for message in self.stream("samples", job=job_id):
+                    sample = message.get('sample')
+                    if sample is not None and is_tty:
+                        print(f"\r{YELLOW}Progresso - Tempo: {sample['elapsed']:.1f}s | "
+                              f"CPU: {sample['cpu_time']:.2f}s/{cpu_quota:.2f}s | "
+                              f"Memória: {sample['memory']:.1f}MB | Processos: {sample['n_procs']}{RESET}",
+                              end="", flush=True)
+                    elif 'ok' in message:
+                        status = message['job']
+                break
+            except KeyboardInterrupt:
+                print(f"\n{RED}Cancelando o job {job_id}...{RESET}")
+                self.request("cancel", job=job_id)
+        color = GREEN if status['result'] == "SUCCESS" else RED
+        print(f"\n{GREEN}=== RELATÓRIO ==={RESET}")
+        if status['execution_time'] is not None:
+            print(f"{GREEN}Tempo de execução: {status['execution_time']:.2f}s{RESET}")
+            print(f"{GREEN}Tempo de CPU utilizado: {status['cpu_time']:.2f}s{RESET}")
+            print(f"{GREEN}Uso máximo de memória: {status['memory_max']:.2f}MB{RESET}")
+        if status['cost'] is not None:
+            print(f"{GREEN}Custo: {status['cost']:.2f} créditos{RESET}")
+        print(f"{color}Resultado: {status['result']}{RESET}")
+        return status['result']
+    def show_balance(self):
+        balance = self.request("balance")
+        print(f"\nUsuário: {balance['user']}")
+        if balance['mode'] == "quota" and balance['total'] is None:
+            print(f"{GREEN}Quota CPU: sem limite (usada: {balance['used']:.2f}s){RESET}")
+        elif balance['mode'] == "quota":
+            print(f"{GREEN}Quota CPU disponível: {balance['available']:.2f}s "
+                  f"(usada: {balance['used']:.2f}s/{balance['total']:.2f}s){RESET}")
+        else:
+            print(f"{GREEN}Créditos ({balance['mode']}): {balance['credits']:.2f}{RESET}")
+        return balance['mode']
+    def show_jobs(self):
+        for job in self.request("status")['jobs']:
+            print(f"{job['job']:>5} {job['state']:<10} {str(job['result'] or '-'):<16} {job['binary']}")
+    def menu(self):
+        # substitui o loop interativo do FMS local; quota e créditos são os do usuário no daemon
+        print("=== File Monitoring System (FMS) - daemon ===")
+        while True:
+            mode = self.show_balance()
+            print("\n=== Menu Principal ===")
+            print("1. Executar binário")
+            print("2. Ver jobs")
+            print("3. Cancelar job")
+            if mode != "quota":
+                print("4. Ver relatório de uso")
+            if mode == "prepaid":
+                print("5. Adicionar créditos")
+            print("0. Sair")
+            option = input("\nEscolha uma opção: ")
+            try:
+                if option == "0":
+                    break
+                elif option == "1":
+                    binary_path = input("\nDigite o caminho do binário a ser executado: ").strip('\'"')
+                    cpu_quota = float(input("Digite a quota de tempo de CPU (segundos): "))
+                    memory_limit = float(input("Limite de memória (MB, 0 para sem limite): ") or 0)
+                    timeout = float(input("Timeout (segundos, 0 para sem timeout): ") or 0) or None
+                    self.run(binary_path, cpu_quota, memory_limit, timeout)
+                elif option == "2":
+                    self.show_jobs()
+                elif option == "3":
+                    print(self.request("cancel", job=int(input("Número do job: ")))['job']['state'])
+                elif option == "4" and mode != "quota":
+                    print(json.dumps(self.request("usage")['usage'], indent=4))
+                elif option == "5" and mode == "prepaid":
+                    self.request("credits", amount=float(input("Digite a quantidade de créditos a adicionar: ")))
+                else:
+                    print("Opção inválida.")
+            except ValueError:
+                print("Valores inválidos. Tente novamente.")
+            except RuntimeError as e:
+                print(f"{RED}Erro: {str(e)}{RESET}")
+        print(f"\n{GREEN}=== FMS encerrado ==={RESET}")
+def daemon_address(args):
+    # --port escolhe TCP em 127.0.0.1; senão o socket Unix (ou a porta padrão, sem AF_UNIX)
+    import socket
+    if args.port is not None:
+        return ("127.0.0.1", args.port)
+    if args.socket or hasattr(socket, "AF_UNIX"):
+        return args.socket or DAEMON_SOCKET
+    return ("127.0.0.1", DAEMON_PORT)
+def run_daemon(args):
+    # atende clientes até Ctrl+C ou SIGTERM
+    address = daemon_address(args)
+    if not isinstance(address, str) and not args.trust_tcp:
+        print(f"{RED}Erro: em TCP qualquer conta local pode usar o daemon; use --trust-tcp para servir "
+              f"um único usuário ({args.user or 'default_user'}) assim{RESET}", file=sys.stderr)
+        return 1
+    daemon = FMSDaemon(args, args.parallel)
+    try:
+        server = daemon.serve(address)
+    except (OSError, RuntimeError) as e:
+        print(f"{RED}Erro ao iniciar o daemon: {str(e)}{RESET}", file=sys.stderr)
+        daemon.shutdown()
+        return 1
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f"Daemon do FMS em {server.server_address} (modo {args.mode}, {args.parallel} workers)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
+    print(f"\n{GREEN}=== Daemon do FMS encerrado ==={RESET}", file=sys.stderr)
+    return 0
+def run_client(args):
+    client = DaemonClient(daemon_address(args), args.user)
+    try:
+        if args.client_command is None:
+            client.menu()
+            return 0
+        if args.client_command == "run":
+            return 0 if client.run(args.binary, args.cpu_quota, args.memory_limit, args.timeout or None) == "SUCCESS" else 1
+        if args.client_command == "submit":
+            response = client.request("submit", binary=os.path.abspath(args.binary), cpu_quota=args.cpu_quota,
+                                      memory_limit=args.memory_limit, timeout=args.timeout or None)
+        elif args.client_command == "samples":
+            for message in client.stream("samples", job=args.job):
+                print(json.dumps(message), flush=True)
+            return 0
+        elif args.client_command in ("status", "cancel"):
+            response = client.request(args.client_command, job=args.job)
+        elif args.client_command == "usage":
+            response = client.request("usage", start=args.start, end=args.end)
+        elif args.client_command == "credits":
+            response = client.request("credits", amount=args.amount)
+        else:
+            response = client.request(args.client_command)
+    except (OSError, RuntimeError) as e:
+        print(f"{RED}Erro: {str(e)}{RESET}", file=sys.stderr)
+        return 1
+    del response['ok']
+    print(json.dumps(response, indent=4))
+    return 0
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog="fms", description="File Monitoring System: executa binários com limites de CPU, memória e tempo.")
+    parser.add_argument("--mode", choices=["quota", "prepaid", "postpaid"], default="quota",
+                        help="modo de operação (padrão: quota)")
+    parser.add_argument("--user", help="usuário dos modos pré e pós-pago (padrão: default_user; no cliente do "
+                        "daemon, a própria conta)")
+    parser.add_argument("--total-quota", type=float, help="quota total de CPU no modo quota (padrão: sem limite)")
+    parser.add_argument("--backend", choices=["auto", "cgroup", "rlimit", "polling"], default=ENFORCEMENT_BACKEND,
+                        help="backend de aplicação de limites")
+    parser.add_argument("--cpu-accounting", choices=["reaped", "live"], default=CPU_ACCOUNTING,
+                        help="sem cgroup, inclui (reaped) ou não (live) a CPU dos filhos já encerrados")
+    parser.add_argument("--pricing", choices=sorted(PRICING_MODELS), default=PRICING_MODEL,
+                        help="modelo de preço da memória nos modos pré e pós-pago")
+    parser.add_argument("--progress-fps", type=float, default=PROGRESS_FPS,
+                        help="quadros por segundo da linha de progresso (0 desliga)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve as métricas internas em http://127.0.0.1:<porta>/metrics")
+    parser.add_argument("--metrics-json", help="grava as métricas internas em JSON ao terminar")
+    parser.add_argument("--pool", action="store_true",
+                        help="executa `run` nos workers compartilhados (usado sempre pelo `batch`)")
+    parser.add_argument("--no-profiles", action="store_true",
+                        help="não usa o cache de perfis (fms_profiles.json) nem recusa jobs pelo histórico")
+    parser.add_argument("--no-series", action="store_true", help="não exporta a série temporal das execuções")
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser("run", help="executa um binário")
+    run_parser.add_argument("binary")
+    run_parser.add_argument("--cpu-quota", type=float, required=True, help="quota de CPU (segundos)")
+    run_parser.add_argument("--memory-limit", type=float, default=0, help="limite de memória (MB, 0 = sem limite)")
+    run_parser.add_argument("--timeout", type=float, default=0, help="timeout (segundos, 0 = sem timeout)")
+    run_parser.add_argument("--output", help="grava o registro do resultado (JSON Lines ou CSV)")
+    batch_parser = subparsers.add_parser("batch", help="executa os jobs de um manifesto JSON Lines ou CSV")
+    batch_parser.add_argument("manifest")
+    batch_parser.add_argument("--output", default="-", help="arquivo de resultados (.jsonl ou .csv; padrão: stdout)")
+    batch_parser.add_argument("--parallel", type=int, default=DEFAULT_MAX_WORKERS, help="jobs simultâneos")
+    batch_parser.add_argument("--cpu-quota", type=float, default=60.0, help="quota de CPU padrão dos jobs")
+    batch_parser.add_argument("--memory-limit", type=float, default=0, help="limite de memória padrão (MB)")
+    batch_parser.add_argument("--timeout", type=float, default=0, help="timeout padrão (segundos)")
+    batch_parser.add_argument("-q", "--quiet", action="store_true", help="não mostra os relatórios de cada job")
+    daemon_parser = subparsers.add_parser("daemon", help="atende vários usuários por um socket local")
+    client_parser = subparsers.add_parser("client", help="cliente do daemon (sem comando: menu interativo)")
+    for address_parser in (daemon_parser, client_parser):
+        address_parser.add_argument("--socket", help=f"socket Unix do daemon (padrão: {DAEMON_SOCKET})")
+        address_parser.add_argument("--port", type=int, help="usa TCP em 127.0.0.1 nesta porta em vez do socket Unix")
+    daemon_parser.add_argument("--trust-tcp", action="store_true",
+                               help="aceita TCP: sem identificação do cliente, todos agem como o --user do daemon")
+    daemon_parser.add_argument("--parallel", type=int, default=DEFAULT_MAX_WORKERS,
+                               help="jobs simultâneos, somando todos os usuários")
+    client_commands = client_parser.add_subparsers(dest="client_command")
+    for name, help_text in (("run", "executa um binário e acompanha o progresso"), ("submit", "agenda um binário")):
+        job_parser = client_commands.add_parser(name, help=help_text)
+        job_parser.add_argument("binary")
+        job_parser.add_argument("--cpu-quota", type=float, required=True, help="quota de CPU (segundos)")
+        job_parser.add_argument("--memory-limit", type=float, default=0, help="limite de memória (MB, 0 = sem limite)")
+        job_parser.add_argument("--timeout", type=float, default=0, help="timeout (segundos, 0 = sem timeout)")
+    for name, help_text in (("status", "estado de um job (sem número: todos os jobs do usuário)"),
+                            ("samples", "transmite as amostras de um job em JSON Lines até ele terminar"),
+                            ("cancel", "cancela um job")):
+        client_commands.add_parser(name, help=help_text).add_argument("job", type=int, nargs="?" if name == "status" else None)
+    client_commands.add_parser("balance", help="quota ou créditos do usuário")
+    usage_parser = client_commands.add_parser("usage", help="relatório de uso agregado")
+    usage_parser.add_argument("--start", help="AAAA-MM-DD ou \"AAAA-MM-DD HH\"")
+    usage_parser.add_argument("--end", help="AAAA-MM-DD ou \"AAAA-MM-DD HH\"")
+    client_commands.add_parser("credits", help="adiciona créditos (modo pré-pago)").add_argument("amount", type=float)
+    return parser
+def run_command(args):
+    if args.command is None:
+        fms = FMS()
+        fms.main_loop()  # modo interativo original
+        return 0
+    if args.command == "daemon":
+        return run_daemon(args)
+    if args.command == "client":
+        return run_client(args)
+    fms = configure_fms(args)
+    if args.command == "run":
+        record = {'id': 0, 'binary': args.binary}
+        record['result'] = fms.run_binary(args.binary, args.cpu_quota, args.memory_limit, args.timeout or None, record)
+        fms.shutdown()
+        if args.output:
+            writer = ResultWriter(args.output)
+            writer.write(record)
+            writer.close()
+        return 0 if record['result'] == "SUCCESS" else 1
+    fms.max_workers = args.parallel
+    return run_batch(fms, args)
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.metrics_port is None and not args.metrics_json:
+        return run_command(args)
+    registry = enable_metrics()
+    if args.metrics_port is not None:
+        port = registry.serve(args.metrics_port)
+        print(f"Métricas em http://127.0.0.1:{port}/metrics", file=sys.stderr)
+    try:
+        return run_command(args)
+    finally:
+        if args.metrics_json:
+            registry.dump_json(args.metrics_json)
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
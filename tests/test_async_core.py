@@ -0,0 +1,58 @@
+# testes do núcleo asyncio (run_binary_async): término, timeout, falha do monitor e jobs simultâneos
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+def write_binary(directory, name, code):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(f"#!{sys.executable}\nimport time\n{code}")
+    os.chmod(path, 0o755)
+    return path
+class AsyncCoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fms = fms.FMS()
+        self.fms.remaining_cpu_quota = float("inf")
+        self.fms.enforcement_backend = "polling"
+        self.fms.record_series = False
+        self.fms.use_profiles = False
+        self.take_sample = fms.ProcessMonitor.take_sample
+        self.sleeper = write_binary(self.directory.name, "sleeper", "time.sleep(30)\n")
+        self.quick = write_binary(self.directory.name, "quick", "time.sleep(0.2)\n")
+    def tearDown(self):
+        fms.ProcessMonitor.take_sample = self.take_sample
+        self.directory.cleanup()
+    def run_binary(self, path, cpu_quota, timeout=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.fms.run_binary(path, cpu_quota, 0, timeout)
+    def test_normal_exit_and_timeout(self):
+        self.assertEqual(self.run_binary(self.quick, 10), "SUCCESS")
+        started = time.time()
+        self.assertEqual(self.run_binary(self.sleeper, 10, 0.3), "TIMEOUT")
+        self.assertLess(time.time() - started, 10)
+    def test_monitor_failure_kills_the_job_with_error(self):
+        def failing_take_sample(monitor):
+            raise OSError("leitura do /proc falhou")
+        fms.ProcessMonitor.take_sample = failing_take_sample
+        started = time.time()
+        self.assertEqual(self.run_binary(self.sleeper, 10), "ERROR")
+        self.assertLess(time.time() - started, 10)  # não esperou o fim natural do processo
+        fms.ProcessMonitor.take_sample = self.take_sample
+        self.assertEqual(self.run_binary(self.quick, 10), "SUCCESS")
+    def test_gather_of_several_jobs(self):
+        async def run_all():
+            return await asyncio.gather(*[self.fms.run_binary_async(self.quick, 10, 0, None) for _ in range(3)])
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(asyncio.run(run_all()), ["SUCCESS"] * 3)
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# testes dos backends de limites: arquivos do cgroup (em um diretório comum, sem root) e a amostra
+# montada a partir dos contadores do kernel
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class FakeCgroupTest(unittest.TestCase):
+    # o CgroupBackend só lê e escreve arquivos: um diretório temporário faz as vezes do cgroup
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cgroup_root = fms.CGROUP_ROOT
+        fms.CGROUP_ROOT = self.directory.name
+    def tearDown(self):
+        fms.CGROUP_ROOT = self.cgroup_root
+        self.directory.cleanup()
+    def write(self, backend, name, value):
+        with open(backend.path(name), 'w') as f:
+            f.write(value)
+    def read(self, backend, name):
+        with open(backend.path(name), 'r') as f:
+            return f.read()
+    def test_memory_limit_kills_the_whole_job_on_oom(self):
+        backend = fms.CgroupBackend(10, 64)
+        self.assertEqual(self.read(backend, "memory.max"), str(64 * 1024 * 1024))
+        self.assertEqual(self.read(backend, "memory.oom.group"), "1")
+    def test_cpu_comes_from_cpu_stat_without_the_memory_controller(self):
+        backend = fms.CgroupBackend(10, 0)
+        self.write(backend, "cpu.stat", "usage_usec 2500000\nuser_usec 2000000\nsystem_usec 500000\n")
+        self.write(backend, "cgroup.procs", "101\n102\n")
+        self.assertEqual(backend.read_usage(), (2.5, None, 2))
+        self.write(backend, "memory.current", str(8 * 1024 * 1024))
+        self.assertEqual(backend.read_usage(), (2.5, 8.0, 2))
+    def test_oom_kill_is_reported_while_running(self):
+        backend = fms.CgroupBackend(10, 64)
+        self.write(backend, "memory.events", "low 0\nhigh 0\nmax 3\noom 1\noom_kill 0\n")
+        self.assertIsNone(backend.kernel_limit())
+        self.write(backend, "memory.events", "low 0\nhigh 0\nmax 3\noom 1\noom_kill 1\n")
+        self.assertEqual(backend.kernel_limit(), "MEMORY_EXCEEDED")
+        self.assertEqual(backend.classify_exit(-9), "MEMORY_EXCEEDED")
+class KernelCpuBackend(fms.PollingBackend):
+    # CPU do kernel (como o cpu.stat) sem memória, e um OOM que pode ser disparado pelo teste
+    def __init__(self, cpu_time):
+        super().__init__(100, 0)
+        self.cpu_time = cpu_time
+        self.oom = None
+    def read_usage(self):
+        return self.cpu_time, None, 1
+    def kernel_limit(self):
+        return self.oom
+class SampleFromKernelCountersTest(unittest.TestCase):
+    def setUp(self):
+        self.process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"],
+                                        start_new_session=True)
+    def tearDown(self):
+        self.process.kill()
+        self.process.wait()
+    def test_kernel_cpu_with_per_process_memory(self):
+        backend = KernelCpuBackend(7.5)
+        monitor = fms.ProcessMonitor(self.process.pid, 100, 0, None, backend=backend)
+        sample = monitor.take_sample()
+        self.assertEqual(sample.cpu_time, 7.5)
+        self.assertGreater(sample.memory, 0)  # RSS do processo vivo
+    def test_kernel_limit_stops_the_job_at_the_next_sample(self):
+        backend = KernelCpuBackend(0.1)
+        monitor = fms.ProcessMonitor(self.process.pid, 100, 1024, None, backend=backend)
+        self.assertIsNotNone(monitor.monitor_step())
+        backend.oom = "MEMORY_EXCEEDED"
+        self.assertIsNone(monitor.monitor_step())
+        self.assertEqual(monitor.result, "MEMORY_EXCEEDED")
+        self.assertTrue(monitor.killed)
+        self.assertEqual(self.process.wait(timeout=5), -9)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            monitor.flush_messages()
+        self.assertIn("MEMORY_EXCEEDED", output.getvalue())
+if __name__ == "__main__":
+    unittest.main()
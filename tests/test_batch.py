@@ -0,0 +1,49 @@
+# testes do modo sem terminal: normalização das linhas do manifesto e um lote completo com uma
+# linha inválida, que vira ERROR sem parar os demais jobs
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class ParseJobTest(unittest.TestCase):
+    def setUp(self):
+        self.defaults = fms.build_arg_parser().parse_args(["batch", "jobs.jsonl", "--cpu-quota", "5", "--timeout", "30"])
+    def test_defaults_fill_missing_fields(self):
+        self.assertEqual(fms.parse_job('{"id": "a", "binary": "/bin/true"}', self.defaults),
+                         ("a", "/bin/true", 5.0, 0.0, 30.0))
+        self.assertEqual(fms.parse_job({'binary_path': "/bin/true", 'cpu_quota': "2", 'memory_limit': "64",
+                                        'timeout': ""}, self.defaults),
+                         (None, "/bin/true", 2.0, 64.0, 30.0))  # linha de CSV: tudo texto
+    def test_invalid_lines(self):
+        for line in ('[]', '{"cpu_quota": 1}', '{"binary": "/bin/true", "cpu_quota": 0}',
+                     '{"binary": "/bin/true", "cpu_quota": "x"}', '{"binary": '):
+            with self.assertRaises(ValueError):
+                fms.parse_job(line, self.defaults)
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+    def tearDown(self):
+        self.directory.cleanup()
+    def test_batch_writes_one_record_per_job(self):
+        manifest = os.path.join(self.directory.name, "jobs.jsonl")
+        output = os.path.join(self.directory.name, "results.jsonl")
+        with open(manifest, 'w') as f:
+            f.write('{"id": "ok", "binary": "/bin/true"}\n{"binary": \n\n{"id": "exit1", "binary": "/bin/false"}\n')
+        with contextlib.redirect_stderr(io.StringIO()) as errors:
+            code = fms.main(["--no-series", "--no-profiles", "--progress-fps", "0",
+                             "batch", manifest, "--output", output, "--cpu-quota", "5", "-q"])
+        self.assertEqual(code, 1)
+        with open(output, 'r') as f:
+            results = {record['id']: record['result'] for record in map(json.loads, f)}
+        # o código de saída do binário não é um limite: só a linha malformada vira ERROR
+        self.assertEqual(results, {"ok": "SUCCESS", 1: "ERROR", "exit1": "SUCCESS"})
+        self.assertIn("3 jobs concluídos", errors.getvalue())
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+# testes do custo por execução: integral da memória, pico e faixas, acumulados amostra a amostra
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class CostAccumulatorTest(unittest.TestCase):
+    def samples(self, accumulator):
+        # 10 MB do primeiro ao segundo segundo; o processo começa sem memória residente
+        for elapsed, cpu_time in [(1.0, 0.5), (2.0, 1.0)]:
+            accumulator.add(fms.ResourceSample(0, elapsed, cpu_time, 10.0, 1))
+        accumulator.finish(2.0, 10.0, 3.0)
+    def test_integral_pricing(self):
+        accumulator = fms.CostAccumulator(fms.IntegralPricing(1.0, 6.0))  # 0.1 crédito por MB·s
+        self.samples(accumulator)
+        self.assertAlmostEqual(accumulator.memory_mb_seconds, 25.0)  # 5 + 10 + 10
+        self.assertAlmostEqual(accumulator.total(), 2.0 + 2.5)
+    def test_peak_pricing(self):
+        accumulator = fms.CostAccumulator(fms.PeakPricing(1.0, 6.0))
+        self.samples(accumulator)
+        self.assertAlmostEqual(accumulator.total(), 2.0 + 10.0 * 0.1 * 3.0)
+    def test_tiered_pricing(self):
+        pricing = fms.TieredPricing(1.0, 60.0, [(10, 1.0), (20, 2.0), (float("inf"), 4.0)])
+        self.assertAlmostEqual(pricing.memory_rate(5), 5.0)
+        self.assertAlmostEqual(pricing.memory_rate(25), 10 + 20 + 20)
+        accumulator = fms.CostAccumulator(pricing)
+        accumulator.add(fms.ResourceSample(0, 2.0, 0.0, 15.0, 1))
+        accumulator.finish(0.0, 15.0, 2.0)
+        self.assertAlmostEqual(accumulator.total(), (0 + 20.0) / 2 * 2.0)
+        self.assertEqual(accumulator.peak_memory, 15.0)
+    def test_finish_never_lowers_totals(self):
+        accumulator = fms.CostAccumulator(fms.IntegralPricing(1.0, 6.0))
+        self.samples(accumulator)
+        accumulator.finish(0.5, 1.0, 1.0)
+        self.assertEqual(accumulator.cpu_time, 2.0)
+        self.assertEqual(accumulator.peak_memory, 10.0)
+        self.assertEqual(accumulator.elapsed, 3.0)
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# testes da contabilidade de CPU: filhos de vida curta, já coletados pelo job, entram no total no
+# modo "reaped" (padrão) nos dois núcleos, e contam para a quota enquanto o job roda
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+BURST = "import time\nend = time.process_time() + 0.2\nwhile time.process_time() < end:\n    pass\n"
+# o job só espera: toda a CPU é gasta por filhos que saem (e são coletados) entre duas amostras
+def spawner(count):
+    loop = f"for _ in range({count}):" if count else "while True:"
+    return (f"import subprocess, sys, time\n{loop}\n"
+            f"    subprocess.run([sys.executable, '-c', {BURST!r}])\ntime.sleep(0.3)\n")
+class CpuAccountingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fms = fms.FMS()
+        self.fms.remaining_cpu_quota = float("inf")
+        self.fms.enforcement_backend = "polling"  # sem cpu.stat: a CPU vem do /proc e do wait
+        self.fms.record_series = False
+        self.fms.use_profiles = False
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.fms.shutdown()
+        self.directory.cleanup()
+    def binary(self, count):
+        path = os.path.join(self.directory.name, f"spawner{count}")
+        with open(path, 'w') as f:
+            f.write(f"#!{sys.executable}\n{spawner(count)}")
+        os.chmod(path, 0o755)
+        return path
+    def run_async(self, path, cpu_quota):
+        record = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = self.fms.run_binary(path, cpu_quota, 0, 30, record)
+        return result, record['cpu_time']
+    def run_pooled(self, path, cpu_quota):
+        record = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = self.fms.submit(path, cpu_quota, 0, 30, record).result(timeout=60)
+        return result, record['cpu_time']
+    def test_reaped_children_count_in_both_cores(self):
+        path = self.binary(3)
+        for run in (self.run_async, self.run_pooled):  # o async antes: sem executor o RUSAGE_CHILDREN é exato
+            result, cpu_time = run(path, 10)
+            self.assertEqual(result, "SUCCESS")
+            self.assertGreaterEqual(cpu_time, 0.55, run.__name__)
+    def test_live_accounting_leaves_them_out(self):
+        self.fms.cpu_accounting = "live"
+        result, cpu_time = self.run_pooled(self.binary(3), 10)
+        self.assertEqual(result, "SUCCESS")
+        self.assertLess(cpu_time, 0.4)
+    def test_reaped_children_count_for_the_quota(self):
+        result, cpu_time = self.run_pooled(self.binary(0), 0.5)
+        self.assertEqual(result, "LIMIT_EXCEEDED")
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+# testes da reserva pré-paga: débito em blocos e ampliação com o saldo livre que houver, com o job
+# encerrado só quando o saldo livre acaba
+
+import os
+import sys
+import tempfile
+import types
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class CreditReservationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = fms.CreditStore(os.path.join(self.directory.name, "fms_credits.db"))
+        self.store.add("user", 2.5)
+    def tearDown(self):
+        self.directory.cleanup()
+    def open(self, amount):
+        reservation_id = self.store.reserve("user", amount)
+        return fms.CreditReservation(types.SimpleNamespace(credit_store=self.store), reservation_id, amount, chunk=1.0)
+    def test_extend_takes_what_is_free(self):
+        reservation_id = self.store.reserve("user", 1.0)
+        self.assertEqual(self.store.extend(reservation_id, 1.0), 1.0)
+        self.assertEqual(self.store.extend(reservation_id, 1.0), 0.5)
+        self.assertEqual(self.store.extend(reservation_id, 1.0), 0.0)
+        self.assertEqual(self.store.balance("user"), (2.5, 2.5))
+        self.assertEqual(self.store.extend(reservation_id + 1, 1.0), 0.0)  # reserva inexistente
+    def test_job_runs_until_the_free_balance_is_gone(self):
+        reservation = self.open(1.0)
+        self.assertTrue(reservation.charge(0.5))
+        self.assertTrue(reservation.charge(1.2))
+        self.assertEqual(reservation.kill_threshold, 2.0)
+        self.assertTrue(reservation.charge(2.2))  # meio bloco livre ainda estende a reserva
+        self.assertEqual(reservation.kill_threshold, 2.5)
+        self.assertFalse(reservation.charge(2.6))  # sem saldo livre: encerra
+        self.assertFalse(reservation.settle(2.6))
+        self.assertAlmostEqual(reservation.debited, 2.5)
+        self.assertEqual(self.store.balance("user"), (0.0, 0.0))
+    def test_settle_returns_the_unused_reservation(self):
+        reservation = self.open(2.0)
+        self.assertTrue(reservation.charge(0.7))
+        self.assertTrue(reservation.settle(0.7))
+        balance, reserved = self.store.balance("user")
+        self.assertAlmostEqual(balance, 1.8)
+        self.assertEqual(reserved, 0.0)
+if __name__ == "__main__":
+    unittest.main()
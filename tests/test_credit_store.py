@@ -0,0 +1,56 @@
+# testes do banco de créditos: reservas, débitos limitados à reserva, liquidação e liberação das
+# reservas de processos mortos
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class CreditStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = fms.CreditStore(os.path.join(self.directory.name, "credits.db"))
+        self.store.add("ana", 10.0)
+    def tearDown(self):
+        self.directory.cleanup()
+    def test_reserve_holds_credits(self):
+        reservation = self.store.reserve("ana", 4.0)
+        self.assertIsNotNone(reservation)
+        self.assertEqual(self.store.balance("ana"), (10.0, 4.0))
+        self.assertIsNone(self.store.reserve("ana", 7.0))  # só restam 6 livres
+        self.assertFalse(self.store.deduct("ana", 7.0))
+    def test_debit_is_capped_by_the_reservation(self):
+        reservation = self.store.reserve("ana", 4.0)
+        self.assertEqual(self.store.debit(reservation, 1.5), 1.5)
+        self.assertEqual(self.store.balance("ana"), (8.5, 2.5))
+        self.assertEqual(self.store.debit(reservation, 5.0), 2.5)
+        self.assertEqual(self.store.balance("ana"), (6.0, 0.0))
+    def test_settle_releases_the_rest(self):
+        reservation = self.store.reserve("ana", 4.0)
+        self.store.debit(reservation, 1.0)
+        self.assertEqual(self.store.settle(reservation, 2.0), 2.0)  # custo restante, além do já debitado
+        self.assertEqual(self.store.balance("ana"), (7.0, 0.0))
+        with self.assertRaises(KeyError):
+            self.store.settle(reservation, 1.0)
+    def test_settle_takes_the_excess_from_free_balance(self):
+        reservation = self.store.reserve("ana", 2.0)
+        self.assertEqual(self.store.settle(reservation, 5.0), 5.0)
+        self.assertEqual(self.store.balance("ana"), (5.0, 0.0))
+    def test_settle_without_enough_balance_debits_only_the_reservation(self):
+        reservation = self.store.reserve("ana", 2.0)
+        self.assertEqual(self.store.settle(reservation, 50.0), 2.0)
+        self.assertEqual(self.store.balance("ana"), (8.0, 0.0))
+    def test_release_stale_frees_reservations_of_dead_processes(self):
+        live = self.store.reserve("ana", 3.0)
+        stale = self.store.reserve("ana", 2.0)
+        conn = self.store.connect()
+        conn.execute("UPDATE reservations SET owner_pid = NULL WHERE id = ?", (stale,))
+        self.assertEqual(self.store.release_stale(), 1)
+        self.assertEqual(self.store.balance("ana"), (10.0, 3.0))
+        self.assertEqual(self.store.settle(live, 3.0), 3.0)
+        self.assertEqual(self.store.balance("ana"), (7.0, 0.0))
+if __name__ == "__main__":
+    unittest.main()
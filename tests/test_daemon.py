@@ -0,0 +1,95 @@
+# testes do daemon: identificação do cliente, operações restritas e respostas em JSON estrito,
+# com um daemon real em um socket Unix temporário
+
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+def strict_json(line):
+    # como um cliente estrito: Infinity e NaN não são JSON
+    def reject(constant):
+        raise ValueError(f"constante não permitida em JSON: {constant}")
+    return json.loads(line, parse_constant=reject)
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "requer socket Unix")
+class DaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.directory.name, "fms.sock")
+        args = fms.build_arg_parser().parse_args(
+            ["--no-series", "--no-profiles", "--progress-fps", "0", "daemon", "--socket", self.address])
+        self.daemon = fms.FMSDaemon(args, 2)
+        self.server = self.daemon.serve(self.address)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+    def tearDown(self):
+        self.server.shutdown()
+        self.daemon.shutdown()
+        self.directory.cleanup()
+    def exchange(self, *requests):
+        # envia linhas cruas na mesma conexão e devolve a resposta final de cada uma
+        responses = []
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.address)
+            with sock.makefile('rwb') as stream:
+                for request in requests:
+                    stream.write(request.encode('utf-8') + b"\n")
+                    stream.flush()
+                    while True:
+                        message = strict_json(stream.readline())
+                        if 'ok' in message:
+                            responses.append(message)
+                            break
+        return responses
+    def collect(self, request, peer_uid):
+        messages = []
+        self.daemon.handle(request, messages.append, peer_uid)
+        return messages[-1]
+    def test_unlimited_quota_is_sent_as_null(self):
+        balance, = self.exchange('{"op": "balance"}')
+        self.assertTrue(balance['ok'])
+        self.assertEqual(balance['mode'], "quota")
+        self.assertIsNone(balance['total'])
+        self.assertIsNone(balance['available'])
+    def test_non_object_requests_are_rejected_and_the_connection_survives(self):
+        responses = self.exchange('[]', '1', '"balance"', '{"op": "balance"}')
+        self.assertEqual([response['ok'] for response in responses], [False, False, False, True])
+    def test_job_status_is_strict_json(self):
+        submitted, = self.exchange(json.dumps({'op': "submit", 'binary': "/bin/true", 'cpu_quota': 5}))
+        job_id = submitted['job']
+        for _ in range(100):
+            status, = self.exchange(json.dumps({'op': "status", 'job': job_id}))
+            if status['job']['state'] == "done":
+                break
+            time.sleep(0.05)
+        self.assertEqual(status['job']['result'], "SUCCESS")
+    def test_infinite_limits_are_rejected(self):
+        for fields in ({'cpu_quota': "inf"}, {'cpu_quota': 1, 'timeout': "inf"}, {'cpu_quota': 0}):
+            response, = self.exchange(json.dumps({'op': "submit", 'binary': "/bin/true", **fields}))
+            self.assertFalse(response['ok'])
+    def test_peer_identity(self):
+        owner = os.geteuid()
+        request = {'op': "balance", 'user': "outro"}
+        self.assertTrue(self.daemon.authorize(request, owner))
+        self.assertEqual(request['user'], "outro")  # o dono pode agir por outro usuário
+        other = owner + 12345
+        request = {'op': "balance", 'user': "outro"}
+        self.assertFalse(self.daemon.authorize(request, other))
+        self.assertNotEqual(request['user'], "outro")  # os demais agem sempre como eles mesmos
+        request = {'op': "balance", 'user': "outro"}
+        self.assertTrue(self.daemon.authorize(request, None))  # TCP confiável: usuário do daemon
+        self.assertEqual(request['user'], "default_user")
+    def test_credits_are_restricted_to_the_owner(self):
+        response = self.collect({'op': "credits", 'amount': 5}, os.geteuid() + 12345)
+        self.assertFalse(response['ok'])
+        self.assertIn("dono", response['error'])
+if __name__ == "__main__":
+    unittest.main()
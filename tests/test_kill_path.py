@@ -0,0 +1,56 @@
+# testes do kill do job: o grupo inteiro cai com um único sinal, e nada é enviado depois que o
+# processo principal foi coletado (o pid e o grupo podem já pertencer a outro processo)
+
+import os
+import subprocess
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+GROUP = ("import subprocess, sys, time\n"
+         "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+         "time.sleep(30)\n")
+def launch(code):
+    process = subprocess.Popen([sys.executable, "-c", code], start_new_session=True)
+    monitor = fms.ProcessMonitor(process.pid, 100, 0, None)
+    monitor.child = process
+    return process, monitor
+@unittest.skipUnless(hasattr(os, "killpg"), "requer grupos de processos")
+class KillPathTest(unittest.TestCase):
+    def test_kill_reaches_the_whole_group(self):
+        process, monitor = launch(GROUP)
+        for _ in range(50):  # espera o neto aparecer na árvore
+            monitor.update_process_tree()
+            if len(monitor.process_tree) > 1:
+                break
+            time.sleep(0.05)
+        grandchild = monitor.process_tree[-1]
+        monitor.kill_process_tree()
+        self.assertTrue(monitor.killed)
+        self.assertEqual(monitor.wait_child(), -9)
+        grandchild.wait(timeout=5)
+        self.assertFalse(grandchild.is_running())
+    def test_no_signal_after_the_leader_is_reaped(self):
+        process, monitor = launch("pass")
+        self.assertEqual(monitor.wait_child(), 0)
+        with mock.patch.object(os, "killpg") as killpg, mock.patch.object(os, "kill") as kill:
+            monitor.kill_process_tree()
+        killpg.assert_not_called()
+        kill.assert_not_called()
+        self.assertFalse(monitor.killed)
+    def test_cancel_after_the_job_ends_is_harmless(self):
+        job = fms.DaemonJob(1, "user", "/bin/true", 5, 0, None)
+        process, monitor = launch("pass")
+        job.attach(monitor)
+        monitor.wait_child()
+        with mock.patch.object(os, "killpg") as killpg:
+            self.assertTrue(job.cancel())  # ainda não finalizado: só marca o cancelamento
+        killpg.assert_not_called()
+        job.finish("SUCCESS")
+        self.assertFalse(job.cancel())
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# testes das métricas internas: contadores e histogramas no formato do Prometheus, o servidor HTTP
+# local e a instrumentação do monitor, ligada só depois de enable_metrics
+
+import json
+import os
+import sys
+import unittest
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class MetricTypesTest(unittest.TestCase):
+    def test_counter(self):
+        counter = fms.Counter("fms_jobs_total", "Jobs.", "result")
+        counter.inc("SUCCESS")
+        counter.inc("TIMEOUT", 2)
+        counter.inc("SUCCESS")
+        self.assertEqual(list(counter.prometheus_lines())[2:],
+                         ['fms_jobs_total{result="SUCCESS"} 2', 'fms_jobs_total{result="TIMEOUT"} 2'])
+        self.assertEqual(counter.to_dict(), {"SUCCESS": 2, "TIMEOUT": 2})
+        unlabeled = fms.Counter("fms_total", "Total.")
+        unlabeled.inc()
+        self.assertEqual(unlabeled.to_dict(), 1)
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = fms.Histogram("fms_lag_seconds", "Lag.", [0.1, 1.0])
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.prometheus_lines())[2:],
+                         ['fms_lag_seconds_bucket{le="0.1"} 2', 'fms_lag_seconds_bucket{le="1.0"} 3',
+                          'fms_lag_seconds_bucket{le="+Inf"} 4', 'fms_lag_seconds_sum 3.65',
+                          'fms_lag_seconds_count 4'])
+        self.assertEqual(histogram.to_dict()['buckets'], {"0.1": 2, "1.0": 3, "+Inf": 4})
+class RegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.assertIsNone(fms.metrics)  # desligadas por padrão
+        self.registry = fms.enable_metrics()
+    def tearDown(self):
+        if self.registry.server is not None:
+            self.registry.server.shutdown()
+            self.registry.server.server_close()
+        fms.metrics = None
+    def test_enable_is_idempotent(self):
+        self.assertIs(fms.enable_metrics(), self.registry)
+    def test_monitor_steps_are_instrumented(self):
+        monitor = fms.ProcessMonitor(os.getpid(), 3600, 0, None)  # o próprio teste, bem abaixo da quota
+        monitor.monitor_step()
+        self.assertEqual(self.registry.tick_seconds.count, 1)
+        self.assertEqual(self.registry.sample_seconds.count, 1)
+        self.registry.record_kill("TIMEOUT", lag=-0.5)
+        self.assertEqual(self.registry.to_dict()['fms_kills_total'], {"TIMEOUT": 1})
+        self.assertEqual(self.registry.enforcement_lag_seconds.sum, 0)  # atraso negativo vira zero
+    def test_http_endpoints(self):
+        port = self.registry.serve(0)
+        self.registry.jobs.inc("SUCCESS")
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            text = response.read().decode('utf-8')
+        self.assertIn('fms_jobs_total{result="SUCCESS"} 1', text)
+        self.assertIn("# TYPE fms_monitor_tick_seconds histogram", text)
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics.json", timeout=5) as response:
+            self.assertEqual(json.load(response)['fms_jobs_total'], {"SUCCESS": 1})
+if __name__ == "__main__":
+    unittest.main()
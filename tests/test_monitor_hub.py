@@ -0,0 +1,66 @@
+# testes do MonitorHub: um monitor com erro não pode deixar os demais jobs sem limites
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+BURN = "end = time.process_time() + 5\nwhile time.process_time() < end:\n    pass\n"
+def write_binary(directory, name, code):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(f"#!{sys.executable}\nimport time\n{code}")
+    os.chmod(path, 0o755)
+    return path
+class MonitorHubTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fms = fms.FMS()
+        self.fms.remaining_cpu_quota = float("inf")
+        self.fms.enforcement_backend = "polling"  # só o monitor aplica os limites
+        self.fms.record_series = False
+        self.fms.use_profiles = False
+        self.take_sample = fms.ProcessMonitor.take_sample
+    def tearDown(self):
+        fms.ProcessMonitor.take_sample = self.take_sample
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.fms.shutdown()
+        self.directory.cleanup()
+    def run_job(self, path, cpu_quota, timeout=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.fms.submit(path, cpu_quota, 0, timeout).result(timeout=30)
+    def test_failed_monitor_kills_its_job_and_the_next_job_is_enforced(self):
+        take_sample = self.take_sample
+        failures = []
+        def failing_take_sample(monitor):
+            if not failures:
+                failures.append(monitor)
+                raise OSError("leitura do /proc falhou")
+            return take_sample(monitor)
+        fms.ProcessMonitor.take_sample = failing_take_sample
+        sleeper = write_binary(self.directory.name, "sleeper", "time.sleep(30)\n")
+        started = time.time()
+        self.assertEqual(self.run_job(sleeper, 10), "ERROR")
+        self.assertLess(time.time() - started, 10)  # encerrado pelo hub, não pelo fim natural
+        burner = write_binary(self.directory.name, "burner", BURN)
+        self.assertEqual(self.run_job(burner, 0.2), "LIMIT_EXCEEDED")
+        self.assertTrue(self.fms.monitor_hub.thread.is_alive())
+    def test_add_restarts_a_dead_thread(self):
+        burner = write_binary(self.directory.name, "burner", BURN)
+        self.assertEqual(self.run_job(burner, 10, 0.1), "TIMEOUT")  # cria o hub do FMS
+        hub = self.fms.monitor_hub
+        dead = threading.Thread(target=lambda: None)
+        dead.start()
+        dead.join()
+        hub.thread = dead  # como uma thread encerrada por uma exceção
+        self.assertEqual(self.run_job(burner, 0.2), "LIMIT_EXCEEDED")
+        self.assertTrue(hub.thread.is_alive())
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# testes da camada de plataforma: backend escolhido pelo SO, métricas lidas do /proc iguais às do
+# psutil e nenhum módulo exclusivo do Windows carregado na importação
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class PlatformTest(unittest.TestCase):
+    def test_import_needs_no_windows_modules(self):
+        for module in ("msvcrt", "win32com", "win32com.client"):
+            self.assertNotIn(module, sys.modules)
+    def test_backend_for_this_system(self):
+        platform = fms.get_platform()
+        self.assertIs(fms.get_platform(), platform)
+        if sys.platform.startswith("linux"):
+            self.assertIsInstance(platform, fms.LinuxPlatform)
+        with self.assertRaises(OSError):
+            platform.resolve_shortcut("job.lnk")
+    def test_enter_is_ignored_without_a_terminal(self):
+        with mock.patch.object(sys, "stdin", io.StringIO("\n")):
+            self.assertFalse(fms.get_platform().enter_pressed())
+@unittest.skipUnless(sys.platform.startswith("linux"), "requer /proc")
+class LinuxMetricsTest(unittest.TestCase):
+    def setUp(self):
+        # o nome do processo tem espaço e parêntese, como um binário qualquer pode ter
+        self.directory = tempfile.TemporaryDirectory()
+        executable = os.path.join(self.directory.name, "job (1) x")
+        shutil.copy(sys.executable, executable)
+        code = "import time\nend = time.process_time() + 0.3\nwhile time.process_time() < end:\n    pass\ntime.sleep(30)\n"
+        self.process = subprocess.Popen([executable, "-c", code])
+        self.proc = psutil.Process(self.process.pid)
+    def tearDown(self):
+        self.process.kill()
+        self.process.wait()
+        self.directory.cleanup()
+    def test_proc_metrics_match_psutil(self):
+        for _ in range(100):  # espera o fim da rajada de CPU
+            if self.proc.cpu_times().user + self.proc.cpu_times().system >= 0.3:
+                break
+            time.sleep(0.05)
+        time.sleep(0.1)
+        rss, cpu_time = fms.LinuxPlatform().process_metrics(self.proc)
+        expected_rss, expected_cpu = fms.PlatformBackend().process_metrics(self.proc)
+        self.assertEqual(rss, expected_rss)
+        self.assertAlmostEqual(cpu_time, expected_cpu, delta=0.02)
+    def test_exited_process_raises_no_such_process(self):
+        self.process.kill()
+        self.process.wait()
+        with self.assertRaises(psutil.NoSuchProcess):
+            fms.LinuxPlatform().process_metrics(self.proc)
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# testes do modo com pool: monitores reaproveitados entre jobs e o fim de um job (cobrança e log de
+# uso) fora do lock do FMS
+
+import contextlib
+import io
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class SlowLedgerCredits:
+    # gerenciador pós-pago cujo log de uso só termina quando o teste libera (como um fsync lento)
+    def __init__(self):
+        self.pricing = fms.IntegralPricing(1.0, 0.1)
+        self.logging = threading.Event()
+        self.release = threading.Event()
+    def log_usage(self, *usage):
+        self.logging.set()
+        self.release.wait(10)
+    def close(self):
+        pass
+class PoolTest(unittest.TestCase):
+    def setUp(self):
+        self.fms = fms.FMS()
+        self.fms.remaining_cpu_quota = float("inf")
+        self.fms.enforcement_backend = "polling"
+        self.fms.record_series = False
+        self.fms.use_profiles = False
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.fms.shutdown()
+    def test_monitors_are_reused_between_jobs(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(self.fms.submit("/bin/true", 5).result(timeout=30), "SUCCESS")
+            monitor, = self.fms.idle_monitors
+            self.assertEqual(self.fms.submit("/bin/true", 5).result(timeout=30), "SUCCESS")
+        self.assertEqual(self.fms.idle_monitors, [monitor])
+        self.assertEqual(self.fms.reserved_cpu_quota, 0)  # a reserva de cada job foi devolvida
+    def test_billing_does_not_hold_the_fms_lock(self):
+        credits = SlowLedgerCredits()
+        self.fms.credit_manager = credits
+        self.fms.payment_mode = "postpaid"
+        with contextlib.redirect_stdout(io.StringIO()):
+            future = self.fms.submit("/bin/true", 5)
+            self.assertTrue(credits.logging.wait(30))
+            # durante a gravação do log os outros jobs ainda são admitidos e consultados
+            acquired = self.fms.lock.acquire(timeout=2)
+            if acquired:
+                self.fms.lock.release()
+            credits.release.set()
+            self.assertEqual(future.result(timeout=30), "SUCCESS")
+        self.assertTrue(acquired)
+if __name__ == "__main__":
+    unittest.main()
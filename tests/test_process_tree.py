@@ -0,0 +1,53 @@
+# testes do rastreamento incremental da árvore: novos descendentes, mortos removidos, objetos psutil
+# reaproveitados entre amostras e membros lidos do cgroup.procs
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+# um filho que dura meio segundo (coletado pelo pai) e outro que dura o teste inteiro
+PARENT = ("import subprocess, sys, time\n"
+          "short = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(0.5)'])\n"
+          "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+          "short.wait()\n"
+          "time.sleep(30)\n")
+class ProcessTreeTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.process = subprocess.Popen([sys.executable, "-c", PARENT], start_new_session=True)
+        self.root = psutil.Process(self.process.pid)
+    def tearDown(self):
+        os.killpg(self.process.pid, 9)
+        self.process.wait()
+    def wait_for_tree(self, tracker, size):
+        for _ in range(100):
+            tree = tracker.update()
+            if len(tree) == size:
+                return tree
+            time.sleep(0.05)
+        self.fail(f"a árvore não chegou a {size} processos")
+    def test_update_tracks_children_and_reuses_objects(self):
+        tracker = fms.ProcessTreeTracker(self.root)
+        tree = self.wait_for_tree(tracker, 3)
+        self.assertIs(tree[0], self.root)
+        objects = {proc.pid: proc for proc in tree}
+        for proc in self.wait_for_tree(tracker, 2):  # o filho curto saiu da árvore
+            self.assertIs(proc, objects[proc.pid])  # sem novo psutil.Process por amostra
+    def test_cgroup_members_and_reused_pids(self):
+        with tempfile.TemporaryDirectory() as cgroup:
+            with open(os.path.join(cgroup, "cgroup.procs"), 'w') as f:
+                f.write(f"{self.process.pid}\n1\n")  # o init é mais antigo que o job: pid reutilizado
+            tracker = fms.ProcessTreeTracker(self.root, cgroup)
+            self.assertEqual([proc.pid for proc in tracker.update()], [self.process.pid])
+        # sem o cgroup (removido) volta a listar a árvore pelo /proc
+        self.assertEqual(len(self.wait_for_tree(tracker, 2)), 2)
+        self.assertIsNone(tracker.cgroup_path)
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# testes do cache de perfis por binário: percentis do histórico, despejo LRU, persistência e recusa
+# antecipada de jobs que o histórico diz que excederiam a quota
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class BinaryProfilesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "fms_profiles.json")
+        self.binary = os.path.join(self.directory.name, "job")
+        with open(self.binary, 'w') as f:
+            f.write("#!/bin/sh\n")
+    def tearDown(self):
+        self.directory.cleanup()
+    def test_percentiles_need_enough_runs(self):
+        profiles = fms.BinaryProfiles(self.path, history=10)
+        key = profiles.key(self.binary)
+        for cpu_time in range(1, 5):
+            profiles.record(key, float(cpu_time), 10.0, 1.0, None, "SUCCESS")
+        self.assertIsNone(profiles.summary(key, min_runs=5))
+        for cpu_time in range(5, 21):
+            profiles.record(key, float(cpu_time), 10.0, 1.0, None, "SUCCESS")
+        summary = profiles.summary(key, min_runs=5)
+        self.assertEqual(summary['cpu_time'], {'p50': 15.0, 'p95': 20.0})  # só as 10 últimas execuções
+        self.assertNotIn('cost', summary)  # sem custo no modo quota
+        self.assertEqual(profiles.get(key)['results'], {"SUCCESS": 20})
+    def test_lru_eviction_and_persistence(self):
+        profiles = fms.BinaryProfiles(self.path, capacity=2)
+        for name in ("a", "b"):
+            profiles.record(name, 1.0, 1.0, 1.0, None, "SUCCESS")
+        profiles.get("a")  # "a" passa a ser o mais recente
+        profiles.record("c", 1.0, 1.0, 1.0, None, "SUCCESS")
+        self.assertEqual(list(profiles.entries), ["a", "c"])
+        profiles.save(force=True)
+        self.assertEqual(list(fms.BinaryProfiles(self.path).entries), ["a", "c"])
+    def test_modified_binary_gets_a_new_key(self):
+        key = fms.BinaryProfiles.key(self.binary)
+        with open(self.binary, 'a') as f:
+            f.write("exit 0\n")
+        self.assertNotEqual(fms.BinaryProfiles.key(self.binary), key)
+    def test_history_rejects_a_job_before_it_starts(self):
+        runner = fms.FMS()
+        runner.profile_file = self.path
+        key = runner.profile_key(self.binary)
+        for _ in range(fms.PROFILE_MIN_RUNS):
+            runner.profiles.record(key, 3.0, 10.0, 4.0, None, "SUCCESS")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(runner.predict_rejection(key, 1.0), "REJECTED")
+        self.assertIsNone(runner.predict_rejection(key, 5.0))
+        self.assertEqual(runner.sampling_interval(key), max(4.0 / 20, fms.MIN_SAMPLE_INTERVAL))
+if __name__ == "__main__":
+    unittest.main()
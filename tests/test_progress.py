@@ -0,0 +1,65 @@
+# testes do renderizador de progresso: nada é escrito sem terminal, redesenho só com amostra nova e
+# o fim de um job tira a linha do bloco e imprime os avisos do monitor
+
+import contextlib
+import io
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+class Terminal(io.StringIO):
+    # terminal falso que conta as escritas
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+    def isatty(self):
+        return True
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+def monitor_with_sample(cpu_time):
+    monitor = fms.ProcessMonitor(os.getpid(), 10, 0, None)  # só a amostra e os avisos são usados
+    monitor.last_sample = fms.ResourceSample(time.time(), 1.0, cpu_time, 20.0, 1)
+    return monitor
+class ProgressRendererTest(unittest.TestCase):
+    def wait_for(self, condition):
+        for _ in range(100):
+            if condition():
+                return
+            time.sleep(0.02)
+        self.fail("o renderizador não desenhou a tempo")
+    def test_no_output_without_a_terminal(self):
+        for renderer in (fms.ProgressRenderer(50, io.StringIO()), fms.ProgressRenderer(0, Terminal())):
+            monitor = monitor_with_sample(1.0)
+            monitor.notify("aviso")
+            renderer.add(monitor, "job")
+            self.assertIsNone(renderer.thread)
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                with renderer.finish(monitor):
+                    pass
+            self.assertEqual(renderer.stream.getvalue(), "")
+            self.assertEqual(output.getvalue(), "aviso\n")  # os avisos saem mesmo sem progresso
+    def test_redraws_only_on_a_new_sample(self):
+        terminal = Terminal()
+        renderer = fms.ProgressRenderer(50, terminal)
+        monitor = monitor_with_sample(1.0)
+        renderer.add(monitor, "job")
+        self.wait_for(lambda: "CPU=1.00s" in terminal.getvalue())
+        time.sleep(0.1)  # vários quadros sem amostra nova
+        writes = terminal.writes
+        time.sleep(0.1)
+        self.assertEqual(terminal.writes, writes)
+        monitor.last_sample = monitor.last_sample._replace(cpu_time=2.0)
+        self.wait_for(lambda: "CPU=2.00s" in terminal.getvalue())
+        monitor.notify("limite excedido")
+        with renderer.finish(monitor):
+            terminal.write("relatório\n")
+        self.assertEqual(renderer.jobs, {})
+        self.assertTrue(terminal.getvalue().endswith("CPU=2.00s/10.00s (20.0%), Memória=20.00MB, "
+                                                     "Tempo=1.00s/infs\nlimite excedido\nrelatório\n"))
+if __name__ == "__main__":
+    unittest.main()
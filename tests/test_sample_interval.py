@@ -0,0 +1,37 @@
+# testes do intervalo adaptativo: amostragem rara longe dos limites e no intervalo mínimo perto deles
+
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+def sample(t, cpu_time, memory):
+    return fms.ResourceSample(t, t, cpu_time, memory, 1)
+class NextSampleIntervalTest(unittest.TestCase):
+    def interval(self, previous, current, cpu_quota=100, memory_limit=0, reservation=None, costs=(0, 0)):
+        # só os limites e as duas amostras importam; o processo monitorado é o próprio teste
+        monitor = fms.ProcessMonitor(os.getpid(), cpu_quota, memory_limit, None, min_interval=0.05, max_interval=1.0,
+                                     reservation=reservation)
+        monitor.previous_sample = previous
+        monitor.previous_cost, monitor.last_cost = costs
+        return monitor.next_sample_interval(current)
+    def test_first_sample_uses_the_minimum(self):
+        self.assertEqual(self.interval(None, sample(1, 0.1, 10)), 0.05)
+    def test_far_from_the_limits_uses_the_maximum(self):
+        self.assertEqual(self.interval(sample(0, 0, 10), sample(1, 0.1, 10), cpu_quota=10, memory_limit=100), 1.0)
+    def test_cpu_headroom(self):
+        # mesmo com CPU parada supõe um núcleo, com fator de segurança 2: 0.5s de folga / 2
+        self.assertAlmostEqual(self.interval(sample(1, 9.0, 10), sample(2, 9.5, 10), cpu_quota=10), 0.25)
+    def test_memory_growth_and_proximity(self):
+        # 40 MB/s (80 com a margem) e 50 MB de folga
+        self.assertAlmostEqual(self.interval(sample(1, 0, 10), sample(2, 0, 50), memory_limit=100), 0.625)
+        self.assertEqual(self.interval(sample(1, 0, 95), sample(2, 0, 95), memory_limit=100), 0.05)
+    def test_prepaid_cost_headroom(self):
+        reservation = types.SimpleNamespace(kill_threshold=10.0)
+        self.assertAlmostEqual(self.interval(sample(1, 0, 0), sample(2, 0, 0), reservation=reservation,
+                                             costs=(0.0, 8.0)), 0.125)
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# testes da amostragem em um único retrato: memória e CPU somadas sobre a árvore inteira, contador de
+# CPU monotônico e limite de memória aplicado à soma dos processos
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+# pai e filho com ~30 MB cada, parados
+HOLD = "data = bytearray(30 * 1024 * 1024)\nimport time\ntime.sleep(30)\n"
+PARENT = f"import subprocess, sys\nsubprocess.Popen([sys.executable, '-c', {HOLD!r}])\n{HOLD}"
+class TakeSampleTest(unittest.TestCase):
+    def setUp(self):
+        self.process = subprocess.Popen([sys.executable, "-c", PARENT], start_new_session=True)
+    def tearDown(self):
+        try:
+            os.killpg(self.process.pid, 9)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+    def settled_sample(self, monitor):
+        # espera o filho existir e as duas alocações terminarem
+        for _ in range(100):
+            sample = monitor.take_sample()
+            if sample.n_procs == 2 and sample.memory > 60:
+                return sample
+            time.sleep(0.05)
+        self.fail("a árvore não chegou a dois processos com 30 MB cada")
+    def test_sample_sums_the_whole_tree(self):
+        monitor = fms.ProcessMonitor(self.process.pid, 100, 0, None)
+        sample = self.settled_sample(monitor)
+        platform = fms.get_platform()
+        cpu_time = sum(platform.process_metrics(proc)[1] for proc in monitor.process_tree)
+        self.assertAlmostEqual(sample.cpu_time, cpu_time, delta=0.05)
+        self.assertLess(sample.memory, 120)
+        self.assertGreaterEqual(sample.elapsed, 0)
+    def test_cpu_never_goes_backwards(self):
+        monitor = fms.ProcessMonitor(self.process.pid, 100, 0, None)
+        monitor.total_cpu_time = 50.0  # CPU de quem já saiu da árvore
+        self.assertEqual(self.settled_sample(monitor).cpu_time, 50.0)
+    def test_memory_limit_applies_to_the_sum(self):
+        monitor = fms.ProcessMonitor(self.process.pid, 100, 55, None)  # cada processo cabe, a soma não
+        self.settled_sample(monitor)
+        self.assertIsNone(monitor.monitor_step())
+        self.assertEqual(monitor.result, "MEMORY_EXCEEDED")
+        self.assertEqual(self.process.wait(timeout=5), -9)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            monitor.flush_messages()
+        self.assertIn("limite de memória", output.getvalue())
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+# testes da série temporal: memória fixa com redução por pares, picos preservados e exportação binária
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+def fill(series, count):
+    # RSS cresce 1 MB por amostra com um pico isolado na amostra 5; 3 processos só na amostra 3
+    for i in range(count):
+        series.record(fms.ResourceSample(0, float(i), i * 0.5, 100.0 if i == 5 else float(i), 3 if i == 3 else 1))
+class SampleSeriesTest(unittest.TestCase):
+    def test_downsampling_keeps_peaks_and_last_cpu(self):
+        series = fms.SampleSeries(capacity=4)
+        fill(series, 10)
+        self.assertEqual(series.stride, 4)
+        self.assertEqual(len(series), 3)  # dois pontos completos e um em construção
+        t, cpu, rss, n_procs = (list(column[:len(series)]) for column in series.columns)
+        self.assertEqual(t, [0.0, 4.0, 8.0])
+        self.assertEqual(cpu, [1.5, 3.5, 4.5])
+        self.assertEqual(rss, [3.0, 100.0, 9.0])
+        self.assertEqual(n_procs, [3, 1, 1])
+    def test_memory_stays_fixed(self):
+        series = fms.SampleSeries(capacity=8)
+        columns = [column.buffer_info() for column in series.columns]
+        fill(series, 1000)
+        self.assertLessEqual(len(series), 8)
+        self.assertEqual([column.buffer_info() for column in series.columns], columns)
+        series.clear()
+        self.assertEqual((len(series), series.stride), (0, 1))
+    def test_export_round_trip(self):
+        series = fms.SampleSeries(capacity=4)
+        fill(series, 10)
+        with tempfile.TemporaryDirectory() as directory:
+            path = series.export(os.path.join(directory, "job.series"), {'binary': "/bin/job"})
+            header, columns = fms.load_series(path)
+        self.assertEqual(header['binary'], "/bin/job")
+        self.assertEqual((header['count'], header['stride']), (3, 4))
+        self.assertEqual(list(columns['rss']), [3.0, 100.0, 9.0])
+        self.assertEqual(list(columns['n_procs']), [3, 1, 1])
+if __name__ == "__main__":
+    unittest.main()
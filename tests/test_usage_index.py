@@ -0,0 +1,62 @@
+# testes do índice incremental do log de uso: totais por intervalo, atualização só com os registros
+# novos e recomeço depois de uma limpeza do log
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+def usage_entry(timestamp, binary="/bin/job", cost=1.0):
+    return {'timestamp': timestamp, 'binary': binary, 'cpu_time': 1.0, 'memory_max': 10.0,
+            'execution_time': 2.0, 'cost': cost}
+class UsageIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "usage.jsonl")
+        self.index_path = os.path.join(self.directory.name, "usage.index.json")
+        self.ledger = fms.UsageLedger(self.path)
+        for timestamp, binary, cost in [("2026-01-01 10:05:00", "/bin/a", 1.0),
+                                        ("2026-01-01 10:45:00", "/bin/b", 2.0),
+                                        ("2026-01-01 11:30:00", "/bin/a", 4.0),
+                                        ("2026-01-02 09:00:00", "/bin/a", 8.0)]:
+            self.ledger.append(usage_entry(timestamp, binary, cost))
+        self.ledger.sync()
+    def tearDown(self):
+        self.ledger.close()
+        self.directory.cleanup()
+    def test_range_totals(self):
+        index = fms.UsageIndex(self.path, self.index_path)
+        index.refresh()
+        self.assertEqual(index.range_totals()['cost'], 15.0)
+        self.assertEqual(index.range_totals("2026-01-01 10", "2026-01-01 10")['cost'], 3.0)
+        self.assertEqual(index.range_totals("2026-01-01 11")['cost'], 12.0)
+        self.assertEqual(index.range_totals(None, "2026-01-01")['count'], 3)
+        self.assertEqual([(day, stats['cost']) for day, stats in index.day_totals()],
+                         [("2026-01-01", 7.0), ("2026-01-02", 8.0)])
+        self.assertEqual([entry['cost'] for entry in index.entries_between("2026-01-01 10:30", "2026-01-01 11")],
+                         [2.0, 4.0])
+    def test_refresh_reads_only_new_records_and_survives_reload(self):
+        index = fms.UsageIndex(self.path, self.index_path)
+        index.refresh()
+        index.save(force=True)
+        self.ledger.append(usage_entry("2026-01-02 10:00:00", "/bin/b", 16.0))
+        self.ledger.sync()
+        index = fms.UsageIndex(self.path, self.index_path)
+        index.refresh()
+        self.assertEqual(index.range_totals()['cost'], 31.0)
+        self.assertEqual(index.by_binary["/bin/b"]['cost'], 18.0)
+    def test_clear_followed_by_regrowth_resets_the_index(self):
+        index = fms.UsageIndex(self.path, self.index_path)
+        index.refresh()
+        self.ledger.clear()
+        for _ in range(8):  # o log volta a passar do deslocamento antigo
+            self.ledger.append(usage_entry("2026-02-01 10:00:00", "/bin/c", 0.5))
+        self.ledger.sync()
+        index.refresh()
+        self.assertEqual(index.range_totals()['cost'], 4.0)
+        self.assertEqual(list(index.by_binary), ["/bin/c"])
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# testes do log de uso em JSON Lines: registro parcial descartado na abertura, limpeza e migração
+# única do antigo fms_usage_<user>.json
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fms
+
+def usage_entry(timestamp, binary="/bin/job", cpu_time=1.0, cost=1.0):
+    return {'timestamp': timestamp, 'binary': binary, 'cpu_time': cpu_time, 'memory_max': 10.0,
+            'execution_time': 2.0, 'cost': cost}
+class UsageLedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "usage.jsonl")
+    def tearDown(self):
+        self.directory.cleanup()
+    def test_torn_tail_is_dropped_on_open(self):
+        ledger = fms.UsageLedger(self.path)
+        ledger.append(usage_entry("2026-01-01 10:00:00"))
+        ledger.append(usage_entry("2026-01-01 10:00:01"))
+        ledger.close()
+        with open(self.path, 'ab') as f:
+            f.write(b'{"timestamp": "2026-01-01 10:0')  # queda no meio de uma gravação
+        ledger = fms.UsageLedger(self.path)
+        self.assertEqual(len(list(ledger.entries())), 2)
+        ledger.append(usage_entry("2026-01-01 10:00:02"))
+        ledger.close()
+        timestamps = [entry['timestamp'] for entry in fms.UsageLedger(self.path).entries()]
+        self.assertEqual(timestamps, ["2026-01-01 10:00:00", "2026-01-01 10:00:01", "2026-01-01 10:00:02"])
+    def test_clear_keeps_appending_to_the_same_file(self):
+        ledger = fms.UsageLedger(self.path)
+        ledger.append(usage_entry("2026-01-01 10:00:00"))
+        ledger.clear()
+        self.assertEqual(list(ledger.entries()), [])
+        ledger.append(usage_entry("2026-01-01 11:00:00"))
+        ledger.close()
+        self.assertEqual([entry['timestamp'] for entry in fms.UsageLedger(self.path).entries()],
+                         ["2026-01-01 11:00:00"])
+    def test_json_migration_runs_once(self):
+        json_path = os.path.join(self.directory.name, "usage.json")
+        with open(json_path, 'w') as f:
+            json.dump([usage_entry("2026-01-01 09:00:00"), usage_entry("2026-01-01 09:00:01")], f)
+        ledger = fms.UsageLedger(self.path)
+        ledger.append(usage_entry("2026-01-01 08:00:00"))
+        self.assertEqual(fms.migrate_usage_json(json_path, ledger), 2)
+        self.assertEqual(fms.migrate_usage_json(json_path, ledger), 0)
+        # uma queda entre a troca do log e a renomeação do JSON não duplica os registros
+        os.replace(json_path + ".migrated", json_path)
+        self.assertEqual(fms.migrate_usage_json(json_path, ledger), 0)
+        ledger.append(usage_entry("2026-01-01 10:00:00"))
+        ledger.close()
+        self.assertEqual(len(list(fms.UsageLedger(self.path).entries())), 4)
+        self.assertFalse(os.path.exists(json_path))
+if __name__ == "__main__":
+    unittest.main()